@@ -1,15 +1,23 @@
+import time
+
+started = time.perf_counter()
+
 from flask import Flask
 from dotenv import load_dotenv
-import os
-
-from extensions import db, migrate, ma
-from modules.product.routes import register_product_routes
 
+# Loaded before the modules below, which read settings at import time
 load_dotenv()
 
+from extensions import db, migrate, ma, get_logger
+from modules.product.routes import register_product_routes
+from modules.product.commands import register_product_commands
+from modules.job.routes import register_job_routes
+from modules.shared.routes import register_metrics_routes
+from modules.benchmark.commands import register_benchmark_commands
+from modules.shared.services.database import configure_database
+
 app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URI_PG')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+configure_database(app)
 
 
 db.init_app(app)
@@ -17,6 +25,17 @@ migrate.init_app(app, db)
 ma.init_app(app)
 
 register_product_routes(app)
+register_product_commands(app)
+register_job_routes(app)
+register_metrics_routes(app)
+register_benchmark_commands(app)
+
+# AWS clients are created on first use, so this covers imports and app setup only
+app.config['STARTUP_SECONDS'] = time.perf_counter() - started
+get_logger('app').info(
+    "[App] Initialised in %.1f ms", app.config['STARTUP_SECONDS'] * 1000,
+    extra={'fields': {'startup_seconds': round(app.config['STARTUP_SECONDS'], 4)}}
+)
 
    
 if __name__ == "__main__":
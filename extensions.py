@@ -1,15 +1,9 @@
-import logging
 from flask_sqlalchemy import SQLAlchemy
 from flask_marshmallow import Marshmallow
 from flask_migrate import Migrate
+from modules.shared.logger import get_logger
+from modules.shared.services.database import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 ma = Marshmallow()
-
-def get_logger(level=logging.INFO):
-    logger = logging.getLogger(__name__)
-    if not logger.hasHandlers():
-        logging.basicConfig(level=level)
-    logger.setLevel(level)
-    return logger
\ No newline at end of file
@@ -0,0 +1,87 @@
+"""Configurable embedding dimensions and storage type
+
+Revision ID: 0c6d9e3a7f15
+Revises: f19a4c8e2d57
+Create Date: 2025-08-21 15:19:40.118263
+
+"""
+import os
+import re
+
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import HALFVEC, Vector
+
+
+# revision identifiers, used by Alembic.
+revision = '0c6d9e3a7f15'
+down_revision = 'f19a4c8e2d57'
+branch_labels = None
+depends_on = None
+
+# The upgrade leaves product.embedding as vector(1024) on every database.
+# EMBEDDING_DIMENSIONS / EMBEDDING_STORAGE are applied afterwards with
+# `flask resize-embeddings`. Databases that ran an earlier version of this
+# revision may already have another type, so the downgrade reads the type
+# from the catalogue instead of the environment.
+INDEX_NAME = 'ix_product_embedding_ann'
+
+
+def create_ann_index(storage):
+    index_type = os.getenv('EMBEDDING_INDEX_TYPE', 'hnsw').lower()
+    if index_type == 'hnsw':
+        index_options = {
+            'm': int(os.getenv('EMBEDDING_HNSW_M', 16)),
+            'ef_construction': int(os.getenv('EMBEDDING_HNSW_EF_CONSTRUCTION', 64)),
+        }
+    elif index_type == 'ivfflat':
+        index_options = {
+            'lists': int(os.getenv('EMBEDDING_IVFFLAT_LISTS', 100)),
+        }
+    else:
+        raise ValueError(f"Unsupported EMBEDDING_INDEX_TYPE '{index_type}'. Use 'hnsw' or 'ivfflat'.")
+
+    op.create_index(
+        INDEX_NAME,
+        'product',
+        ['embedding'],
+        unique=False,
+        postgresql_using=index_type,
+        postgresql_with=index_options,
+        postgresql_ops={'embedding': f'{storage}_cosine_ops'},
+        postgresql_where=sa.text('in_stock = true'),
+    )
+
+
+def change_embedding_type(from_dimensions, to_dimensions, to_storage):
+    column_type = HALFVEC(to_dimensions) if to_storage == 'halfvec' else Vector(to_dimensions)
+    if from_dimensions == to_dimensions:
+        using = f'embedding::{to_storage}({to_dimensions})'
+    else:
+        using = 'NULL'
+        op.execute('DELETE FROM product_neighbour')
+
+    op.drop_index(INDEX_NAME, table_name='product')
+    op.alter_column('product', 'embedding', type_=column_type, existing_nullable=True, postgresql_using=using)
+    create_ann_index(to_storage)
+
+
+def current_embedding_type():
+    column_type = op.get_bind().execute(sa.text(
+        "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+        "WHERE attrelid = 'product'::regclass AND attname = 'embedding'"
+    )).scalar()
+    storage, dimensions = re.fullmatch(r'(vector|halfvec)\((\d+)\)', column_type).groups()
+    return int(dimensions), storage
+
+
+def upgrade():
+    pass
+
+
+def downgrade():
+    dimensions, storage = current_embedding_type()
+    if dimensions == 1024 and storage == 'vector':
+        return
+
+    change_embedding_type(dimensions, 1024, 'vector')
@@ -0,0 +1,54 @@
+"""Add embedding content hash and updated_at
+
+Revision ID: 3f8e1b6c9a20
+Revises: 0c6d9e3a7f15
+Create Date: 2025-08-25 09:57:16.447831
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f8e1b6c9a20'
+down_revision = '0c6d9e3a7f15'
+branch_labels = None
+depends_on = None
+
+PRODUCT_CONTENT_HASH = (
+    "md5(coalesce(name, '') || '|' || coalesce(description, '') || '|' || "
+    "coalesce(category, '') || '|' || coalesce(price::text, '') || '|' || "
+    "coalesce(name_ar, '') || '|' || coalesce(description_ar, ''))"
+)
+
+
+def upgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.add_column(sa.Column(
+            'content_hash',
+            sa.String(length=32),
+            sa.Computed(PRODUCT_CONTENT_HASH, persisted=True),
+            nullable=True
+        ))
+        batch_op.add_column(sa.Column('embedding_hash', sa.String(length=32), nullable=True))
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False))
+
+    # Embeddings that already exist are treated as current
+    op.execute('UPDATE product SET embedding_hash = content_hash WHERE embedding IS NOT NULL')
+
+    # Lets the embed job find new and stale rows without scanning the table
+    op.create_index(
+        'ix_product_stale_embedding',
+        'product',
+        ['id'],
+        unique=False,
+        postgresql_where=sa.text('embedding_hash IS DISTINCT FROM content_hash'),
+    )
+
+
+def downgrade():
+    op.drop_index('ix_product_stale_embedding', table_name='product')
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
+        batch_op.drop_column('embedding_hash')
+        batch_op.drop_column('content_hash')
@@ -0,0 +1,54 @@
+"""Add ANN index for embeddings
+
+Revision ID: 4b7c2e9d1a3f
+Revises: 13e351523117
+Create Date: 2025-08-04 09:41:27.512306
+
+"""
+import os
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b7c2e9d1a3f'
+down_revision = '13e351523117'
+branch_labels = None
+depends_on = None
+
+# The index type is picked when the migration runs:
+#   EMBEDDING_INDEX_TYPE=hnsw     (default) better recall/latency, slower build
+#   EMBEDDING_INDEX_TYPE=ivfflat  faster build, needs data in the table first
+INDEX_NAME = 'ix_product_embedding_ann'
+
+
+def upgrade():
+    index_type = os.getenv('EMBEDDING_INDEX_TYPE', 'hnsw').lower()
+
+    if index_type == 'hnsw':
+        index_options = {
+            'm': int(os.getenv('EMBEDDING_HNSW_M', 16)),
+            'ef_construction': int(os.getenv('EMBEDDING_HNSW_EF_CONSTRUCTION', 64)),
+        }
+    elif index_type == 'ivfflat':
+        index_options = {
+            'lists': int(os.getenv('EMBEDDING_IVFFLAT_LISTS', 100)),
+        }
+    else:
+        raise ValueError(f"Unsupported EMBEDDING_INDEX_TYPE '{index_type}'. Use 'hnsw' or 'ivfflat'.")
+
+    op.create_index(
+        INDEX_NAME,
+        'product',
+        ['embedding'],
+        unique=False,
+        postgresql_using=index_type,
+        postgresql_with=index_options,
+        postgresql_ops={'embedding': 'vector_cosine_ops'},
+        postgresql_where=sa.text('in_stock = true'),
+    )
+
+
+def downgrade():
+    op.drop_index(INDEX_NAME, table_name='product')
@@ -0,0 +1,27 @@
+"""Add product listing index
+
+Revision ID: 7b4d1f9e6a28
+Revises: 5a2c7e4f0b83
+Create Date: 2025-08-29 10:15:47.208316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b4d1f9e6a28'
+down_revision = '5a2c7e4f0b83'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Keyset pagination for GET /api/products walks (created_at, id) newest first
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.create_index('ix_product_created_at_id', ['created_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_index('ix_product_created_at_id')
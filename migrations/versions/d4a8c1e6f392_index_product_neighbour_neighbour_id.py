@@ -0,0 +1,27 @@
+"""Index product neighbour lists by neighbour
+
+Revision ID: d4a8c1e6f392
+Revises: b8f2d4a6c091
+Create Date: 2025-09-02 09:41:12.584307
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4a8c1e6f392'
+down_revision = 'b8f2d4a6c091'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Re-embedding a product drops every list that ranks it, found by neighbour_id
+    with op.batch_alter_table('product_neighbour', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_product_neighbour_neighbour_id'), ['neighbour_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('product_neighbour', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_product_neighbour_neighbour_id'))
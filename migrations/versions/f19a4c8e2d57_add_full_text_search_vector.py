@@ -0,0 +1,45 @@
+"""Add full text search vector
+
+Revision ID: f19a4c8e2d57
+Revises: e7b0d35f8c64
+Create Date: 2025-08-18 11:36:12.902744
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'f19a4c8e2d57'
+down_revision = 'e7b0d35f8c64'
+branch_labels = None
+depends_on = None
+
+PRODUCT_SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple'::regconfig, coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english'::regconfig, coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english'::regconfig, coalesce(description, '')), 'B') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(name_ar, '')), 'A') || "
+    "setweight(to_tsvector('arabic'::regconfig, coalesce(name_ar, '')), 'A') || "
+    "setweight(to_tsvector('arabic'::regconfig, coalesce(description_ar, '')), 'B')"
+)
+
+
+def upgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.add_column(sa.Column(
+            'search_vector',
+            postgresql.TSVECTOR(),
+            sa.Computed(PRODUCT_SEARCH_VECTOR, persisted=True),
+            nullable=True
+        ))
+        batch_op.create_index('ix_product_search_vector', ['search_vector'], unique=False, postgresql_using='gin')
+        batch_op.create_index('ix_product_category', ['category'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_index('ix_product_category')
+        batch_op.drop_index('ix_product_search_vector')
+        batch_op.drop_column('search_vector')
@@ -0,0 +1,151 @@
+import io
+import random
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from sqlalchemy import insert, text
+
+from extensions import db
+from modules.benchmark.fakes import fake_embedding
+from modules.product.entity import EMBEDDING_DIMENSIONS, Product
+from modules.product.ingest import ProductIngestor
+from modules.product.search_cache import bump_catalogue_generation
+from modules.product.services import ProductService
+from modules.shared.logger import get_logger
+
+logger = get_logger('benchmark')
+
+# Keywords double as the stand-in classifier's rules, so generated products
+# classify back into the category they were generated from
+CATEGORIES = {
+    'Electronics': {'headphones', 'charger', 'speaker', 'monitor', 'keyboard', 'router', 'camera', 'tablet'},
+    'Clothing': {'jacket', 'shirt', 'jeans', 'sneakers', 'scarf', 'hoodie', 'dress', 'socks'},
+    'Food': {'coffee', 'olive', 'honey', 'pasta', 'tea', 'chocolate', 'dates', 'rice'},
+    'Home': {'lamp', 'blanket', 'kettle', 'pan', 'vase', 'pillow', 'rug', 'shelf'},
+    'Sports': {'dumbbell', 'racket', 'yoga', 'bicycle', 'helmet', 'football', 'treadmill', 'gloves'},
+}
+ADJECTIVES = [
+    'wireless', 'compact', 'premium', 'organic', 'classic', 'portable', 'waterproof', 'lightweight',
+    'ergonomic', 'vintage', 'smart', 'handmade', 'durable', 'slim', 'deluxe', 'eco',
+]
+MATERIALS = ['cotton', 'steel', 'bamboo', 'leather', 'ceramic', 'aluminium', 'wool', 'glass', 'plastic', 'oak']
+COLOURS = ['black', 'white', 'red', 'navy', 'grey', 'green', 'sand', 'silver']
+
+COPY_COLUMNS = [
+    'name', 'description', 'name_ar', 'description_ar', 'category',
+    'price', 'quantity', 'in_stock', 'created_at', 'updated_at', 'embedding'
+]
+
+
+def generate_products(count, seed=0, start=0):
+    """Yields `count` deterministic product rows; the same seed and start give the same rows."""
+    rng = random.Random(f'{seed}:{start}')
+    categories = sorted(CATEGORIES)
+    keywords = {category: sorted(CATEGORIES[category]) for category in categories}
+    epoch = datetime(2024, 1, 1)
+    for index in range(start, start + count):
+        category = rng.choice(categories)
+        noun = rng.choice(keywords[category])
+        adjective = rng.choice(ADJECTIVES)
+        colour = rng.choice(COLOURS)
+        material = rng.choice(MATERIALS)
+        created_at = epoch + timedelta(seconds=index * 7)
+        yield {
+            'name': f'{adjective.title()} {colour} {noun} {index:07d}',
+            'description': f'{adjective.title()} {noun} made of {material}, {colour} finish. '
+                           f'{rng.choice(ADJECTIVES).title()} and {rng.choice(ADJECTIVES)} for everyday use.',
+            'name_ar': None,
+            'description_ar': None,
+            'category': category,
+            'price': round(rng.lognormvariate(3.5, 0.9), 2),
+            'quantity': rng.randint(0, 500),
+            'in_stock': rng.random() > 0.1,
+            'created_at': created_at,
+            'updated_at': created_at,
+        }
+
+
+def sample_queries(count, seed=0):
+    """Search phrases drawn from the catalogue vocabulary, e.g. 'waterproof leather jacket'."""
+    rng = random.Random(f'queries:{seed}')
+    nouns = sorted(set().union(*CATEGORIES.values()))
+    queries = []
+    for _ in range(count):
+        words = [rng.choice(nouns)]
+        if rng.random() < 0.7:
+            words.insert(0, rng.choice(ADJECTIVES))
+        if rng.random() < 0.4:
+            words.insert(-1, rng.choice(MATERIALS + COLOURS))
+        queries.append(' '.join(words))
+    return queries
+
+
+def format_vector(vector):
+    return '[' + ','.join(f'{value:.6f}' for value in vector) + ']'
+
+
+class CatalogueGenerator:
+    """Loads a synthetic catalogue in chunks so 10M rows never sit in memory.
+
+    On Postgres each chunk is streamed with COPY; elsewhere it falls back to
+    a bulk INSERT. With `with_embeddings` every row gets the stand-in
+    embedding of its ProductService.build_embedding_text, so search works
+    without running a batch-embed first.
+    """
+
+    def __init__(self, chunk_size=10000, with_embeddings=False, dimensions=EMBEDDING_DIMENSIONS):
+        self.chunk_size = chunk_size
+        self.with_embeddings = with_embeddings
+        self.dimensions = dimensions
+
+    def embed(self, record):
+        return fake_embedding(ProductService.build_embedding_text(SimpleNamespace(**record)), self.dimensions)
+
+    def copy_records(self, records):
+        buffer = io.StringIO()
+        for record in records:
+            values = [ProductIngestor.format_copy_value(record[column]) for column in COPY_COLUMNS[:-1]]
+            values.append(f'"{format_vector(record["embedding"])}"' if record['embedding'] is not None else '')
+            buffer.write(','.join(values))
+            buffer.write('\n')
+        buffer.seek(0)
+
+        cursor = db.session.connection().connection.cursor()
+        try:
+            cursor.copy_expert(f"COPY product ({', '.join(COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        finally:
+            cursor.close()
+
+    def load_chunk(self, records):
+        for record in records:
+            record['embedding'] = self.embed(record) if self.with_embeddings else None
+        try:
+            if db.engine.dialect.name == 'postgresql':
+                self.copy_records(records)
+            else:
+                db.session.execute(insert(Product), records)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def seed(self, count, seed=0, progress=None):
+        loaded = 0
+        while loaded < count:
+            size = min(self.chunk_size, count - loaded)
+            self.load_chunk(list(generate_products(size, seed=seed, start=loaded)))
+            loaded += size
+            logger.info("Loaded %d/%d synthetic products", loaded, count)
+            if progress:
+                progress(loaded, count)
+
+        if self.with_embeddings:
+            # content_hash is generated by Postgres, so the hashes can only be copied after the load
+            db.session.execute(text(
+                "UPDATE product SET embedding_hash = content_hash "
+                "WHERE embedding IS NOT NULL AND embedding_hash IS NULL"
+            ))
+        bump_catalogue_generation()
+        db.session.commit()
+        return loaded
+
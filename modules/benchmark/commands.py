@@ -0,0 +1,120 @@
+import json
+import os
+
+import click
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+
+from extensions import db
+from modules.shared.services.database import REPLICA_BIND, engine_options
+from modules.benchmark.catalogue import CATEGORIES, CatalogueGenerator
+from modules.benchmark.fakes import FakeBehaviour, install_fakes
+from modules.benchmark.scenarios import SCENARIOS, BenchmarkRunner, ExtractTextScenario
+
+
+def _database_identity(uri):
+    url = make_url(uri)
+    return url.get_backend_name(), url.host, url.port, url.database
+
+
+def use_benchmark_database(app):
+    """Points the app at BENCHMARK_DATABASE_URI for the rest of the command.
+
+    The scenarios rewrite product rows, and the services behind the stand-ins
+    store fake vectors and translations in the embedding and translation
+    caches, so the suite refuses to run anywhere near the application's own
+    database or its replica.
+    """
+    uri = os.getenv('BENCHMARK_DATABASE_URI')
+    if not uri:
+        raise click.UsageError('Set BENCHMARK_DATABASE_URI to a dedicated database before running benchmarks.')
+    protected = [app.config.get('SQLALCHEMY_DATABASE_URI'), os.getenv('DATABASE_URI_PG_REPLICA')]
+    if any(other and _database_identity(other) == _database_identity(uri) for other in protected):
+        raise click.UsageError('BENCHMARK_DATABASE_URI must not point at the application database or its replica.')
+
+    with app.app_context():
+        engines = db.engines
+        for engine in engines.values():
+            engine.dispose()
+        engines.clear()
+        engines[None] = create_engine(uri, **engine_options(uri))
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    app.config.get('SQLALCHEMY_BINDS', {}).pop(REPLICA_BIND, None)
+
+
+def register_benchmark_commands(app):
+
+    @app.cli.group('benchmark')
+    def benchmark():
+        """Offline benchmarks against a dedicated database (BENCHMARK_DATABASE_URI) and stand-in AWS clients."""
+
+    @benchmark.command('seed')
+    @click.option('--products', default=10000, show_default=True, type=click.IntRange(1, 10_000_000),
+                  help='Number of synthetic products to load.')
+    @click.option('--with-embeddings', is_flag=True, help='Store stand-in embeddings so search works straight away.')
+    @click.option('--chunk-size', default=10000, show_default=True, help='Rows loaded per COPY.')
+    @click.option('--seed', default=0, show_default=True, help='Seed for the generated catalogue.')
+    def seed(products, with_embeddings, chunk_size, seed):
+        """Load a deterministic synthetic catalogue of 10k-10M products."""
+        use_benchmark_database(app)
+        generator = CatalogueGenerator(chunk_size=chunk_size, with_embeddings=with_embeddings)
+        loaded = generator.seed(products, seed=seed)
+        click.echo(f"Loaded {loaded} products{' with embeddings' if with_embeddings else ''}")
+
+    @benchmark.command('run')
+    @click.option('--scenarios', default=','.join(SCENARIOS), show_default=True,
+                  help='Comma separated scenarios to run.')
+    @click.option('--requests', default=100, show_default=True, help='Timed requests per scenario.')
+    @click.option('--warmup', default=5, show_default=True, help='Untimed requests sent before each scenario.')
+    @click.option('--concurrency', default=4, show_default=True, help='Concurrent clients; backfills always run one at a time.')
+    @click.option('--items', default=10, show_default=True,
+                  help='Search limit, or products per backfill and classify request.')
+    @click.option('--documents', default=0, show_default=True,
+                  help='Distinct documents cycled by extract-text; 0 makes every request a cache miss.')
+    @click.option('--cold', is_flag=True, help='Drop cached embeddings, translations and results before every request.')
+    @click.option('--document-kb', default=20, show_default=True, help='Size of each synthetic document.')
+    @click.option('--latency-ms', default=0.0, show_default=True, help='Latency added to every AWS call.')
+    @click.option('--jitter-ms', default=0.0, show_default=True, help='Uniform random latency added on top.')
+    @click.option('--throttle-rate', default=0.0, show_default=True, type=click.FloatRange(0, 1),
+                  help='Fraction of AWS calls that fail with ThrottlingException.')
+    @click.option('--seed', default=0, show_default=True, help='Seed for queries, samples and injected faults.')
+    @click.option('--json', 'as_json', is_flag=True, help='Print the results as JSON.')
+    def run(scenarios, requests, warmup, concurrency, items, documents, cold, document_kb,
+            latency_ms, jitter_ms, throttle_rate, seed, as_json):
+        """Run scenarios end to end and report throughput, latency percentiles and DB queries per request."""
+        names = [name.strip() for name in scenarios.split(',') if name.strip()]
+        unknown = [name for name in names if name not in SCENARIOS]
+        if unknown:
+            raise click.BadParameter(f"unknown scenarios {', '.join(unknown)}; choose from {', '.join(SCENARIOS)}")
+        use_benchmark_database(app)
+
+        behaviour = FakeBehaviour(latency_ms=latency_ms, jitter_ms=jitter_ms, throttle_rate=throttle_rate, seed=seed)
+        install_fakes(behaviour, CATEGORIES, document_kb=document_kb)
+        runner = BenchmarkRunner(app, behaviour, requests=requests, concurrency=concurrency, warmup=warmup)
+
+        results = []
+        for name in names:
+            if SCENARIOS[name] is ExtractTextScenario:
+                scenario = ExtractTextScenario(items=items, seed=seed, cold=cold, documents=documents)
+            else:
+                scenario = SCENARIOS[name](items=items, seed=seed, cold=cold)
+            results.append(runner.run(scenario))
+
+        if as_json:
+            click.echo(json.dumps(results, indent=2))
+            return
+
+        click.echo(
+            f"AWS stand-ins: {latency_ms:g} ms + up to {jitter_ms:g} ms jitter, {throttle_rate:.0%} throttled, "
+            f"{'cold' if cold else 'warm'} caches"
+        )
+        click.echo(
+            f"{'scenario':<16}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}"
+            f"{'p99 ms':>9}{'queries/req':>13}{'aws calls':>11}{'throttled':>11}"
+        )
+        for result in results:
+            click.echo(
+                f"{result['scenario']:<16}{result['requests']:>9}{result['errors']:>8}{result['throughput']:>9.1f}"
+                f"{result['p50_ms']:>9.1f}{result['p95_ms']:>9.1f}{result['p99_ms']:>9.1f}"
+                f"{result['db_queries_per_request']:>13.1f}{result['aws_calls']:>11}{result['throttled']:>11}"
+            )
@@ -0,0 +1,188 @@
+import hashlib
+import io
+import json
+import random
+import re
+import threading
+import time
+from functools import lru_cache
+
+import numpy as np
+from botocore.exceptions import ClientError
+
+from modules.shared.services.aws import register_client
+
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+CLASSIFY_LINE = re.compile(r'^\d+\. id: (\d+), name: (".*")$', re.MULTILINE)
+
+
+class FakeBehaviour:
+    """Latency and throttling injected into every stand-in call.
+
+    Each call sleeps `latency_ms` plus a uniform 0..`jitter_ms`, then fails
+    with a ThrottlingException with probability `throttle_rate`, the same way
+    the real clients fail when the account limit is hit.
+    """
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, throttle_rate=0.0, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.throttle_rate = throttle_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.throttled = 0
+
+    def before_call(self, operation_name):
+        with self._lock:
+            self.calls += 1
+            delay = (self.latency_ms + self._random.random() * self.jitter_ms) / 1000
+            throttle = self._random.random() < self.throttle_rate
+            if throttle:
+                self.throttled += 1
+        if delay:
+            time.sleep(delay)
+        if throttle:
+            raise ClientError(
+                {
+                    'Error': {'Code': 'ThrottlingException', 'Message': 'Rate exceeded'},
+                    'ResponseMetadata': {'HTTPStatusCode': 400}
+                },
+                operation_name
+            )
+
+    def stats(self):
+        with self._lock:
+            return {'calls': self.calls, 'throttled': self.throttled}
+
+
+@lru_cache(maxsize=100_000)
+def _token_vector(token, dimensions):
+    seed = int.from_bytes(hashlib.sha256(token.encode('utf-8')).digest()[:8], 'little')
+    return np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+
+
+def fake_embedding(text, dimensions):
+    """Deterministic bag-of-words embedding: texts sharing words land close together."""
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        vector += _token_vector(token, dimensions)
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        vector = _token_vector('', dimensions)
+        norm = np.linalg.norm(vector)
+    return vector / norm
+
+
+def fake_category(name, categories):
+    tokens = set(TOKEN_PATTERN.findall(name.lower()))
+    for category, keywords in categories.items():
+        if tokens & keywords:
+            return category
+    return sorted(categories)[int(hashlib.md5(name.encode('utf-8')).hexdigest(), 16) % len(categories)]
+
+
+class FakeBedrockRuntimeClient:
+    """Answers Titan embedding, Claude messages and Converse calls locally."""
+
+    def __init__(self, behaviour, categories):
+        self.behaviour = behaviour
+        self.categories = categories
+
+    def invoke_model(self, modelId, body, **kwargs):
+        self.behaviour.before_call('InvokeModel')
+        request = json.loads(body)
+        if 'inputText' in request:
+            dimensions = request.get('dimensions', 1024)
+            payload = {
+                'embedding': fake_embedding(request['inputText'], dimensions).tolist(),
+                'inputTextTokenCount': len(TOKEN_PATTERN.findall(request['inputText']))
+            }
+        else:
+            prompt = request['messages'][0]['content'][0]['text']
+            if 'product classifier' in prompt:
+                items = [
+                    {'id': int(product_id), 'name': json.loads(name), 'category': fake_category(json.loads(name), self.categories)}
+                    for product_id, name in CLASSIFY_LINE.findall(prompt)
+                ]
+                text = json.dumps(items, ensure_ascii=False)
+            else:
+                text = f"Stand-in response to a {len(prompt)} character prompt."
+            payload = {'content': [{'type': 'text', 'text': text}], 'stop_reason': 'end_turn'}
+        return {'body': io.BytesIO(json.dumps(payload).encode('utf-8'))}
+
+    def converse(self, modelId, messages, **kwargs):
+        self.behaviour.before_call('Converse')
+        block = messages[0]['content'][0]
+        source = (block.get('document') or block.get('image'))['source']['bytes']
+        if 'document' in block and block['document']['format'] in ('txt', 'md', 'csv', 'html'):
+            text = source.decode('utf-8', errors='replace')
+        else:
+            text = f"Stand-in extraction of {len(source)} bytes."
+        return {
+            'output': {'message': {'role': 'assistant', 'content': [{'text': text}]}},
+            'stopReason': 'end_turn'
+        }
+
+
+class FakeTranslateClient:
+    def __init__(self, behaviour):
+        self.behaviour = behaviour
+
+    def translate_text(self, Text, SourceLanguageCode, TargetLanguageCode, **kwargs):
+        self.behaviour.before_call('TranslateText')
+        return {
+            'TranslatedText': f'[{TargetLanguageCode}] {Text}',
+            'SourceLanguageCode': SourceLanguageCode,
+            'TargetLanguageCode': TargetLanguageCode
+        }
+
+
+@lru_cache(maxsize=1024)
+def synthetic_document(key, document_kb):
+    rng = random.Random(key)
+    words = ['inventory', 'product', 'shipment', 'invoice', 'quantity', 'price', 'total', 'supplier', 'order', 'item']
+    lines = []
+    size = 0
+    while size < document_kb * 1024:
+        line = ' '.join(rng.choice(words) for _ in range(12)) + '\n'
+        lines.append(line)
+        size += len(line)
+    return ''.join(lines).encode('utf-8')
+
+
+class FakeS3Client:
+    """Serves synthetic text documents of `document_kb` kilobytes for any key."""
+
+    def __init__(self, behaviour, document_kb=20):
+        self.behaviour = behaviour
+        self.document_kb = document_kb
+
+    def document(self, key):
+        return synthetic_document(key, self.document_kb)
+
+    def head_object(self, Bucket, Key, **kwargs):
+        self.behaviour.before_call('HeadObject')
+        body = self.document(Key)
+        return {'ETag': f'"{hashlib.md5(body).hexdigest()}"', 'ContentType': 'text/plain', 'ContentLength': len(body)}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        self.behaviour.before_call('GetObject')
+        body = self.document(Key)
+        return {'Body': io.BytesIO(body), 'ETag': f'"{hashlib.md5(body).hexdigest()}"', 'ContentLength': len(body)}
+
+
+def install_fakes(behaviour, categories, document_kb=20):
+    """Points every service at the local stand-ins; returns them by AWS service name.
+
+    The real caches sit on top of the stand-ins and persist their fake output,
+    so only install them once `use_benchmark_database` has switched databases.
+    """
+    fakes = {
+        'bedrock-runtime': FakeBedrockRuntimeClient(behaviour, categories),
+        'translate': FakeTranslateClient(behaviour),
+        's3': FakeS3Client(behaviour, document_kb=document_kb),
+    }
+    for service_name, client in fakes.items():
+        register_client(service_name, client)
+    return fakes
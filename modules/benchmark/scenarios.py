@@ -0,0 +1,274 @@
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+
+from sqlalchemy import delete, event, func, update
+
+from extensions import db
+from modules.benchmark.catalogue import sample_queries
+from modules.product.entity import EMBEDDING_DIMENSIONS, Product
+from modules.product.search_cache import get_search_cache
+from modules.product.services import ProductService
+from modules.shared.entity import EmbeddingCacheEntry, TranslationMemoryEntry
+from modules.shared.services.bedrock import BedrockService
+from modules.shared.services.embedding_cache import get_embedding_cache
+from modules.shared.services.translate import TranslateService
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class QueryCounter:
+    """Counts SQL statements sent through the engine while attached.
+
+    Backfills run part of their work on executor threads, so the count is a
+    process-wide total; the report divides it by the number of requests.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+        self._lock = threading.Lock()
+        self._paused = threading.local()
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if getattr(self._paused, 'active', False):
+            return
+        with self._lock:
+            self.count += 1
+
+    @contextmanager
+    def paused(self):
+        """Leaves out statements issued by this thread, e.g. untimed scenario setup."""
+        self._paused.active = True
+        try:
+            yield
+        finally:
+            self._paused.active = False
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, 'before_cursor_execute', self)
+
+
+class Scenario:
+    """One benchmarked endpoint.
+
+    `prepare` runs once before timing starts, `before_request` runs untimed
+    before every request, and `request` returns the (method, path, kwargs)
+    passed to the Flask test client. With `cold`, scenarios drop the cached
+    results they would otherwise hit, so every request reaches the stand-ins.
+    """
+
+    name = None
+    # Backfills share a checkpoint per job, so their requests cannot overlap
+    serial = False
+
+    def __init__(self, items=10, seed=0, cold=False):
+        self.items = items
+        self.seed = seed
+        self.cold = cold
+
+    def prepare(self, total_requests):
+        pass
+
+    def before_request(self, index):
+        pass
+
+    def request(self, index):
+        raise NotImplementedError
+
+
+class SearchScenario(Scenario):
+    name = 'search'
+    mode = 'vector'
+
+    def prepare(self, total_requests):
+        self.queries = sample_queries(total_requests, seed=self.seed)
+
+    def before_request(self, index):
+        if self.cold:
+            get_search_cache().clear()
+            get_embedding_cache().clear()
+
+    def request(self, index):
+        return 'GET', '/api/products/search', {
+            'query_string': {'query': self.queries[index], 'mode': self.mode, 'limit': self.items}
+        }
+
+
+class HybridSearchScenario(SearchScenario):
+    name = 'search-hybrid'
+    mode = 'hybrid'
+
+
+class BatchEmbedScenario(Scenario):
+    name = 'batch-embed'
+    serial = True
+
+    def prepare(self, total_requests):
+        # The backfill takes stale rows in id order, so these are the rows every request processes
+        rows = db.session.query(Product).order_by(Product.id).limit(self.items).all()
+        self.product_ids = [row.id for row in rows]
+        model_id = f"{BedrockService.EMBEDDING_MODEL_ID}:{EMBEDDING_DIMENSIONS}"
+        self.cache_keys = [
+            get_embedding_cache().make_key(model_id, ProductService.build_embedding_text(row)) for row in rows
+        ]
+        db.session.rollback()
+
+    def before_request(self, index):
+        # Mark the same rows stale again so every request embeds `items` products
+        db.session.execute(
+            update(Product).where(Product.id.in_(self.product_ids)).values(embedding_hash=None)
+        )
+        if self.cold:
+            get_embedding_cache().clear()
+            db.session.execute(delete(EmbeddingCacheEntry).where(EmbeddingCacheEntry.key.in_(self.cache_keys)))
+        db.session.commit()
+
+    def request(self, index):
+        return 'POST', '/api/products/batch-embed', {'json': {'max_items': self.items, 'reset': True}}
+
+
+class BatchTranslateScenario(BatchEmbedScenario):
+    name = 'batch-translate'
+
+    def prepare(self, total_requests):
+        rows = db.session.query(Product.id, Product.name, Product.description).order_by(Product.id).limit(self.items).all()
+        self.product_ids = [row.id for row in rows]
+        self.memory_keys = [
+            TranslateService.make_memory_key(text, 'en', 'ar')
+            for row in rows for text in (row.name, row.description) if text
+        ]
+        db.session.rollback()
+
+    def before_request(self, index):
+        db.session.execute(
+            update(Product).where(Product.id.in_(self.product_ids)).values(name_ar=None, description_ar=None)
+        )
+        if self.cold:
+            db.session.execute(delete(TranslationMemoryEntry).where(TranslationMemoryEntry.key.in_(self.memory_keys)))
+        db.session.commit()
+
+    def request(self, index):
+        return 'POST', '/api/products/translate', {'json': {'max_items': self.items, 'reset': True}}
+
+
+class ClassifyScenario(Scenario):
+    name = 'classify'
+
+    def prepare(self, total_requests):
+        rows = db.session.query(Product.id).order_by(func.random()).limit(max(self.items * 20, 1000)).all()
+        self.product_ids = [row.id for row in rows]
+        db.session.rollback()
+
+    def request(self, index):
+        product_ids = random.Random(f'{self.seed}:{index}').sample(self.product_ids, min(self.items, len(self.product_ids)))
+        return 'POST', '/api/products/classify', {
+            'json': {'product_ids': product_ids, 'use_local_classifier': False}
+        }
+
+
+class ExtractTextScenario(Scenario):
+    name = 'extract-text'
+
+    def __init__(self, items=10, seed=0, cold=False, documents=0):
+        super().__init__(items, seed, cold)
+        # 0 gives every request its own document, so the extraction cache never hits
+        self.documents = 0 if cold else documents
+
+    def prepare(self, total_requests):
+        self.prefix = f'bench/{uuid.uuid4().hex[:8]}'
+
+    def request(self, index):
+        document = index % self.documents if self.documents else index
+        return 'POST', '/api/extract-text', {'json': {'path': f's3://{self.prefix}/doc-{document}.txt'}}
+
+
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in (
+        SearchScenario, HybridSearchScenario, BatchEmbedScenario,
+        BatchTranslateScenario, ClassifyScenario, ExtractTextScenario
+    )
+}
+
+
+class BenchmarkRunner:
+    """Drives a scenario through the Flask test client and summarises the timings.
+
+    Each worker thread gets its own test client. Latency covers the whole
+    request, including JSON serialisation and the stand-ins' injected delay.
+    """
+
+    def __init__(self, app, behaviour, requests=100, concurrency=4, warmup=5):
+        self.app = app
+        self.behaviour = behaviour
+        self.requests = requests
+        self.concurrency = concurrency
+        self.warmup = warmup
+        self.counter = None
+        self._local = threading.local()
+
+    def client(self):
+        if not hasattr(self._local, 'client'):
+            self._local.client = self.app.test_client()
+        return self._local.client
+
+    def send(self, scenario, index):
+        with self.app.app_context(), (self.counter.paused() if self.counter else nullcontext()):
+            scenario.before_request(index)
+        method, path, kwargs = scenario.request(index)
+        started = time.perf_counter()
+        response = self.client().open(path, method=method, **kwargs)
+        elapsed = time.perf_counter() - started
+        return elapsed, response.status_code
+
+    def run(self, scenario):
+        total = self.warmup + self.requests
+        with self.app.app_context():
+            scenario.prepare(total)
+
+        for index in range(self.warmup):
+            self.send(scenario, index)
+
+        concurrency = 1 if scenario.serial else self.concurrency
+        calls_before = self.behaviour.stats()
+        with self.app.app_context():
+            engine = db.engine
+        with QueryCounter(engine) as counter:
+            self.counter = counter
+            started = time.perf_counter()
+            try:
+                with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                    results = list(executor.map(lambda index: self.send(scenario, index), range(self.warmup, total)))
+            finally:
+                self.counter = None
+            wall_seconds = time.perf_counter() - started
+        calls_after = self.behaviour.stats()
+
+        latencies = [elapsed * 1000 for elapsed, _ in results]
+        return {
+            'scenario': scenario.name,
+            'requests': len(results),
+            'concurrency': concurrency,
+            'errors': sum(1 for _, status in results if status >= 400),
+            'throughput': len(results) / wall_seconds if wall_seconds else 0.0,
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95),
+            'p99_ms': percentile(latencies, 99),
+            'db_queries_per_request': counter.count / len(results) if results else 0.0,
+            'aws_calls': calls_after['calls'] - calls_before['calls'],
+            'throttled': calls_after['throttled'] - calls_before['throttled'],
+        }
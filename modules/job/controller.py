@@ -0,0 +1,24 @@
+from flask import jsonify
+import logging
+from modules.job.services import job_service
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def get_job(job_id):
+    try:
+        response = job_service.get_job(job_id)
+        if response is None:
+            return jsonify({'message': 'Job not found'}), 404
+
+        return jsonify({
+            'success': True,
+            'message': 'Job retrieved successfully',
+            'data': response
+        }), 200
+
+    except Exception as e:
+        logger.error(f"\n\n======== Error reading job ======== \n{str(e)}\n\n")
+        return jsonify({'success': False, 'message': 'An internal error occurred. Please try again later.'}), 500
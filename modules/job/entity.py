@@ -0,0 +1,16 @@
+from extensions import db
+from datetime import datetime
+
+
+class Job(db.Model):
+    id = db.Column(db.String(32), primary_key=True)
+    type = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)
+    params = db.Column(db.JSON, nullable=False, default=dict)
+    progress = db.Column(db.JSON, nullable=True)
+    result = db.Column(db.JSON, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    started_at = db.Column(db.DateTime, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
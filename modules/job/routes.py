@@ -0,0 +1,11 @@
+from flask import current_app
+from modules.job.controller import get_job
+from modules.job.services import job_service
+
+def register_job_routes(app):
+    app.add_url_rule('/api/jobs/<job_id>', view_func=get_job, methods=['GET'])
+
+    # Workers start with the first request, so CLI commands never spawn them
+    @app.before_request
+    def start_job_workers():
+        job_service.ensure_started(current_app._get_current_object())
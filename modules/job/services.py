@@ -0,0 +1,196 @@
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from extensions import db, get_logger
+from modules.job.entity import Job
+
+
+class JobBusyError(Exception):
+    """The same work is already running elsewhere; a queued job goes back to the queue."""
+
+
+class JobService:
+    """Database-backed job queue drained by background threads in each web worker.
+
+    Jobs are rows in the `job` table, so they survive restarts and any worker
+    can report on them. Worker threads claim the oldest queued job with
+    `FOR UPDATE SKIP LOCKED`, and a running job whose heartbeat goes stale
+    (its process died) is claimed again. A running job's heartbeat is
+    refreshed by a timer thread, independent of how often the handler
+    reports progress. The backfills it runs are resumable,
+    so a second attempt continues from their checkpoint. Exclusive job types
+    are not claimed while another job of the same type is running.
+    """
+
+    def __init__(self):
+        self.logger = get_logger('jobs')
+        self.handlers = {}
+        self.exclusive_types = set()
+        self.max_workers = int(os.getenv('JOB_MAX_WORKERS', 2))
+        self.poll_seconds = float(os.getenv('JOB_POLL_SECONDS', 1))
+        self.stale_seconds = float(os.getenv('JOB_STALE_SECONDS', 600))
+        self.heartbeat_seconds = float(os.getenv('JOB_HEARTBEAT_SECONDS', min(60.0, self.stale_seconds / 4)))
+        self._threads = []
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+
+    def register_handler(self, job_type, handler, exclusive=False):
+        """`handler(params, progress)` runs the job inside an app context and returns its result.
+
+        Set `exclusive` for jobs that share state, such as a backfill checkpoint,
+        so at most one of that type runs at a time.
+        """
+        self.handlers[job_type] = handler
+        if exclusive:
+            self.exclusive_types.add(job_type)
+
+    def ensure_started(self, app):
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self.max_workers):
+                thread = threading.Thread(target=self._work, args=(app,), name=f'job-worker-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            self.logger.info(f"[Jobs] Started {self.max_workers} job workers")
+
+    def enqueue(self, job_type, params):
+        if job_type not in self.handlers:
+            raise ValueError(f"Unknown job type '{job_type}'")
+        job = Job(id=uuid.uuid4().hex, type=job_type, status='queued', params=params)
+        db.session.add(job)
+        db.session.commit()
+        self._wake.set()
+        return self.serialize(job)
+
+    def get_job(self, job_id):
+        job = db.session.get(Job, job_id)
+        return self.serialize(job) if job else None
+
+    @staticmethod
+    def serialize(job):
+        progress = dict(job.progress or {})
+        if job.started_at and progress.get('succeeded'):
+            elapsed = ((job.finished_at or datetime.utcnow()) - job.started_at).total_seconds()
+            progress['items_per_second'] = round(progress['succeeded'] / elapsed, 2) if elapsed > 0 else None
+        return {
+            'id': job.id,
+            'type': job.type,
+            'status': job.status,
+            'params': job.params,
+            'progress': progress,
+            'result': job.result,
+            'error': job.error,
+            'created_at': job.created_at.isoformat() if job.created_at else None,
+            'started_at': job.started_at.isoformat() if job.started_at else None,
+            'finished_at': job.finished_at.isoformat() if job.finished_at else None
+        }
+
+    def _work(self, app):
+        while True:
+            try:
+                with app.app_context():
+                    job_id = self._claim()
+                    if job_id is not None:
+                        self._run(job_id)
+                        continue
+            except Exception as e:
+                self.logger.error(f"[Jobs] Worker error: {str(e)}")
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+
+    def _claim(self):
+        stale_before = datetime.utcnow() - timedelta(seconds=self.stale_seconds)
+        running = db.aliased(Job)
+        busy_types = db.select(running.type).where(
+            (running.status == 'running') & (running.heartbeat_at >= stale_before)
+        )
+        claimable = Job.type.not_in(list(self.exclusive_types)) | Job.type.not_in(busy_types)
+        job = db.session.execute(
+            db.select(Job).where(
+                ((Job.status == 'queued') & claimable) | ((Job.status == 'running') & (Job.heartbeat_at < stale_before))
+            ).order_by(Job.created_at).limit(1).with_for_update(of=Job, skip_locked=True)
+        ).scalar()
+        if job is None:
+            db.session.rollback()
+            return None
+
+        now = datetime.utcnow()
+        if job.status == 'running':
+            self.logger.warning(f"[Jobs] Reclaiming stale job {job.id}")
+        job.status = 'running'
+        job.started_at = job.started_at or now
+        job.heartbeat_at = now
+        db.session.commit()
+        return job.id
+
+    def _update(self, job_id, **values):
+        # Progress is written on its own connection so it never commits the
+        # handler's pending work in db.session
+        with db.engine.begin() as connection:
+            connection.execute(db.update(Job).where(Job.id == job_id).values(heartbeat_at=datetime.utcnow(), **values))
+
+    @contextmanager
+    def _heartbeat(self, job_id):
+        app = current_app._get_current_object()
+        stopped = threading.Event()
+
+        def beat():
+            while not stopped.wait(self.heartbeat_seconds):
+                try:
+                    with app.app_context(), db.engine.begin() as connection:
+                        connection.execute(
+                            db.update(Job).where((Job.id == job_id) & (Job.status == 'running'))
+                            .values(heartbeat_at=datetime.utcnow())
+                        )
+                except Exception as e:
+                    self.logger.warning(f"[Jobs] Heartbeat for job {job_id} failed: {str(e)}")
+
+        thread = threading.Thread(target=beat, name=f'job-heartbeat-{job_id}', daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stopped.set()
+            thread.join()
+
+    def _run(self, job_id):
+        job = db.session.get(Job, job_id)
+        job_type = job.type
+        params = dict(job.params or {})
+        db.session.commit()
+
+        started = time.perf_counter()
+        try:
+            handler = self.handlers.get(job_type)
+            if handler is None:
+                raise ValueError(f"No handler registered for job type '{job_type}'")
+            # A single long chunk may not report progress before the job looks stale
+            with self._heartbeat(job_id):
+                result = handler(params, lambda progress: self._update(job_id, progress=progress))
+        except JobBusyError as e:
+            # Two workers can claim same-type jobs at the same moment; the loser waits its turn
+            db.session.rollback()
+            self.logger.info(f"[Jobs] Job {job_id} ({job_type}) requeued: {str(e)}")
+            self._update(job_id, status='queued')
+            time.sleep(self.poll_seconds)
+            return
+        except Exception as e:
+            db.session.rollback()
+            self.logger.error(f"[Jobs] Job {job_id} ({job_type}) failed: {str(e)}")
+            self._update(job_id, status='failed', error=str(e), finished_at=datetime.utcnow())
+            return
+
+        self.logger.info(f"[Jobs] Job {job_id} ({job_type}) finished in {time.perf_counter() - started:.1f}s")
+        self._update(job_id, status='succeeded', result=result, finished_at=datetime.utcnow())
+
+
+job_service = JobService()
@@ -0,0 +1,185 @@
+import os
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from extensions import db, get_logger
+from modules.product.entity import Product
+
+
+class CentroidClassifier:
+    """Nearest-centroid category classifier over stored product embeddings.
+
+    Each category keeps the running sum and count of its members' normalised
+    embeddings, so products labelled since the last refresh can be folded in
+    with `refresh()` without rescanning the table. Predictions are a single matrix product
+    against the normalised centroids; a product counts as confident when its
+    best cosine similarity and its margin over the runner-up both clear the
+    configured thresholds.
+
+    `refresh()` works on its own sums and counts and publishes the result as
+    one `(categories, counts, centroids)` tuple at the end; `predict()` only
+    reads that tuple, so it never sees a half-built or cleared model.
+    """
+
+    def __init__(self, min_similarity=None, min_margin=None, min_examples=None):
+        self.logger = get_logger('classifier')
+        self.min_similarity = min_similarity if min_similarity is not None else float(os.getenv('CLASSIFIER_MIN_SIMILARITY', 0.6))
+        self.min_margin = min_margin if min_margin is not None else float(os.getenv('CLASSIFIER_MIN_MARGIN', 0.05))
+        self.min_examples = min_examples if min_examples is not None else int(os.getenv('CLASSIFIER_MIN_EXAMPLES', 20))
+        self.categories = []
+        self.category_index = {}
+        self.sums = None
+        self.counts = None
+        self.model = None
+        # Category index each folded product was counted under, by product id; -1 if not folded
+        self.members = np.full(0, -1, dtype=np.int32)
+        self.watermark = None
+        self.overlap = timedelta(seconds=float(os.getenv('CLASSIFIER_SYNC_OVERLAP_SECONDS', 60)))
+        self._lock = threading.Lock()
+
+    @property
+    def is_ready(self):
+        return self.model is not None
+
+    @staticmethod
+    def normalise(vectors):
+        if not isinstance(vectors, np.ndarray):
+            # halfvec columns come back as HalfVector objects rather than arrays
+            vectors = [vector.to_numpy() if hasattr(vector, 'to_numpy') else vector for vector in vectors]
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def reset(self):
+        with self._lock:
+            self._clear()
+            self.model = None
+
+    def _clear(self):
+        self.categories = []
+        self.category_index = {}
+        self.sums = None
+        self.counts = None
+        self.members = np.full(0, -1, dtype=np.int32)
+        self.watermark = None
+
+    def fetch_rows(self, since, last_id, limit, exclude_ids=None):
+        """Next `limit` products after `last_id`: every labelled and embedded one, or those updated since `since`."""
+        query = db.session.query(Product.id, Product.category, Product.embedding).filter(Product.id > last_id)
+        if since is None:
+            query = query.filter(Product.category.isnot(None) & Product.embedding.isnot(None))
+        else:
+            # Unlabelled rows are kept so a product whose label was removed is noticed
+            query = query.filter(Product.updated_at >= since)
+        if exclude_ids:
+            query = query.filter(Product.id.notin_(exclude_ids))
+        return query.order_by(Product.id).limit(limit).all()
+
+    def refresh(self, full=False, exclude_ids=None, batch_size=1000):
+        """Fold products labelled since the last refresh into the centroids.
+
+        Changed rows are found by `updated_at`, less CLASSIFIER_SYNC_OVERLAP_SECONDS
+        for writes that committed late, so older products labelled after the
+        last refresh are picked up too. Each product is counted once; if one
+        that was already folded in changes category, its old contribution
+        cannot be subtracted, so the centroids are rebuilt from scratch.
+        Pass `full=True` to force a rebuild.
+        """
+        with self._lock:
+            if full:
+                self._clear()
+
+            started_at = datetime.utcnow()
+            since = self.watermark - self.overlap if self.watermark is not None else None
+            added, relabelled = self._fold(since, exclude_ids, batch_size)
+            if relabelled:
+                self.logger.info("[Classifier] Folded products changed category, rebuilding the centroids")
+                self._clear()
+                added, _ = self._fold(None, exclude_ids, batch_size)
+            self.watermark = started_at
+
+            if self.sums is not None and len(self.sums):
+                self.model = (tuple(self.categories), self.counts.copy(), self.normalise(self.sums))
+            else:
+                self.model = None
+
+        self.logger.info(f"[Classifier] Folded {added} labelled products into {len(self.categories)} centroids")
+        return added
+
+    def _fold(self, since, exclude_ids, batch_size):
+        """Accumulate unseen labelled rows; returns (added, whether a folded product changed category)."""
+        added = 0
+        last_id = 0
+        while True:
+            rows = self.fetch_rows(since, last_id, batch_size, exclude_ids)
+            if not rows:
+                return added, False
+            last_id = rows[-1].id
+
+            fresh = []
+            for row in rows:
+                folded = self.members[row.id] if row.id < len(self.members) else -1
+                if folded >= 0:
+                    if self.categories[folded] != row.category:
+                        return added, True
+                elif row.category is not None and row.embedding is not None:
+                    fresh.append(row)
+            if fresh:
+                added += self._accumulate(fresh)
+
+    def _accumulate(self, rows):
+        for row in rows:
+            if row.category not in self.category_index:
+                self.category_index[row.category] = len(self.categories)
+                self.categories.append(row.category)
+
+        vectors = self.normalise([row.embedding for row in rows]).astype(np.float64)
+        if self.sums is None:
+            self.sums = np.zeros((0, vectors.shape[1]), dtype=np.float64)
+            self.counts = np.zeros(0, dtype=np.int64)
+        missing = len(self.categories) - len(self.sums)
+        if missing:
+            self.sums = np.vstack([self.sums, np.zeros((missing, self.sums.shape[1]))])
+            self.counts = np.concatenate([self.counts, np.zeros(missing, dtype=np.int64)])
+
+        indices = np.fromiter((self.category_index[row.category] for row in rows), dtype=np.int64, count=len(rows))
+        np.add.at(self.sums, indices, vectors)
+        np.add.at(self.counts, indices, 1)
+
+        ids = np.fromiter((row.id for row in rows), dtype=np.int64, count=len(rows))
+        if ids.max() >= len(self.members):
+            grown = np.full(max(int(ids.max()) + 1, len(self.members) * 2), -1, dtype=np.int32)
+            grown[:len(self.members)] = self.members
+            self.members = grown
+        self.members[ids] = indices
+        return len(rows)
+
+    def predict(self, vectors):
+        """Return `(category, similarity, confident)` for each input vector."""
+        model = self.model
+        if model is None or len(vectors) == 0:
+            return [(None, 0.0, False) for _ in vectors]
+
+        categories, counts, centroids = model
+        scores = self.normalise(vectors) @ centroids.T
+        # Categories with too few examples can still win, but never confidently
+        eligible = counts >= self.min_examples
+        if scores.shape[1] > 1:
+            top_two = np.argpartition(-scores, 1, axis=1)[:, :2]
+        else:
+            top_two = np.zeros((len(scores), 2), dtype=np.int64)
+        rows = np.arange(len(scores))
+        first = scores[rows, top_two[:, 0]]
+        second = scores[rows, top_two[:, 1]]
+        swap = second > first
+        best = np.where(swap, top_two[:, 1], top_two[:, 0])
+        best_score = np.maximum(first, second)
+        margin = np.abs(first - second) if scores.shape[1] > 1 else np.ones(len(scores))
+
+        confident = (best_score >= self.min_similarity) & (margin >= self.min_margin) & eligible[best]
+        return [
+            (categories[index], float(score), bool(is_confident))
+            for index, score, is_confident in zip(best, best_score, confident)
+        ]
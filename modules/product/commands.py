@@ -0,0 +1,316 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+import numpy as np
+from sqlalchemy import func, text
+
+from extensions import db
+from modules.product.classifier import CentroidClassifier
+from modules.product.entity import EMBEDDING_DIMENSIONS, EMBEDDING_STORAGE, Product
+from modules.product.search_cache import bump_catalogue_generation
+from modules.product.search_engine import MmapSearchEngine, PgvectorSearchEngine
+from modules.shared.services.throttling import AdaptiveThrottle
+
+
+def _ranked_ids(query_vector, k, settings):
+    for name, value in settings.items():
+        db.session.execute(text("SELECT set_config(:name, :value, true)"), {'name': name, 'value': str(value)})
+
+    started = time.perf_counter()
+    rows = db.session.query(Product.id).filter(
+        (Product.embedding.isnot(None)) & (Product.in_stock == True)
+    ).order_by(Product.embedding.cosine_distance(query_vector)).limit(k).all()
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    # Drop the transaction so SET LOCAL values never leak into the next run
+    db.session.rollback()
+    return [row.id for row in rows], elapsed_ms
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _embed_all(bedrock_service, texts, dimensions, throttle, max_workers=8):
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        vectors = list(executor.map(
+            lambda text: throttle.call(bedrock_service.get_embedding, text, use_cache=False, dimensions=dimensions),
+            texts
+        ))
+    matrix = np.asarray(vectors, dtype=np.float32)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+EMBEDDING_TYPE_QUERY = text(
+    "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+    "WHERE attrelid = 'product'::regclass AND attname = 'embedding'"
+)
+
+
+def _ann_index_sql(storage):
+    index_type = os.getenv('EMBEDDING_INDEX_TYPE', 'hnsw').lower()
+    if index_type == 'hnsw':
+        options = f"m = {int(os.getenv('EMBEDDING_HNSW_M', 16))}, ef_construction = {int(os.getenv('EMBEDDING_HNSW_EF_CONSTRUCTION', 64))}"
+    elif index_type == 'ivfflat':
+        options = f"lists = {int(os.getenv('EMBEDDING_IVFFLAT_LISTS', 100))}"
+    else:
+        raise click.BadParameter(f"Unsupported EMBEDDING_INDEX_TYPE '{index_type}'. Use 'hnsw' or 'ivfflat'.")
+    return (
+        f"CREATE INDEX ix_product_embedding_ann ON product USING {index_type} (embedding {storage}_cosine_ops) "
+        f"WITH ({options}) WHERE in_stock = true"
+    )
+
+
+def _top_k(corpus, queries, k):
+    scores = queries @ corpus.T
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return [set(row) for row in top]
+
+
+def register_product_commands(app):
+
+    @app.cli.command('ann-report')
+    @click.option('--queries', default=50, show_default=True, help='Number of sampled products used as queries.')
+    @click.option('--k', default=30, show_default=True, help='Number of neighbours compared per query.')
+    @click.option('--ef-search', 'ef_search_values', default='10,20,40,80,160', show_default=True,
+                  help='Comma separated hnsw.ef_search values to test.')
+    @click.option('--probes', 'probes_values', default='1,5,10,20,50', show_default=True,
+                  help='Comma separated ivfflat.probes values to test.')
+    def ann_report(queries, k, ef_search_values, probes_values):
+        """Report recall@k and latency of the ANN index against exact search."""
+        samples = db.session.query(Product.embedding).filter(
+            (Product.embedding.isnot(None)) & (Product.in_stock == True)
+        ).order_by(func.random()).limit(queries).all()
+        db.session.rollback()
+
+        if not samples:
+            click.echo('No embedded in-stock products to sample from.')
+            return
+
+        query_vectors = [sample.embedding for sample in samples]
+
+        exact = []
+        exact_latencies = []
+        for query_vector in query_vectors:
+            ids, elapsed_ms = _ranked_ids(query_vector, k, {'enable_indexscan': 'off'})
+            exact.append(set(ids))
+            exact_latencies.append(elapsed_ms)
+
+        runs = [('exact', {'enable_indexscan': 'off'})]
+        runs += [(f'ef_search={value}', {'hnsw.ef_search': value}) for value in ef_search_values.split(',') if value]
+        runs += [(f'probes={value}', {'ivfflat.probes': value}) for value in probes_values.split(',') if value]
+
+        click.echo(f'{len(query_vectors)} queries, k={k}')
+        click.echo(f"{'setting':<20}{'recall@k':>10}{'p50 ms':>10}{'p95 ms':>10}")
+        for label, settings in runs:
+            if label == 'exact':
+                recalls = [1.0] * len(exact)
+                latencies = exact_latencies
+            else:
+                recalls = []
+                latencies = []
+                for query_vector, expected in zip(query_vectors, exact):
+                    ids, elapsed_ms = _ranked_ids(query_vector, k, settings)
+                    recalls.append(len(expected.intersection(ids)) / len(expected) if expected else 1.0)
+                    latencies.append(elapsed_ms)
+
+            recall = sum(recalls) / len(recalls)
+            click.echo(f'{label:<20}{recall:>10.3f}{_percentile(latencies, 50):>10.2f}{_percentile(latencies, 95):>10.2f}')
+
+    @app.cli.command('classifier-report')
+    @click.option('--sample', default=500, show_default=True, help='Number of labelled products held out for evaluation.')
+    @click.option('--live', is_flag=True, help='Ask the model for fresh labels instead of using the stored categories.')
+    @click.option('--thresholds', default='0.4,0.5,0.6,0.7,0.8', show_default=True,
+                  help='Comma separated minimum similarities to report.')
+    def classifier_report(sample, live, thresholds):
+        """Report how often the centroid classifier agrees with the model's labels."""
+        from modules.product.controller import product_service
+
+        held_out = db.session.query(Product.id, Product.name, Product.category, Product.embedding).filter(
+            (Product.category.isnot(None)) & (Product.embedding.isnot(None))
+        ).order_by(func.random()).limit(sample).all()
+        if not held_out:
+            click.echo('No labelled products with embeddings to evaluate.')
+            return
+
+        # Centroids are built without the held-out products so they cannot vote for themselves
+        classifier = CentroidClassifier(min_similarity=0.0, min_margin=0.0, min_examples=0)
+        classifier.refresh(exclude_ids=[product.id for product in held_out])
+
+        if live:
+            throttle = AdaptiveThrottle()
+            expected = {}
+            for chunk in product_service.chunk_for_classification(held_out, 4096, 100):
+                classified = product_service.classify_chunk(chunk, 4096, throttle)
+                expected.update({product_id: item['category'] for product_id, item in classified.items()})
+        else:
+            expected = {product.id: product.category for product in held_out}
+
+        predictions = classifier.predict([product.embedding for product in held_out])
+
+        click.echo(f"{len(held_out)} held-out products, {len(classifier.categories)} categories, labels from {'model' if live else 'stored categories'}")
+        click.echo(f"{'min similarity':<16}{'coverage':>10}{'agreement':>11}")
+        for threshold in [float(value) for value in thresholds.split(',') if value]:
+            confident = [
+                (product, category) for product, (category, similarity, _) in zip(held_out, predictions)
+                if similarity >= threshold and product.id in expected
+            ]
+            agreed = sum(1 for product, category in confident if category.lower() == expected[product.id].lower())
+            coverage = len(confident) / len(held_out)
+            agreement = agreed / len(confident) if confident else 0.0
+            click.echo(f'{threshold:<16.2f}{coverage:>10.1%}{agreement:>11.1%}')
+
+    @app.cli.command('embedding-benchmark')
+    @click.option('--sample', default=500, show_default=True, help='Number of products embedded as the corpus.')
+    @click.option('--queries', default=50, show_default=True, help='Number of product names used as queries.')
+    @click.option('--k', default=10, show_default=True, help='Number of neighbours compared per query.')
+    def embedding_benchmark(sample, queries, k):
+        """Compare recall@k, scan latency and row size of each dimension/storage setting against 1024-d float32.
+
+        Latency is an exact in-process scan over the sample; run `ann-report`
+        after migrating to measure the indexed query in Postgres.
+        """
+        from modules.product.controller import product_service
+
+        products = db.session.query(
+            Product.id,
+            Product.name,
+            Product.description,
+            Product.category,
+            Product.price,
+            Product.name_ar,
+            Product.description_ar
+        ).order_by(func.random()).limit(sample).all()
+        if len(products) <= k:
+            click.echo(f'Need more than {k} products to benchmark.')
+            return
+
+        corpus_texts = [product_service.build_embedding_text(product) for product in products]
+        query_texts = [product.name for product in products[:queries]]
+        throttle = AdaptiveThrottle()
+
+        baseline_corpus = _embed_all(product_service.bedrock_service, corpus_texts, 1024, throttle)
+        baseline_queries = _embed_all(product_service.bedrock_service, query_texts, 1024, throttle)
+        expected = _top_k(baseline_corpus, baseline_queries, k)
+
+        click.echo(f'{len(products)} products, {len(query_texts)} queries, k={k}, baseline 1024-d float32')
+        click.echo(f"{'setting':<18}{'bytes/row':>10}{'recall@k':>10}{'ms/query':>10}")
+        for dimensions in (1024, 512, 256):
+            if dimensions == 1024:
+                corpus, query_vectors = baseline_corpus, baseline_queries
+            else:
+                corpus = _embed_all(product_service.bedrock_service, corpus_texts, dimensions, throttle)
+                query_vectors = _embed_all(product_service.bedrock_service, query_texts, dimensions, throttle)
+
+            for storage, dtype in (('vector', np.float32), ('halfvec', np.float16)):
+                # pgvector computes halfvec distances in float32, so only the
+                # stored values lose precision
+                stored = corpus.astype(dtype).astype(np.float32)
+                started = time.perf_counter()
+                found = _top_k(stored, query_vectors, k)
+                elapsed_ms = (time.perf_counter() - started) * 1000 / len(query_vectors)
+
+                recall = np.mean([len(expected_ids & found_ids) / k for expected_ids, found_ids in zip(expected, found)])
+                # pgvector stores 8 header bytes plus the elements
+                row_bytes = 8 + dimensions * np.dtype(dtype).itemsize
+                click.echo(f'{f"{dimensions}-d {storage}":<18}{row_bytes:>10}{recall:>10.3f}{elapsed_ms:>10.3f}')
+
+    @app.cli.command('vector-index')
+    @click.argument('action', type=click.Choice(['build', 'sync']))
+    def vector_index(action):
+        """Build the memory-mapped vector index from scratch, or sync it with recent product changes."""
+        engine = MmapSearchEngine()
+        if action == 'build':
+            count = engine.rebuild()
+            click.echo(f'Indexed {count} products in {engine.index.directory}')
+        else:
+            appended, tombstoned = engine.sync()
+            click.echo(f'{appended} rows appended, {tombstoned} tombstoned')
+
+    @app.cli.command('resize-embeddings')
+    @click.option('--yes', is_flag=True, help='Do not ask before clearing embeddings on a dimension change.')
+    def resize_embeddings(yes):
+        """Change product.embedding to EMBEDDING_DIMENSIONS and EMBEDDING_STORAGE.
+
+        Migrations always leave the column as vector(1024), so every database
+        gets the same schema from the same revision. A storage change casts
+        the stored vectors; a dimension change clears them and the neighbour
+        lists, and `batch-embed` has to run again afterwards.
+        """
+        current = db.session.execute(EMBEDDING_TYPE_QUERY).scalar()
+        target = f'{EMBEDDING_STORAGE}({EMBEDDING_DIMENSIONS})'
+        if current == target:
+            click.echo(f'product.embedding is already {target}.')
+            return
+
+        current_dimensions = int(current[current.index('(') + 1:-1])
+        resized = current_dimensions != EMBEDDING_DIMENSIONS
+        if resized and not yes:
+            click.confirm(f'Changing {current} to {target} clears every stored embedding. Continue?', abort=True)
+
+        try:
+            db.session.execute(text('DROP INDEX IF EXISTS ix_product_embedding_ann'))
+            if resized:
+                db.session.execute(text('DELETE FROM product_neighbour'))
+                db.session.execute(text(
+                    f'ALTER TABLE product ALTER COLUMN embedding TYPE {target} USING NULL'
+                ))
+                # Cleared rows must look stale to the hash-driven backfill
+                db.session.execute(text('UPDATE product SET embedding_hash = NULL WHERE embedding_hash IS NOT NULL'))
+            else:
+                db.session.execute(text(
+                    f'ALTER TABLE product ALTER COLUMN embedding TYPE {target} USING embedding::{target}'
+                ))
+            db.session.execute(text(_ann_index_sql(EMBEDDING_STORAGE)))
+            bump_catalogue_generation()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        click.echo(f'product.embedding changed from {current} to {target}.')
+        if resized:
+            click.echo('Embeddings were cleared; run `flask vector-index build` after batch-embed finishes.')
+
+    @app.cli.command('search-engine-benchmark')
+    @click.option('--queries', default=50, show_default=True, help='Number of sampled products used as queries.')
+    @click.option('--k', default=30, show_default=True, help='Number of results compared per query.')
+    def search_engine_benchmark(queries, k):
+        """Compare latency and overlap@k of the mmap engine against the pgvector query path."""
+        samples = db.session.query(Product.embedding).filter(
+            (Product.embedding.isnot(None)) & (Product.in_stock == True)
+        ).order_by(func.random()).limit(queries).all()
+        db.session.rollback()
+        if not samples:
+            click.echo('No embedded in-stock products to sample from.')
+            return
+
+        mmap_engine = MmapSearchEngine()
+        if not mmap_engine.index.exists():
+            click.echo('No vector index found; run `flask vector-index build` first.')
+            return
+        mmap_engine.sync()
+
+        results = {}
+        latencies = {}
+        for engine in (PgvectorSearchEngine(), mmap_engine):
+            results[engine.name] = []
+            latencies[engine.name] = []
+            for sample in samples:
+                started = time.perf_counter()
+                rows = engine.search(sample.embedding, limit=k)
+                latencies[engine.name].append((time.perf_counter() - started) * 1000)
+                results[engine.name].append({row['id'] for row in rows})
+                db.session.rollback()
+
+        overlaps = [
+            len(expected & found) / len(expected) if expected else 1.0
+            for expected, found in zip(results['pgvector'], results['mmap'])
+        ]
+        click.echo(f'{len(samples)} queries, k={k}, overlap@k with pgvector {sum(overlaps) / len(overlaps):.3f}')
+        click.echo(f"{'engine':<12}{'p50 ms':>10}{'p95 ms':>10}")
+        for name, values in latencies.items():
+            click.echo(f'{name:<12}{_percentile(values, 50):>10.2f}{_percentile(values, 95):>10.2f}')
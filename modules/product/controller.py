@@ -1,6 +1,14 @@
-from flask import request, jsonify
+from flask import request, jsonify, make_response, current_app
+from werkzeug.datastructures import MultiDict
 import logging
-from modules.product.services import ProductService
+import os
+from modules.job.services import JobBusyError, job_service
+from modules.product.services import ProductService, PRODUCT_READ_FIELDS, DEFAULT_READ_FIELDS
+from modules.product.search_cache import get_catalogue_generation, get_search_cache
+from modules.product.search_engine import required_ef_search
+from modules.shared.services.database import use_replica
+from modules.shared.services.metrics import SERIALISE_SECONDS, timed
+from modules.shared.services.resilience import Deadline, ServiceUnavailableError
 
 
 logging.basicConfig(level=logging.INFO)
@@ -8,19 +16,44 @@ logger = logging.getLogger(__name__)
 
 product_service = ProductService()
 
+job_service.register_handler('classify', lambda params, progress: product_service.update_product_category(progress=progress, **params), exclusive=True)
+job_service.register_handler('translate', lambda params, progress: product_service.batch_translate(progress=progress, **params), exclusive=True)
+job_service.register_handler('batch-embed', lambda params, progress: product_service.batch_embedding(progress=progress, **params), exclusive=True)
+job_service.register_handler('refresh-neighbours', lambda params, progress: product_service.refresh_neighbours(progress=progress, **params), exclusive=True)
+
+
+def enqueue_job(job_type, params):
+    job = job_service.enqueue(job_type, params)
+    response = jsonify({
+        'success': True,
+        'message': 'Job queued successfully',
+        'data': job
+    })
+    response.headers['Location'] = f"/api/jobs/{job['id']}"
+    return response, 202
+
 
 def classify_products():
     try:
         product_ids = request.json.get('product_ids', [])
         if not product_ids:
             return jsonify({'message': 'Product IDs are required'}), 400
+        if not isinstance(product_ids, list) or not all(isinstance(product_id, int) for product_id in product_ids):
+            return jsonify({'message': 'product_ids must be a list of integers'}), 400
+        if len(product_ids) > 10000:
+            return jsonify({'message': 'At most 10000 product IDs can be classified per request'}), 400
 
-        result = product_service.update_product_category(product_ids)
+        use_local = request.json.get('use_local_classifier', True)
+        if request.json.get('async'):
+            return enqueue_job('classify', {'product_ids': product_ids, 'use_local': bool(use_local)})
+
+        deadline = Deadline.from_env('CLASSIFY_LATENCY_BUDGET_MS', 120000)
+        result = product_service.update_product_category(product_ids, use_local=bool(use_local), deadline=deadline)
 
         return jsonify({
             'success': True,
             'message': 'Products classified successfully',
-            'data': {'classified_products': result}
+            'data': result
         }), 200
         
     except Exception as e:
@@ -29,14 +62,63 @@ def classify_products():
     
     
     
+def refresh_classifier():
+    try:
+        data = request.get_json(silent=True) or {}
+        response = product_service.refresh_category_classifier(full=bool(data.get('full', False)))
+
+        return jsonify({
+            'success': True,
+            'message': 'Classifier refreshed successfully',
+            'data': response
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Error refreshing classifier: {str(e)}")
+        return jsonify({'success': False, 'message': 'An internal error occurred. Please try again later.'}), 500
+
+
+def parse_backfill_options(data):
+    options = {
+        'chunk_size': data.get('chunk_size'),
+        'max_items': data.get('max_items'),
+        'time_budget': data.get('time_budget_seconds'),
+        'retry_failed': bool(data.get('retry_failed', False)),
+        'reset': bool(data.get('reset', False))
+    }
+    for option, key, upper_bound in (
+        ('chunk_size', 'chunk_size', 1000),
+        ('max_items', 'max_items', 10_000_000),
+        ('time_budget_seconds', 'time_budget', 86_400)
+    ):
+        value = options[key]
+        if value is not None and (not isinstance(value, (int, float)) or isinstance(value, bool) or not 0 < value <= upper_bound):
+            return None, f'{option} must be a positive number up to {upper_bound}'
+    return options, None
+
+
 def translate_product_info():
     try:
-        product_service.batch_translate()
+        data = request.get_json(silent=True) or {}
+        options, error = parse_backfill_options(data)
+        if error:
+            return jsonify({'message': error}), 400
+        max_workers = data.get('max_workers')
+        if max_workers is not None and (not isinstance(max_workers, int) or not 1 <= max_workers <= 64):
+            return jsonify({'message': 'max_workers must be an integer between 1 and 64'}), 400
+
+        if data.get('async'):
+            return enqueue_job('translate', {'max_workers': max_workers, **options})
+
+        try:
+            response = product_service.batch_translate(max_workers=max_workers, **options)
+        except JobBusyError as e:
+            return jsonify({'message': str(e)}), 409
         
         return jsonify({
             'success': True,
-            'message': 'Translation completed successfully',
-            'data': None
+            'message': f"Translation {response['status']}",
+            'data': response
         }), 200
         
     except Exception as e:
@@ -46,42 +128,408 @@ def translate_product_info():
     
 def embed_products():
     try:
-        response = product_service.batch_embedding()
+        data = request.get_json(silent=True) or {}
+        options, error = parse_backfill_options(data)
+        if error:
+            return jsonify({'message': error}), 400
+        max_workers = data.get('max_workers')
+        if max_workers is not None and (not isinstance(max_workers, int) or not 1 <= max_workers <= 64):
+            return jsonify({'message': 'max_workers must be an integer between 1 and 64'}), 400
+
+        if data.get('async'):
+            return enqueue_job('batch-embed', {'max_workers': max_workers, **options})
+
+        try:
+            response = product_service.batch_embedding(max_workers=max_workers, **options)
+        except JobBusyError as e:
+            return jsonify({'message': str(e)}), 409
         
         return jsonify({
             'success': True,
-            'message': 'Embedding completed successfully',
+            'message': f"Embedding {response['status']}",
             'data': {'result': response}
         }), 200
         
     except Exception as e:
         logger.error(f"\n\n======== Error embedding products ======== \n{str(e)}\n\n")
         return jsonify({'success': False, 'message': 'An internal error occurred. Please try again later.'}), 500
+
+
+def backfill_status(job_name):
+    try:
+        response = product_service.get_backfill_status(job_name)
+        if response is None:
+            return jsonify({'message': f"No backfill named '{job_name}' has run yet"}), 404
+
+        return jsonify({
+            'success': True,
+            'message': 'Backfill status retrieved successfully',
+            'data': response
+        }), 200
+
+    except Exception as e:
+        logger.error(f"\n\n======== Error reading backfill status ======== \n{str(e)}\n\n")
+        return jsonify({'success': False, 'message': 'An internal error occurred. Please try again later.'}), 500
     
     
+def parse_search_filters(args):
+    in_stock = args.get('in_stock', 'true').lower()
+    if in_stock not in ('true', 'false', 'any'):
+        return None, "in_stock must be 'true', 'false' or 'any'"
+
+    filters = {
+        'category': args.get('category') or None,
+        'min_price': args.get('min_price', type=float),
+        'max_price': args.get('max_price', type=float),
+        'in_stock': None if in_stock == 'any' else in_stock == 'true'
+    }
+    if filters['min_price'] is not None and filters['max_price'] is not None and filters['min_price'] > filters['max_price']:
+        return None, 'min_price must not be greater than max_price'
+    return filters, None
+
+
 def semantic_search():
     try:
         query_text = request.args.get('query')
         if not query_text:
             return jsonify({'message': 'query text required'})
 
-        response = product_service.semantic_search(query_text)
+        limit = request.args.get('limit', 30, type=int)
+        offset = request.args.get('offset', 0, type=int)
+        min_similarity = request.args.get('min_similarity', type=float)
+        if limit < 1 or limit > 100:
+            return jsonify({'message': 'limit must be between 1 and 100'}), 400
+        if offset < 0:
+            return jsonify({'message': 'offset must be a non-negative integer'}), 400
+        if min_similarity is not None and not -1 <= min_similarity <= 1:
+            return jsonify({'message': 'min_similarity must be between -1 and 1'}), 400
+
+        ef_search = request.args.get('ef_search', type=int)
+        probes = request.args.get('probes', type=int)
+        if ef_search is not None and not 1 <= ef_search <= 1000:
+            return jsonify({'message': 'ef_search must be between 1 and 1000'}), 400
+        if probes is not None and not 1 <= probes <= 1000:
+            return jsonify({'message': 'probes must be between 1 and 1000'}), 400
+
+        mode = request.args.get('mode', 'vector')
+        if mode not in ('vector', 'hybrid'):
+            return jsonify({'message': "mode must be 'vector' or 'hybrid'"}), 400
+        # Hybrid search ranks a fixed pool of vector candidates before paging
+        rows_needed = int(os.getenv('HYBRID_CANDIDATES', 100)) if mode == 'hybrid' else limit + offset
+        if ef_search is not None and ef_search < required_ef_search(rows_needed):
+            return jsonify({'message': f'ef_search must be at least {required_ef_search(rows_needed)} to return {rows_needed} rows'}), 400
+
+        filters, error = parse_search_filters(request.args)
+        if error:
+            return jsonify({'message': error}), 400
+
+        search_cache = get_search_cache()
+        query_text = search_cache.normalise_query(query_text)
+        cache_key = search_cache.make_key({
+            'query': query_text, 'mode': mode, 'limit': limit, 'offset': offset,
+            # Hybrid search ignores min_similarity, so it must not split its entries
+            'min_similarity': min_similarity if mode == 'vector' else None,
+            'ef_search': ef_search, 'probes': probes, **filters
+        })
+        # Read from the same side as the search, so a lagging replica's results
+        # are cached under the generation they reflect
+        with use_replica():
+            generation = get_catalogue_generation()
+        body = search_cache.get(cache_key, generation)
+        if body is not None:
+            return current_app.response_class(body, status=200, mimetype='application/json')
+
+        deadline = Deadline.from_env('SEARCH_LATENCY_BUDGET_MS', 3000)
+        try:
+            if mode == 'hybrid':
+                response = product_service.hybrid_search(
+                    query_text,
+                    limit=limit,
+                    offset=offset,
+                    ef_search=ef_search,
+                    probes=probes,
+                    deadline=deadline,
+                    **filters
+                )
+            else:
+                response = product_service.semantic_search(
+                    query_text,
+                    limit=limit,
+                    offset=offset,
+                    min_similarity=min_similarity,
+                    ef_search=ef_search,
+                    probes=probes,
+                    deadline=deadline,
+                    **filters
+                )
+        except ServiceUnavailableError as e:
+            logger.warning(f"Embedding unavailable ({str(e)}), falling back to lexical search")
+            response = product_service.lexical_search(query_text, limit=limit, offset=offset, **filters)
+            return jsonify({
+                'success': True,
+                'message': 'Semantic search unavailable, returned lexical results',
+                'degraded': True,
+                'data': response
+            }), 200
+
+        with timed(SERIALISE_SECONDS, stage='serialise', endpoint='search'):
+            result = jsonify({
+                'success': True,
+                'message': 'Semantic search completed successfully',
+                'data': response
+            })
+        # Degraded (lexical fallback) responses are never cached
+        search_cache.set(cache_key, generation, result.get_data())
+        return result, 200
+        
+    except Exception as e:
+        logger.error(f"\n\n======== Error searching products ======== \n{str(e)}\n\n")
+        return jsonify({'success': False, 'message': 'An internal error occurred. Please try again later.'}), 500
+    
+
+def batch_search():
+    try:
+        data = request.get_json(silent=True) or {}
+        queries = data.get('queries')
+        max_queries = int(os.getenv('SEARCH_BATCH_MAX_QUERIES', 500))
+        if not queries or not isinstance(queries, list) or not all(isinstance(query, str) and query.strip() for query in queries):
+            return jsonify({'message': 'queries must be a non-empty list of query strings'}), 400
+        if len(queries) > max_queries:
+            return jsonify({'message': f'At most {max_queries} queries can be searched per request'}), 400
+
+        limit = data.get('limit', 10)
+        min_similarity = data.get('min_similarity')
+        ef_search = data.get('ef_search')
+        probes = data.get('probes')
+        max_workers = data.get('max_workers')
+        if not isinstance(limit, int) or not 1 <= limit <= 100:
+            return jsonify({'message': 'limit must be between 1 and 100'}), 400
+        if min_similarity is not None and (not isinstance(min_similarity, (int, float)) or not -1 <= min_similarity <= 1):
+            return jsonify({'message': 'min_similarity must be between -1 and 1'}), 400
+        if ef_search is not None and (not isinstance(ef_search, int) or not 1 <= ef_search <= 1000):
+            return jsonify({'message': 'ef_search must be between 1 and 1000'}), 400
+        if ef_search is not None and ef_search < required_ef_search(limit):
+            return jsonify({'message': f'ef_search must be at least {required_ef_search(limit)} to return {limit} rows'}), 400
+        if probes is not None and (not isinstance(probes, int) or not 1 <= probes <= 1000):
+            return jsonify({'message': 'probes must be between 1 and 1000'}), 400
+        if max_workers is not None and (not isinstance(max_workers, int) or not 1 <= max_workers <= 64):
+            return jsonify({'message': 'max_workers must be between 1 and 64'}), 400
+
+        filters, error = parse_search_filters(MultiDict({
+            key: str(data[key]) for key in ('category', 'min_price', 'max_price', 'in_stock') if data.get(key) is not None
+        }))
+        if error:
+            return jsonify({'message': error}), 400
+
+        search_cache = get_search_cache()
+        response = product_service.batch_semantic_search(
+            [search_cache.normalise_query(query) for query in queries],
+            limit=limit,
+            min_similarity=min_similarity,
+            ef_search=ef_search,
+            probes=probes,
+            max_workers=max_workers,
+            deadline=Deadline.from_env('SEARCH_BATCH_LATENCY_BUDGET_MS', 60000),
+            **filters
+        )
 
         return jsonify({
             'success': True,
-            'message': 'Semantic search completed successfully',
+            'message': 'Batch search completed successfully',
             'data': response
         }), 200
-        
+
     except Exception as e:
-        logger.error(f"\n\n======== Error searching products ======== \n{str(e)}\n\n")
+        logger.error(f"\n\n======== Error with batch search ======== \n{str(e)}\n\n")
+        return jsonify({'success': False, 'message': 'An internal error occurred. Please try again later.'}), 500
+
+
+def search_cache_stats():
+    try:
+        return jsonify({
+            'success': True,
+            'message': 'Search cache statistics retrieved successfully',
+            'data': get_search_cache().stats()
+        }), 200
+
+    except Exception as e:
+        logger.error(f"\n\n======== Error reading search cache statistics ======== \n{str(e)}\n\n")
         return jsonify({'success': False, 'message': 'An internal error occurred. Please try again later.'}), 500
-    
+
+
+def parse_read_fields(args):
+    raw = args.get('fields')
+    if not raw:
+        return DEFAULT_READ_FIELDS, None
+    fields = tuple(dict.fromkeys(field.strip() for field in raw.split(',') if field.strip()))
+    unknown = [field for field in fields if field not in PRODUCT_READ_FIELDS]
+    if unknown or not fields:
+        return None, f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(PRODUCT_READ_FIELDS)}"
+    return fields, None
+
+
+def not_modified(etag):
+    response = make_response('', 304)
+    response.set_etag(etag)
+    return response
+
+
+def list_products():
+    try:
+        fields, error = parse_read_fields(request.args)
+        if error:
+            return jsonify({'message': error}), 400
+
+        limit = request.args.get('limit', 50, type=int)
+        if limit < 1 or limit > 500:
+            return jsonify({'message': 'limit must be between 1 and 500'}), 400
+
+        in_stock = request.args.get('in_stock', 'any').lower()
+        if in_stock not in ('true', 'false', 'any'):
+            return jsonify({'message': 'in_stock must be true, false or any'}), 400
+
+        try:
+            page = product_service.fetch_product_page(
+                fields=fields,
+                limit=limit,
+                cursor=request.args.get('cursor'),
+                category=request.args.get('category'),
+                in_stock=None if in_stock == 'any' else in_stock == 'true'
+            )
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+
+        if page['etag'] in request.if_none_match:
+            return not_modified(page['etag'])
+
+        with timed(SERIALISE_SECONDS, stage='serialise', endpoint='list_products'):
+            response = jsonify({
+                'success': True,
+                'message': 'Products retrieved successfully',
+                'data': [product_service.serialize_product_row(row, fields) for row in page['rows']],
+                'next_cursor': page['next_cursor']
+            })
+        response.set_etag(page['etag'])
+        return response, 200
+
+    except Exception as e:
+        logger.error(f"\n\n======== Error listing products ======== \n{str(e)}\n\n")
+        return jsonify({'success': False, 'message': 'An internal error occurred. Please try again later.'}), 500
+
+
+def get_product(product_id):
+    try:
+        fields, error = parse_read_fields(request.args)
+        if error:
+            return jsonify({'message': error}), 400
+
+        result = product_service.fetch_product(product_id, fields=fields)
+        if result is None:
+            return jsonify({'message': 'Product not found'}), 404
+
+        if result['etag'] in request.if_none_match:
+            return not_modified(result['etag'])
+
+        response = jsonify({
+            'success': True,
+            'message': 'Product retrieved successfully',
+            'data': product_service.serialize_product_row(result['row'], fields)
+        })
+        response.set_etag(result['etag'])
+        return response, 200
+
+    except Exception as e:
+        logger.error(f"\n\n======== Error reading product {product_id} ======== \n{str(e)}\n\n")
+        return jsonify({'success': False, 'message': 'An internal error occurred. Please try again later.'}), 500
+
+
+def similar_products(product_id):
+    try:
+        limit = request.args.get('limit', 10, type=int)
+        if limit < 1 or limit > 50:
+            return jsonify({'message': 'limit must be between 1 and 50'}), 400
+
+        response = product_service.similar_products(product_id, limit=limit)
+        if response is None:
+            return jsonify({'message': 'Product not found'}), 404
+
+        return jsonify({
+            'success': True,
+            'message': 'Similar products retrieved successfully',
+            'data': response
+        }), 200
+
+    except Exception as e:
+        logger.error(f"\n\n======== Error finding similar products ======== \n{str(e)}\n\n")
+        return jsonify({'success': False, 'message': 'An internal error occurred. Please try again later.'}), 500
+
+
+def refresh_neighbours():
+    try:
+        data = request.get_json(silent=True) or {}
+        options, error = parse_backfill_options(data)
+        if error:
+            return jsonify({'message': error}), 400
+        options.pop('reset')
+
+        if data.get('async'):
+            return enqueue_job('refresh-neighbours', {'full': bool(data.get('full', False)), **options})
+
+        try:
+            response = product_service.refresh_neighbours(full=bool(data.get('full', False)), **options)
+        except JobBusyError as e:
+            return jsonify({'message': str(e)}), 409
+
+        return jsonify({
+            'success': True,
+            'message': f"Neighbour refresh {response['status']}",
+            'data': response
+        }), 200
+
+    except Exception as e:
+        logger.error(f"\n\n======== Error refreshing neighbours ======== \n{str(e)}\n\n")
+        return jsonify({'success': False, 'message': 'An internal error occurred. Please try again later.'}), 500
+
+
+def ingest_products():
+    try:
+        data_format = request.args.get('format')
+        if data_format is None:
+            mimetype = request.mimetype
+            if mimetype == 'text/csv':
+                data_format = 'csv'
+            elif mimetype in ('application/x-ndjson', 'application/jsonl', 'application/json-seq'):
+                data_format = 'ndjson'
+        if data_format not in ('csv', 'ndjson'):
+            return jsonify({'message': "Send text/csv or application/x-ndjson, or pass format=csv|ndjson"}), 415
+
+        chunk_size = request.args.get('chunk_size', type=int)
+        if chunk_size is not None and not 1 <= chunk_size <= 50000:
+            return jsonify({'message': 'chunk_size must be between 1 and 50000'}), 400
+
+        response = product_service.ingest_products(request.stream, data_format, chunk_size=chunk_size)
+
+        return jsonify({
+            'success': True,
+            'message': 'Products ingested successfully',
+            'data': response
+        }), 200
+
+    except Exception as e:
+        logger.error(f"\n\n======== Error ingesting products ======== \n{str(e)}\n\n")
+        return jsonify({'success': False, 'message': 'An internal error occurred. Please try again later.'}), 500
+
 
 def extract_text():
     try:
         path = request.json.get('path')
-        response = product_service.handle_document_from_s3(path)
+        if not path or not isinstance(path, str):
+            return jsonify({'message': 'path is required'}), 400
+
+        try:
+            response = product_service.handle_document_from_s3(path)
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
 
         return jsonify({
             'success': True,
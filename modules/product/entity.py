@@ -1,8 +1,46 @@
-from pgvector.sqlalchemy import Vector
+import os
+from pgvector.sqlalchemy import HALFVEC, Vector
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from dotenv import load_dotenv
 from extensions import db
 from datetime import datetime
 # from pgvector.sqlalchemy.vector import Vector
 
+load_dotenv()
+
+# Titan v2 supports 256, 512 and 1024 output dimensions. Migrations create the
+# column as vector(1024); `flask resize-embeddings` applies these settings,
+# and a dimension change needs a re-embed of the catalogue.
+EMBEDDING_DIMENSIONS = int(os.getenv('EMBEDDING_DIMENSIONS', 1024))
+EMBEDDING_STORAGE = os.getenv('EMBEDDING_STORAGE', 'vector').lower()
+
+if EMBEDDING_DIMENSIONS not in (256, 512, 1024):
+    raise ValueError(f"EMBEDDING_DIMENSIONS must be 256, 512 or 1024, not {EMBEDDING_DIMENSIONS}")
+if EMBEDDING_STORAGE not in ('vector', 'halfvec'):
+    raise ValueError(f"EMBEDDING_STORAGE must be 'vector' or 'halfvec', not '{EMBEDDING_STORAGE}'")
+
+EmbeddingType = HALFVEC if EMBEDDING_STORAGE == 'halfvec' else Vector
+
+# Names use the 'simple' config as well so SKUs and brand names match verbatim
+PRODUCT_SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple'::regconfig, coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english'::regconfig, coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english'::regconfig, coalesce(description, '')), 'B') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(name_ar, '')), 'A') || "
+    "setweight(to_tsvector('arabic'::regconfig, coalesce(name_ar, '')), 'A') || "
+    "setweight(to_tsvector('arabic'::regconfig, coalesce(description_ar, '')), 'B')"
+)
+
+
+# Hash of every column that feeds ProductService.build_embedding_text. It is
+# maintained by Postgres, so any write path that changes the text changes it.
+PRODUCT_CONTENT_HASH = (
+    "md5(coalesce(name, '') || '|' || coalesce(description, '') || '|' || "
+    "coalesce(category, '') || '|' || coalesce(price::text, '') || '|' || "
+    "coalesce(name_ar, '') || '|' || coalesce(description_ar, ''))"
+)
+
+
 class Product(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -14,6 +52,41 @@ class Product(db.Model):
     price = db.Column(db.Float, nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
     in_stock = db.Column (db.Boolean, default=True)
-    embedding = db.Column(Vector(1024), nullable=True)
+    embedding = db.Column(EmbeddingType(EMBEDDING_DIMENSIONS), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    search_vector = db.Column(TSVECTOR, db.Computed(PRODUCT_SEARCH_VECTOR, persisted=True))
+    content_hash = db.Column(db.String(32), db.Computed(PRODUCT_CONTENT_HASH, persisted=True))
+    # content_hash of the row at the time `embedding` was computed
+    embedding_hash = db.Column(db.String(32), nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
+class BackfillCheckpoint(db.Model):
+    __tablename__ = 'backfill_checkpoint'
+
+    job_name = db.Column(db.String(50), primary_key=True)
+    last_id = db.Column(db.Integer, nullable=False, default=0)
+    processed = db.Column(db.Integer, nullable=False, default=0)
+    succeeded = db.Column(db.Integer, nullable=False, default=0)
+    failed_ids = db.Column(db.JSON, nullable=False, default=list)
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    last_error = db.Column(db.String(255), nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
+class CatalogueGeneration(db.Model):
+    __tablename__ = 'catalogue_generation'
+
+    name = db.Column(db.String(50), primary_key=True)
+    generation = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
+class ProductNeighbour(db.Model):
+    __tablename__ = 'product_neighbour'
 
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id', ondelete='CASCADE'), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+    neighbour_id = db.Column(db.Integer, db.ForeignKey('product.id', ondelete='CASCADE'), nullable=False, index=True)
+    distance = db.Column(db.Float, nullable=False)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
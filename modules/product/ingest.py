@@ -0,0 +1,167 @@
+import csv
+import io
+import json
+import os
+import time
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from extensions import db, get_logger
+from modules.product.entity import Product
+from modules.product.schema import ProductSchema
+from modules.product.search_cache import bump_catalogue_generation
+
+INGEST_COLUMNS = [
+    'name', 'description', 'name_ar', 'description_ar', 'category',
+    'price', 'quantity', 'in_stock', 'created_at', 'updated_at'
+]
+OPTIONAL_COLUMNS = {'name_ar', 'description_ar', 'category', 'created_at'}
+# What the decoder puts in place of bytes that are not valid UTF-8
+REPLACEMENT_CHARACTER = '\ufffd'
+INVALID_UTF8 = ['Line is not valid UTF-8']
+
+
+class ProductIngestor:
+    """Streams NDJSON or CSV product rows into the `product` table.
+
+    Rows are read one line at a time, validated against `ProductSchema` in
+    batches, and the valid rows of each batch are written with a single
+    `COPY ... FROM STDIN` (a multi-row INSERT on other databases) and
+    committed. Only one batch is held in memory at a time. A line that is not
+    valid UTF-8 is rejected like any other bad row, since earlier batches are
+    already committed by the time it is read.
+    """
+
+    def __init__(self, chunk_size=None, max_reported_errors=None):
+        self.logger = get_logger('ingest')
+        self.chunk_size = chunk_size or int(os.getenv('INGEST_CHUNK_SIZE', 5000))
+        self.max_reported_errors = max_reported_errors or int(os.getenv('INGEST_MAX_REPORTED_ERRORS', 1000))
+        self.schema = ProductSchema(many=True, load_instance=False, exclude=('embedding',))
+
+    def ingest(self, stream, data_format):
+        text_stream = io.TextIOWrapper(io.BufferedReader(stream), encoding='utf-8', errors='replace', newline='')
+        rows = self.iter_csv(text_stream) if data_format == 'csv' else self.iter_ndjson(text_stream)
+
+        started = time.perf_counter()
+        summary = {'received': 0, 'inserted': 0, 'rejected': 0, 'errors': []}
+        batch = []
+        for line_number, row, error in rows:
+            summary['received'] += 1
+            if error is not None:
+                self.reject(summary, line_number, error)
+                continue
+            batch.append((line_number, row))
+            if len(batch) >= self.chunk_size:
+                self.load_batch(batch, summary)
+                batch = []
+        if batch:
+            self.load_batch(batch, summary)
+
+        elapsed = time.perf_counter() - started
+        summary['elapsed_seconds'] = round(elapsed, 3)
+        summary['rows_per_second'] = round(summary['inserted'] / elapsed, 2) if elapsed else 0.0
+        return summary
+
+    @staticmethod
+    def iter_ndjson(text_stream):
+        for line_number, line in enumerate(text_stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            if REPLACEMENT_CHARACTER in line:
+                yield line_number, None, {'_encoding': INVALID_UTF8}
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_number, None, {'_json': [str(e)]}
+                continue
+            if not isinstance(row, dict):
+                yield line_number, None, {'_json': ['Each line must be a JSON object']}
+                continue
+            yield line_number, row, None
+
+    @staticmethod
+    def iter_csv(text_stream):
+        reader = csv.DictReader(text_stream)
+        for row in reader:
+            # Line 1 is the header, so data rows start at 2
+            line_number = reader.line_num
+            if None in row:
+                yield line_number, None, {'_csv': ['Row has more fields than the header']}
+                continue
+            if any(value and REPLACEMENT_CHARACTER in value for value in row.values()):
+                yield line_number, None, {'_encoding': INVALID_UTF8}
+                continue
+            yield line_number, {
+                key: (None if value == '' and key in OPTIONAL_COLUMNS else value)
+                for key, value in row.items()
+            }, None
+
+    def reject(self, summary, line_number, errors):
+        summary['rejected'] += 1
+        if len(summary['errors']) < self.max_reported_errors:
+            summary['errors'].append({'line': line_number, 'errors': errors})
+
+    def load_batch(self, batch, summary):
+        errors = self.schema.validate([row for _, row in batch])
+        valid_rows = []
+        for index, (line_number, row) in enumerate(batch):
+            if index in errors:
+                self.reject(summary, line_number, errors[index])
+            else:
+                valid_rows.append(row)
+        if not valid_rows:
+            return
+
+        now = datetime.utcnow()
+        records = []
+        for row in self.schema.load(valid_rows):
+            record = {column: row.get(column) for column in INGEST_COLUMNS}
+            record['in_stock'] = True if record['in_stock'] is None else record['in_stock']
+            record['created_at'] = record['created_at'] or now
+            record['updated_at'] = now
+            records.append(record)
+
+        try:
+            if db.engine.dialect.name == 'postgresql':
+                self.copy_records(records)
+            else:
+                db.session.execute(insert(Product), records)
+            bump_catalogue_generation()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        summary['inserted'] += len(records)
+        self.logger.info(f"[Ingest] Loaded {summary['inserted']} products ({summary['rejected']} rejected)")
+
+    @staticmethod
+    def format_copy_value(value):
+        # Unquoted empty fields are NULL in COPY's CSV format; everything else is quoted
+        if value is None:
+            return ''
+        if isinstance(value, bool):
+            return 't' if value else 'f'
+        if isinstance(value, datetime):
+            return value.isoformat()
+        if isinstance(value, (int, float)):
+            return repr(value)
+        return '"' + str(value).replace('"', '""') + '"'
+
+    def copy_records(self, records):
+        buffer = io.StringIO()
+        for record in records:
+            buffer.write(','.join(self.format_copy_value(record[column]) for column in INGEST_COLUMNS))
+            buffer.write('\n')
+        buffer.seek(0)
+
+        cursor = db.session.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY product ({', '.join(INGEST_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
+        finally:
+            cursor.close()
@@ -1,14 +1,32 @@
 from modules.product.controller import (
     classify_products,
+    refresh_classifier,
     translate_product_info,
     semantic_search,
+    search_cache_stats,
+    batch_search,
+    list_products,
+    get_product,
+    similar_products,
+    refresh_neighbours,
     embed_products,
+    backfill_status,
+    ingest_products,
     extract_text
 )
 
 def register_product_routes(app):
+    app.add_url_rule('/api/products', view_func=list_products, methods=['GET'])
+    app.add_url_rule('/api/products/<int:product_id>', view_func=get_product, methods=['GET'])
     app.add_url_rule('/api/products/classify', view_func=classify_products, methods=['POST'])
+    app.add_url_rule('/api/products/classifier/refresh', view_func=refresh_classifier, methods=['POST'])
     app.add_url_rule('/api/products/translate', view_func=translate_product_info, methods=['POST'])
     app.add_url_rule('/api/products/batch-embed', view_func=embed_products, methods=['POST'])
+    app.add_url_rule('/api/products/backfills/<job_name>', view_func=backfill_status, methods=['GET'])
     app.add_url_rule('/api/products/search', view_func=semantic_search, methods=['GET'])
+    app.add_url_rule('/api/products/search/batch', view_func=batch_search, methods=['POST'])
+    app.add_url_rule('/api/products/search/cache', view_func=search_cache_stats, methods=['GET'])
+    app.add_url_rule('/api/products/<int:product_id>/similar', view_func=similar_products, methods=['GET'])
+    app.add_url_rule('/api/products/neighbours/refresh', view_func=refresh_neighbours, methods=['POST'])
+    app.add_url_rule('/api/products/ingest', view_func=ingest_products, methods=['POST'])
     app.add_url_rule('/api/extract-text', view_func=extract_text, methods=['POST'])
\ No newline at end of file
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from sqlalchemy import select, update
+
+from extensions import db, get_logger
+from modules.product.entity import CatalogueGeneration
+from modules.shared.services.metrics import SEARCH_CACHE_EVICTIONS, SEARCH_CACHE_LOOKUPS
+
+CATALOGUE_NAME = 'products'
+
+
+def get_catalogue_generation():
+    generation = db.session.execute(
+        select(CatalogueGeneration.generation).where(CatalogueGeneration.name == CATALOGUE_NAME)
+    ).scalar()
+    return generation or 0
+
+
+def bump_catalogue_generation():
+    """Marks the catalogue as changed inside the caller's transaction.
+
+    Call this before committing a write that can change search results, so
+    the new generation becomes visible together with the rows it describes.
+    """
+    result = db.session.execute(
+        update(CatalogueGeneration)
+        .where(CatalogueGeneration.name == CATALOGUE_NAME)
+        .values(generation=CatalogueGeneration.generation + 1)
+    )
+    if result.rowcount == 0:
+        db.session.add(CatalogueGeneration(name=CATALOGUE_NAME, generation=1))
+
+
+class SearchResultCache:
+    """In-process LRU of serialised search responses.
+
+    Entries are keyed by the normalised query text plus every parameter that
+    affects the result, and tagged with the catalogue generation they were
+    computed at. An entry from an older generation is never served. The cache
+    is bounded both by entry count and by the total size of the stored bodies.
+    Hits, misses, stale entries and evictions are also counted on /metrics.
+    """
+
+    def __init__(self, max_entries=None, max_bytes=None, max_entry_bytes=None):
+        self.logger = get_logger('search')
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv('SEARCH_CACHE_SIZE', 1000))
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv('SEARCH_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+        self.max_entry_bytes = max_entry_bytes if max_entry_bytes is not None else int(os.getenv('SEARCH_CACHE_MAX_ENTRY_BYTES', 1024 * 1024))
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    @staticmethod
+    def normalise_query(query_text):
+        return ' '.join(query_text.split()).casefold()
+
+    @staticmethod
+    def make_key(params):
+        return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def get(self, key, generation):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                result = 'miss'
+                body = None
+            else:
+                entry_generation, body = entry
+                if entry_generation != generation:
+                    self._remove(key)
+                    self.stale += 1
+                    self.misses += 1
+                    result = 'stale'
+                    body = None
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    result = 'hit'
+        SEARCH_CACHE_LOOKUPS.inc(result=result)
+        return body
+
+    def set(self, key, generation, body):
+        if self.max_entries <= 0 or len(body) > self.max_entry_bytes:
+            return
+        evicted = 0
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (generation, body)
+            self.total_bytes += len(body)
+            while self._entries and (len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+                evicted += 1
+        if evicted:
+            SEARCH_CACHE_EVICTIONS.inc(evicted)
+
+    def _remove(self, key):
+        _, body = self._entries.pop(key)
+        self.total_bytes -= len(body)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_entries,
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale': self.stale,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+_search_cache = None
+_search_cache_lock = threading.Lock()
+
+
+def get_search_cache():
+    global _search_cache
+    if _search_cache is None:
+        with _search_cache_lock:
+            if _search_cache is None:
+                _search_cache = SearchResultCache()
+    return _search_cache
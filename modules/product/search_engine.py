@@ -0,0 +1,567 @@
+import fcntl
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import select, text
+
+from extensions import db, get_logger
+from modules.product.entity import Product, EMBEDDING_DIMENSIONS
+from modules.product.search_cache import get_catalogue_generation
+from modules.shared.services.database import use_primary
+
+
+# pgvector's defaults: an HNSW scan returns at most hnsw.ef_search rows, and
+# hnsw.ef_search cannot be set above 1000
+DEFAULT_EF_SEARCH = 40
+MAX_EF_SEARCH = 1000
+
+
+def apply_ann_settings(ef_search=None, probes=None, rows_needed=None, filtered=False):
+    """Sets the ANN knobs for the search query that follows in this transaction.
+
+    An HNSW scan stops after ef_search candidates, so a page of `rows_needed`
+    rows (limit + offset) raises ef_search to fit it unless the caller chose a
+    value. Filtered queries, and pages deeper than ef_search can reach, also
+    enable pgvector's iterative scan (HNSW_ITERATIVE_SCAN, `off` for pgvector
+    before 0.8), which keeps scanning until enough rows pass the filters.
+    """
+    if ef_search is not None and rows_needed is not None and ef_search < min(rows_needed, MAX_EF_SEARCH):
+        raise ValueError(f"ef_search must be at least {min(rows_needed, MAX_EF_SEARCH)} to return {rows_needed} rows")
+    if ef_search is None and rows_needed is not None and rows_needed > DEFAULT_EF_SEARCH:
+        ef_search = min(rows_needed, MAX_EF_SEARCH)
+
+    # set_config(..., true) is scoped to the current transaction, so the
+    # knobs only affect the search query that follows in this request.
+    if ef_search is not None:
+        db.session.execute(text("SELECT set_config('hnsw.ef_search', :value, true)"), {'value': str(ef_search)})
+    iterative_scan = os.getenv('HNSW_ITERATIVE_SCAN', 'strict_order')
+    if iterative_scan != 'off' and (filtered or (rows_needed or 0) > MAX_EF_SEARCH):
+        db.session.execute(text("SELECT set_config('hnsw.iterative_scan', :value, true)"), {'value': iterative_scan})
+    if probes is not None:
+        db.session.execute(text("SELECT set_config('ivfflat.probes', :value, true)"), {'value': str(probes)})
+
+
+def required_ef_search(rows_needed):
+    """The smallest explicit ef_search that can return `rows_needed` rows."""
+    return min(rows_needed, MAX_EF_SEARCH)
+
+
+def build_search_filters(category=None, min_price=None, max_price=None, in_stock=True):
+    filters = []
+    if in_stock is not None:
+        filters.append(Product.in_stock == in_stock)
+    if category is not None:
+        filters.append(Product.category == category)
+    if min_price is not None:
+        filters.append(Product.price >= min_price)
+    if max_price is not None:
+        filters.append(Product.price <= max_price)
+    return filters
+
+
+def format_search_row(row, distance=None):
+    if distance is None:
+        distance = float(row.distance) if row.distance is not None else None
+    return {
+        'id': row.id,
+        'name': row.name,
+        'description': row.description,
+        'category': row.category,
+        'price': row.price,
+        'distance': distance,
+        'similarity_score': 1 - distance if distance is not None else None
+    }
+
+
+class SearchEngine:
+    """Answers top-k vector queries for `ProductService.semantic_search`.
+
+    Backends take an already embedded query and return formatted result rows
+    ordered by ascending cosine distance.
+    """
+
+    name = None
+
+    def search(self, query_vector, limit=30, offset=0, min_similarity=None, ef_search=None, probes=None,
+               category=None, min_price=None, max_price=None, in_stock=True):
+        raise NotImplementedError
+
+
+class PgvectorSearchEngine(SearchEngine):
+    name = 'pgvector'
+
+    def search(self, query_vector, limit=30, offset=0, min_similarity=None, ef_search=None, probes=None,
+               category=None, min_price=None, max_price=None, in_stock=True):
+        filters = build_search_filters(category, min_price, max_price, in_stock)
+        apply_ann_settings(
+            ef_search=ef_search, probes=probes, rows_needed=limit + offset,
+            filtered=bool(filters) or min_similarity is not None
+        )
+
+        distance = Product.embedding.cosine_distance(query_vector).label('distance')
+        query = db.session.query(
+            Product.id,
+            Product.name,
+            Product.description,
+            Product.category,
+            Product.price,
+            distance
+        ).filter(
+            Product.embedding.isnot(None),
+            *filters
+        )
+
+        if min_similarity is not None:
+            query = query.filter(Product.embedding.cosine_distance(query_vector) <= 1 - min_similarity)
+
+        results = query.order_by(distance).limit(limit).offset(offset).all()
+        return [format_search_row(row) for row in results]
+
+
+class MmapVectorIndex:
+    """Float32 matrix of normalised product embeddings in memory-mapped files.
+
+    A directory holds `index.json`, which records the live version, row count
+    and category vocabulary, plus one sub-directory per version of `.npy`
+    arrays: vectors, ids, alive, in_stock, price and category codes. Every
+    worker process maps the same files, so the page cache is shared.
+
+    Writers serialise on an flock. Rows are only ever appended. A changed
+    vector appends a new row and tombstones the old one through `alive`.
+    `index.json` is replaced atomically after the row data is flushed, so
+    readers never see a half-written row. When capacity runs out, the live
+    rows are compacted into a new version with twice the room.
+    """
+
+    HEADER = 'index.json'
+    LOCK = 'index.lock'
+    ARRAYS = (
+        ('ids', np.int64),
+        ('alive', np.bool_),
+        ('in_stock', np.bool_),
+        ('price', np.float32),
+        ('category', np.int32),
+    )
+
+    def __init__(self, directory, dimensions=EMBEDDING_DIMENSIONS):
+        self.logger = get_logger('search')
+        self.directory = directory
+        self.dimensions = dimensions
+        self._header = None
+        self._header_mtime = None
+        self._arrays = None
+        self._lock = threading.Lock()
+
+    @property
+    def header_path(self):
+        return os.path.join(self.directory, self.HEADER)
+
+    def exists(self):
+        return os.path.exists(self.header_path)
+
+    def _open_version(self, version, capacity, create=False):
+        mode = 'w+' if create else 'r+'
+        path = os.path.join(self.directory, version)
+        if create:
+            os.makedirs(path, exist_ok=True)
+        arrays = {
+            'vectors': np.lib.format.open_memmap(
+                os.path.join(path, 'vectors.npy'), mode=mode, dtype=np.float32,
+                shape=(capacity, self.dimensions) if create else None
+            )
+        }
+        for name, dtype in self.ARRAYS:
+            arrays[name] = np.lib.format.open_memmap(
+                os.path.join(path, f'{name}.npy'), mode=mode, dtype=dtype,
+                shape=(capacity,) if create else None
+            )
+        if create:
+            arrays['alive'][:] = False
+        return arrays
+
+    def snapshot(self):
+        """Returns (header, arrays), remapping when another process changed the index."""
+        with self._lock:
+            for attempt in range(3):
+                mtime = os.stat(self.header_path).st_mtime_ns
+                if mtime == self._header_mtime:
+                    break
+                try:
+                    with open(self.header_path) as f:
+                        header = json.load(f)
+                    if self._header is None or header['version'] != self._header['version']:
+                        self._arrays = self._open_version(header['version'], header['capacity'])
+                except FileNotFoundError:
+                    # A writer swapped versions between our header read and the open
+                    if attempt == 2:
+                        raise
+                    continue
+                self._header = header
+                self._header_mtime = mtime
+            return self._header, self._arrays
+
+    def _write_header(self, header):
+        temp_path = f"{self.header_path}.{uuid.uuid4().hex}"
+        with open(temp_path, 'w') as f:
+            json.dump(header, f)
+        os.replace(temp_path, self.header_path)
+
+    @contextmanager
+    def writer(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, self.LOCK), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def normalise(vectors):
+        # halfvec columns come back as HalfVector objects rather than arrays
+        if hasattr(vectors, 'to_numpy'):
+            vectors = vectors.to_numpy()
+        elif not isinstance(vectors, np.ndarray):
+            vectors = [vector.to_numpy() if hasattr(vector, 'to_numpy') else vector for vector in vectors]
+        matrix = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return matrix / norms
+
+    def search(self, query_vector, k, category=None, min_price=None, max_price=None, in_stock=True,
+               min_similarity=None):
+        """Exact top-k by dot product over the live rows. Returns [(id, distance)]."""
+        header, arrays = self.snapshot()
+        count = header['count']
+        if count == 0 or k <= 0:
+            return []
+
+        mask = arrays['alive'][:count].copy()
+        if in_stock is not None:
+            mask &= arrays['in_stock'][:count] == in_stock
+        if category is not None:
+            try:
+                mask &= arrays['category'][:count] == header['categories'].index(category)
+            except ValueError:
+                return []
+        if min_price is not None:
+            mask &= arrays['price'][:count] >= min_price
+        if max_price is not None:
+            mask &= arrays['price'][:count] <= max_price
+
+        candidates = int(mask.sum())
+        if candidates == 0:
+            return []
+
+        query = self.normalise(query_vector)[0]
+        scores = arrays['vectors'][:count] @ query
+        scores[~mask] = -np.inf
+
+        k = min(k, candidates)
+        top = np.argpartition(-scores, k - 1)[:k] if k < count else np.arange(count)
+        top = top[np.argsort(-scores[top], kind='stable')][:k]
+        if min_similarity is not None:
+            top = top[scores[top] >= min_similarity]
+
+        ids = arrays['ids'][top]
+        return [(int(product_id), float(1 - score)) for product_id, score in zip(ids, scores[top])]
+
+    def _category_codes(self, header, categories):
+        vocabulary = header['categories']
+        codes = []
+        for category in categories:
+            if category is None:
+                codes.append(-1)
+                continue
+            if category not in vocabulary:
+                vocabulary.append(category)
+            codes.append(vocabulary.index(category))
+        return np.asarray(codes, dtype=np.int32)
+
+    def _new_header(self, capacity):
+        return {
+            'version': uuid.uuid4().hex,
+            'dimensions': self.dimensions,
+            'capacity': capacity,
+            'count': 0,
+            'categories': [],
+            'generation': None,
+            'watermark': None,
+        }
+
+    def _append(self, header, arrays, rows):
+        start = header['count']
+        end = start + len(rows)
+        ids = np.asarray([row['id'] for row in rows], dtype=np.int64)
+        arrays['vectors'][start:end] = self.normalise([row['embedding'] for row in rows])
+        arrays['ids'][start:end] = ids
+        arrays['in_stock'][start:end] = [bool(row['in_stock']) for row in rows]
+        arrays['price'][start:end] = [row['price'] for row in rows]
+        arrays['category'][start:end] = self._category_codes(header, [row['category'] for row in rows])
+        arrays['alive'][start:end] = True
+        header['count'] = end
+
+    @staticmethod
+    def _flush(arrays):
+        for array in arrays.values():
+            array.flush()
+
+    def _compact(self, header, arrays, capacity):
+        """Copies the live rows into a fresh version with the given capacity."""
+        live = np.flatnonzero(arrays['alive'][:header['count']])
+        new_header = self._new_header(max(capacity, len(live) * 2, 1024))
+        new_header.update({key: header[key] for key in ('categories', 'generation', 'watermark')})
+        new_arrays = self._open_version(new_header['version'], new_header['capacity'], create=True)
+        if len(live):
+            new_arrays['vectors'][:len(live)] = arrays['vectors'][live]
+            for name, _ in self.ARRAYS:
+                new_arrays[name][:len(live)] = arrays[name][live]
+        new_header['count'] = len(live)
+        return new_header, new_arrays
+
+    def _publish(self, header, arrays, previous_version=None):
+        self._flush(arrays)
+        self._write_header(header)
+        if previous_version and previous_version != header['version']:
+            # Processes that still map the old files keep their inodes until they remap
+            shutil.rmtree(os.path.join(self.directory, previous_version), ignore_errors=True)
+
+    def rebuild(self, batches, generation=None, watermark=None, capacity=1024):
+        """Writes a new version from an iterable of row batches and swaps it in."""
+        with self.writer():
+            previous = self.read_header()
+            header = self._new_header(capacity)
+            arrays = self._open_version(header['version'], header['capacity'], create=True)
+            for rows in batches:
+                rows = [row for row in rows if row['embedding'] is not None]
+                if not rows:
+                    continue
+                if header['count'] + len(rows) > header['capacity']:
+                    header, arrays = self._grow(header, arrays, len(rows))
+                self._append(header, arrays, rows)
+            header['generation'] = generation
+            header['watermark'] = watermark
+            self._publish(header, arrays, previous['version'] if previous else None)
+            return header['count']
+
+    def read_header(self):
+        if not self.exists():
+            return None
+        with open(self.header_path) as f:
+            return json.load(f)
+
+    def _grow(self, header, arrays, needed):
+        self._flush(arrays)
+        return self._compact(header, arrays, max(header['capacity'] * 2, (header['count'] + needed) * 2))
+
+    def apply(self, rows, generation=None, watermark=None):
+        """Upserts product rows (dicts with id, embedding, category, price, in_stock).
+
+        Rows without an embedding are removed. A row whose vector is unchanged
+        has its filter columns updated in place. A changed vector is appended
+        and the old row tombstoned. Returns (appended, tombstoned).
+        """
+        with self.writer():
+            header = self.read_header()
+            arrays = self._open_version(header['version'], header['capacity'])
+            previous_version = header['version']
+            count = header['count']
+
+            incoming_ids = np.asarray([row['id'] for row in rows], dtype=np.int64)
+            existing = np.flatnonzero(arrays['alive'][:count] & np.isin(arrays['ids'][:count], incoming_ids))
+            row_by_id = {int(arrays['ids'][index]): int(index) for index in existing}
+
+            appends = []
+            tombstones = []
+            for row in rows:
+                index = row_by_id.get(row['id'])
+                if row['embedding'] is None:
+                    if index is not None:
+                        tombstones.append(index)
+                    continue
+                if index is not None:
+                    vector = self.normalise(row['embedding'])[0]
+                    if np.array_equal(arrays['vectors'][index], vector):
+                        arrays['in_stock'][index] = bool(row['in_stock'])
+                        arrays['price'][index] = row['price']
+                        arrays['category'][index] = self._category_codes(header, [row['category']])[0]
+                        continue
+                    tombstones.append(index)
+                appends.append(row)
+
+            # Tombstone first so a product is briefly missing rather than listed twice
+            if tombstones:
+                arrays['alive'][tombstones] = False
+            if appends:
+                if header['count'] + len(appends) > header['capacity']:
+                    header, arrays = self._grow(header, arrays, len(appends))
+                self._append(header, arrays, appends)
+            if generation is not None:
+                header['generation'] = generation
+            if watermark is not None:
+                header['watermark'] = watermark
+            self._publish(header, arrays, previous_version)
+            return len(appends), len(tombstones)
+
+
+class MmapSearchEngine(SearchEngine):
+    """Exact in-process search over an `MmapVectorIndex`, keeping Postgres out of ranking.
+
+    A background thread in each worker catches the index up with the
+    catalogue every VECTOR_INDEX_SYNC_SECONDS (0 leaves it to `flask
+    vector-index sync`), when the catalogue generation has moved. It re-reads
+    products updated since its watermark, minus a safety overlap for
+    transactions that commit late. Queries never write to the index; Postgres
+    is only asked for the display columns of the final page, by primary key.
+    """
+
+    name = 'mmap'
+
+    def __init__(self, directory=None):
+        self.logger = get_logger('search')
+        self.index = MmapVectorIndex(directory or os.getenv('VECTOR_INDEX_DIR', 'instance/vector_index'))
+        self.sync_seconds = float(os.getenv('VECTOR_INDEX_SYNC_SECONDS', 5))
+        self.sync_overlap = timedelta(seconds=float(os.getenv('VECTOR_INDEX_SYNC_OVERLAP_SECONDS', 60)))
+        self.batch_size = int(os.getenv('VECTOR_INDEX_BATCH_SIZE', 5000))
+        self.fallback = PgvectorSearchEngine()
+        self._sync_thread = None
+        self._sync_pid = None
+        self._sync_lock = threading.Lock()
+
+    @staticmethod
+    def to_row(product):
+        return {
+            'id': product.id,
+            'embedding': product.embedding,
+            'category': product.category,
+            'price': float(product.price) if product.price is not None else np.nan,
+            'in_stock': product.in_stock,
+        }
+
+    def iter_products(self, since=None):
+        columns = (Product.id, Product.embedding, Product.category, Product.price, Product.in_stock, Product.updated_at)
+        last_id = 0
+        while True:
+            query = select(*columns).where(Product.id > last_id)
+            if since is None:
+                query = query.where(Product.embedding.isnot(None))
+            else:
+                query = query.where(Product.updated_at >= since)
+            rows = db.session.execute(query.order_by(Product.id).limit(self.batch_size)).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            yield rows
+
+    def rebuild(self):
+        generation = get_catalogue_generation()
+        started_at = datetime.utcnow()
+        count = self.index.rebuild(
+            ([self.to_row(row) for row in rows] for rows in self.iter_products()),
+            generation=generation,
+            watermark=started_at.isoformat()
+        )
+        db.session.rollback()
+        self.logger.info(f"[VectorIndex] Rebuilt with {count} products at generation {generation}")
+        return count
+
+    def sync(self):
+        header = self.index.read_header()
+        if header is None:
+            return self.rebuild(), 0
+
+        # Read the generation before the rows so a write racing this sync is picked up next time
+        generation = get_catalogue_generation()
+        if header['generation'] == generation:
+            return 0, 0
+
+        started_at = datetime.utcnow()
+        since = datetime.fromisoformat(header['watermark']) - self.sync_overlap if header['watermark'] else None
+        appended = tombstoned = 0
+        for rows in self.iter_products(since=since):
+            added, removed = self.index.apply([self.to_row(row) for row in rows])
+            appended += added
+            tombstoned += removed
+        self.index.apply([], generation=generation, watermark=started_at.isoformat())
+        db.session.rollback()
+        self.logger.info(f"[VectorIndex] Synced to generation {generation}: {appended} appended, {tombstoned} tombstoned")
+        return appended, tombstoned
+
+    def ensure_sync_thread(self, app):
+        if self.sync_seconds <= 0 or (self._sync_thread is not None and self._sync_pid == os.getpid()):
+            return
+        with self._sync_lock:
+            # A forked worker inherits the attribute but not the thread
+            if self._sync_thread is not None and self._sync_pid == os.getpid():
+                return
+            self._sync_pid = os.getpid()
+            self._sync_thread = threading.Thread(target=self._sync_loop, args=(app,), name='vector-index-sync', daemon=True)
+            self._sync_thread.start()
+
+    def _sync_loop(self, app):
+        while True:
+            time.sleep(self.sync_seconds)
+            try:
+                with app.app_context():
+                    # The watermark must come from the primary; a lagging replica would skip rows
+                    with use_primary():
+                        self.sync()
+            except Exception as e:
+                self.logger.warning(f"[VectorIndex] Sync failed, serving the current index: {str(e)}")
+
+    def search(self, query_vector, limit=30, offset=0, min_similarity=None, ef_search=None, probes=None,
+               category=None, min_price=None, max_price=None, in_stock=True):
+        if not self.index.exists():
+            self.logger.warning("[VectorIndex] No index built yet, searching with pgvector")
+            return self.fallback.search(
+                query_vector, limit=limit, offset=offset, min_similarity=min_similarity, ef_search=ef_search,
+                probes=probes, category=category, min_price=min_price, max_price=max_price, in_stock=in_stock
+            )
+
+        self.ensure_sync_thread(current_app._get_current_object())
+        hits = self.index.search(
+            query_vector, offset + limit, category=category, min_price=min_price, max_price=max_price,
+            in_stock=in_stock, min_similarity=min_similarity
+        )[offset:]
+        if not hits:
+            return []
+
+        rows = db.session.execute(
+            select(Product.id, Product.name, Product.description, Product.category, Product.price)
+            .where(Product.id.in_([product_id for product_id, _ in hits]))
+        ).all()
+        rows_by_id = {row.id: row for row in rows}
+        return [
+            format_search_row(rows_by_id[product_id], distance=distance)
+            for product_id, distance in hits
+            if product_id in rows_by_id
+        ]
+
+
+SEARCH_ENGINES = {
+    PgvectorSearchEngine.name: PgvectorSearchEngine,
+    MmapSearchEngine.name: MmapSearchEngine,
+}
+
+_search_engine = None
+_search_engine_lock = threading.Lock()
+
+
+def get_search_engine():
+    global _search_engine
+    if _search_engine is None:
+        with _search_engine_lock:
+            if _search_engine is None:
+                name = os.getenv('SEARCH_ENGINE', PgvectorSearchEngine.name).lower()
+                if name not in SEARCH_ENGINES:
+                    raise ValueError(f"SEARCH_ENGINE must be one of {', '.join(SEARCH_ENGINES)}")
+                _search_engine = SEARCH_ENGINES[name]()
+    return _search_engine
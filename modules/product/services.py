@@ -1,127 +1,979 @@
-from modules.product.entity import Product
+from modules.product.entity import Product, BackfillCheckpoint, ProductNeighbour, EmbeddingType, EMBEDDING_DIMENSIONS
+from modules.product.classifier import CentroidClassifier
+from modules.product.ingest import ProductIngestor
+from modules.product.search_cache import bump_catalogue_generation
+from modules.product.search_engine import apply_ann_settings, build_search_filters, format_search_row, get_search_engine
 
-from dotenv import load_dotenv
+import base64
+import hashlib
 import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from sqlalchemy import Integer, cast, column, delete, func, literal, select, text, true, tuple_, update, values
+from sqlalchemy.dialects.postgresql import REGCONFIG
 from extensions import db, get_logger
 from modules.product.schema import ProductSchema
 from modules.shared.services.bedrock import BedrockService
 from modules.shared.services.translate import TranslateService
 from modules.shared.services.s3 import S3Service
+from modules.shared.services.documents import DocumentService
+from modules.shared.services.database import reads_from_replica
+from modules.job.services import JobBusyError
+from modules.shared.services.metrics import track_operation
+from modules.shared.services.resilience import Deadline
+from modules.shared.services.throttling import AdaptiveThrottle
 
 # from modules.shared.services.bedrock.service import bedrock_service
 
-   
+# Columns the read API can project; embedding is only loaded when asked for
+PRODUCT_READ_FIELDS = (
+    'id', 'name', 'description', 'name_ar', 'description_ar', 'category',
+    'price', 'quantity', 'in_stock', 'created_at', 'updated_at', 'embedding'
+)
+DEFAULT_READ_FIELDS = tuple(field for field in PRODUCT_READ_FIELDS if field != 'embedding')
+
 
 class ProductService:
     def __init__(self):
-        load_dotenv()
         self.product_schema = ProductSchema()
         self.products_schema = ProductSchema(many=True)
-        self.logger = get_logger()
+        self.logger = get_logger('product')
         self.bedrock_service = BedrockService()
         self.translate_service = TranslateService()
         self.s3_service = S3Service()
+        self.document_service = DocumentService()
+        self.search_engine = get_search_engine()
+        self.category_classifier = CentroidClassifier()
 
-    def update_product_category(self, product_ids):
-        try:
-            products_list = []
-            for product_id in product_ids:
-                product = Product.query.get(product_id)
-                if not product:
-                    continue
-                products_list.append({'id': product.id, 'name': product.name})
-
-            product_lines = []
-            for idx, product in enumerate(products_list, start=1):
-                product_lines.append(f'{idx}. id: {product["id"]}, name: "{product["name"]}"')
-
-            products_text = "\n".join(product_lines)
-            prompt = (
-                "You are a product classifier AI.\n"
-                "Given a product ID and name, classify each product into a relevant category.\n"
-                "Respond ONLY in the following JSON format:\n\n"
-                "[\n"
-                "  {\n"
-                "    \"id\": 1,\n"
-                "    \"name\": \"iPhone 14 Pro\",\n"
-                "    \"category\": \"Smartphones\"\n"
-                "  }\n"
-                "]\n\n"
-                "Do not include explanations or extra text.\n\n"
-                f"Here are the products to classify:\n{products_text}"
-            )
+    @staticmethod
+    def build_classification_prompt(products):
+        product_lines = []
+        for idx, product in enumerate(products, start=1):
+            product_lines.append(f'{idx}. id: {product.id}, name: {json.dumps(product.name, ensure_ascii=False)}')
+
+        products_text = "\n".join(product_lines)
+        return (
+            "You are a product classifier AI.\n"
+            "Given a product ID and name, classify each product into a relevant category.\n"
+            "Respond ONLY in the following JSON format:\n\n"
+            "[\n"
+            "  {\n"
+            "    \"id\": 1,\n"
+            "    \"name\": \"iPhone 14 Pro\",\n"
+            "    \"category\": \"Smartphones\"\n"
+            "  }\n"
+            "]\n\n"
+            "Do not include explanations or extra text.\n\n"
+            f"Here are the products to classify:\n{products_text}"
+        )
+
+    @staticmethod
+    def estimate_classification_tokens(product):
+        # ~4 characters per token for the echoed name plus the JSON scaffolding
+        return len(product.name) // 4 + 25
+
+    def chunk_for_classification(self, products, output_token_budget, max_chunk_size):
+        # Leave headroom so an unusually verbose category never truncates the JSON
+        budget = int(output_token_budget * 0.8)
+        chunks = []
+        current = []
+        current_tokens = 0
+        for product in products:
+            tokens = self.estimate_classification_tokens(product)
+            if current and (current_tokens + tokens > budget or len(current) >= max_chunk_size):
+                chunks.append(current)
+                current = []
+                current_tokens = 0
+            current.append(product)
+            current_tokens += tokens
+        if current:
+            chunks.append(current)
+        return chunks
+
+    @staticmethod
+    def parse_classification_response(response_text, products):
+        start = response_text.find('[')
+        end = response_text.rfind(']')
+        if start == -1 or end == -1:
+            raise ValueError("Model response does not contain a JSON array")
+        items = json.loads(response_text[start:end + 1])
+
+        names_by_id = {product.id: product.name for product in products}
+        classified = {}
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            product_id = item.get('id')
+            category = item.get('category')
+            if product_id not in names_by_id or not isinstance(category, str) or not category.strip():
+                continue
+            classified[product_id] = {
+                'id': product_id,
+                'name': names_by_id[product_id],
+                'category': category.strip()[:100]
+            }
+        return classified
+
+    def classify_chunk(self, products, max_tokens, throttle, deadline=None):
+        response_text = throttle.call(
+            self.bedrock_service.invoke_model_with_request,
+            self.build_classification_prompt(products),
+            max_tokens=max_tokens,
+            deadline=deadline
+        )
+        return self.parse_classification_response(response_text, products)
+
+    def classify_locally(self, products):
+        """Split products into those the centroid classifier labels confidently and the rest."""
+        if not self.category_classifier.is_ready:
+            self.category_classifier.refresh()
+
+        embedded = [product for product in products if product.embedding is not None]
+        predictions = self.category_classifier.predict([product.embedding for product in embedded])
+
+        classified = {}
+        for product, (category, similarity, confident) in zip(embedded, predictions):
+            if confident:
+                classified[product.id] = {
+                    'id': product.id,
+                    'name': product.name,
+                    'category': category,
+                    'source': 'local',
+                    'confidence': round(similarity, 4)
+                }
+        remaining = [product for product in products if product.id not in classified]
+        return classified, remaining
+
+    @track_operation('refresh_category_classifier')
+    def refresh_category_classifier(self, full=False):
+        added = self.category_classifier.refresh(full=full)
+        return {
+            'added': added,
+            'categories': len(self.category_classifier.categories),
+            'watermark': self.category_classifier.watermark.isoformat()
+        }
+
+    @track_operation('update_product_category')
+    def update_product_category(self, product_ids, max_workers=None, use_local=True, deadline=None, progress=None):
+        try:
+            max_tokens = int(os.getenv('CLASSIFY_MAX_OUTPUT_TOKENS', 4096))
+            max_chunk_size = int(os.getenv('CLASSIFY_MAX_CHUNK_SIZE', 100))
+            max_workers = max_workers or int(os.getenv('CLASSIFY_MAX_WORKERS', 4))
+
+            unique_ids = list(dict.fromkeys(product_ids))
+            columns = [Product.id, Product.name, Product.embedding] if use_local else [Product.id, Product.name]
+            products = db.session.query(*columns).filter(
+                Product.id.in_(unique_ids)
+            ).order_by(Product.id).all()
+            found_ids = {product.id for product in products}
+            not_found_ids = [product_id for product_id in unique_ids if product_id not in found_ids]
+
+            classified = {}
+            llm_products = products
+            if use_local:
+                classified, llm_products = self.classify_locally(products)
+
+            chunks = self.chunk_for_classification(llm_products, max_tokens, max_chunk_size)
+            self.logger.info(f"\n=============== Classified {len(classified)} products locally, sending {len(llm_products)} to the model in {len(chunks)} chunks ===============\n")
+
+            throttle = AdaptiveThrottle()
+            failed_ids = []
+            llm_classified = {}
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [(chunk, executor.submit(self.classify_chunk, chunk, max_tokens, throttle, deadline)) for chunk in chunks]
+                for chunk, future in futures:
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        self.logger.error(f"[Classification] Chunk of {len(chunk)} products failed: {str(e)}")
+                        failed_ids.extend(product.id for product in chunk)
+                        continue
+                    llm_classified.update(result)
+                    failed_ids.extend(product.id for product in chunk if product.id not in result)
+                    if progress is not None:
+                        progress({
+                            'processed': len(classified) + len(llm_classified) + len(failed_ids),
+                            'total': len(products),
+                            'succeeded': len(classified) + len(llm_classified),
+                            'failed': len(failed_ids)
+                        })
 
-            self.logger.info(f"\n=============== Invoking AI model ===============\n")
-            classified_category = self.bedrock_service.invoke_model_with_request(prompt)
-            self.logger.info(f"\n=============== Classified category for product ===============\n {classified_category}")
-            return json.loads(classified_category)
+            for item in llm_classified.values():
+                item['source'] = 'llm'
+            classified.update(llm_classified)
+
+            if classified:
+                db.session.execute(
+                    update(Product),
+                    [{'id': item['id'], 'category': item['category']} for item in classified.values()]
+                )
+                bump_catalogue_generation()
+                db.session.commit()
+
+            self.logger.info(f"\n=============== Classified {len(classified)} products, {len(failed_ids)} failed ===============\n")
+            return {
+                'classified_products': list(classified.values()),
+                'failed_ids': failed_ids,
+                'not_found_ids': not_found_ids
+            }
         except Exception as e:
+            db.session.rollback()
             self.logger.error(f"Error updating product category: {str(e)}")
             raise
 
-    def batch_translate(self):
+    @contextmanager
+    def backfill_lock(self, job_name):
+        """Holds a Postgres advisory lock for `job_name`, or raises JobBusyError at once.
+
+        The lock lives on its own connection for the whole run, so it covers
+        queued jobs, synchronous requests and other processes alike, and is
+        released by Postgres if the process dies.
+        """
+        if db.engine.dialect.name != 'postgresql':
+            yield
+            return
+        key = {'name': f'backfill:{job_name}'}
+        connection = db.engine.connect()
         try:
-            products_to_translate = Product.query.filter((Product.name_ar == None) | (Product.description_ar == None)).all()
-            for product in products_to_translate:
-                product.name_ar = self.translate_service.translate_to_arabic(product.name)
-                product.description_ar = self.translate_service.translate_to_arabic(product.description)
-                db.session.commit()
-            self.logger.info(f"===== Batch Translation Complete =====")
+            if not connection.execute(text("SELECT pg_try_advisory_lock(hashtext(:name))"), key).scalar():
+                raise JobBusyError(f"Backfill '{job_name}' is already running")
+            try:
+                yield
+            finally:
+                try:
+                    connection.execute(text("SELECT pg_advisory_unlock(hashtext(:name))"), key)
+                    connection.commit()
+                except Exception:
+                    # Never hand a connection that may still hold the lock back to the pool
+                    connection.invalidate()
+                    raise
+        finally:
+            connection.close()
+
+    def run_backfill(self, job_name, fetch_chunk, process_chunk, chunk_size, max_items=None,
+                     time_budget=None, retry_failed=False, reset=False, progress=None):
+        """Run one invocation of a resumable backfill over Product.id.
+
+        `fetch_chunk(last_id, limit, ids)` returns the next rows ordered by id,
+        and `process_chunk(rows)` stages the writes for them and returns the
+        ids that failed. The writes and the checkpoint are committed together
+        once per chunk, so a restart picks up right after the last commit.
+        `progress`, if given, is called with running totals after each chunk.
+        Only one run per `job_name` may be active; a second raises JobBusyError.
+        """
+        with self.backfill_lock(job_name):
+            return self._run_backfill(job_name, fetch_chunk, process_chunk, chunk_size, max_items,
+                                      time_budget, retry_failed, reset, progress)
+
+    def _run_backfill(self, job_name, fetch_chunk, process_chunk, chunk_size, max_items,
+                      time_budget, retry_failed, reset, progress):
+        checkpoint = db.session.get(BackfillCheckpoint, job_name)
+        if checkpoint is None:
+            checkpoint = BackfillCheckpoint(job_name=job_name, last_id=0, processed=0, succeeded=0, failed_ids=[])
+            db.session.add(checkpoint)
+        if reset:
+            checkpoint.failed_ids = []
+        if reset or (checkpoint.status == 'completed' and not retry_failed):
+            checkpoint.last_id = 0
+            checkpoint.processed = 0
+            checkpoint.succeeded = 0
+        checkpoint.status = 'running'
+        checkpoint.last_error = None
+        db.session.commit()
+
+        started = time.perf_counter()
+        run_processed = 0
+        run_succeeded = 0
+        run_failed_ids = []
+
+        def report_progress():
+            if progress is not None:
+                progress({
+                    'processed': run_processed,
+                    'succeeded': run_succeeded,
+                    'failed': len(run_failed_ids),
+                    'last_id': checkpoint.last_id
+                })
+
+        def budget_exhausted():
+            if max_items is not None and run_processed >= max_items:
+                return True
+            return time_budget is not None and time.perf_counter() - started >= time_budget
+
+        try:
+            if retry_failed:
+                pending_ids = list(checkpoint.failed_ids or [])
+                while pending_ids and not budget_exhausted():
+                    limit = chunk_size if max_items is None else min(chunk_size, max_items - run_processed)
+                    ids, pending_ids = pending_ids[:limit], pending_ids[limit:]
+                    rows = fetch_chunk(0, limit, ids)
+                    failed_ids = process_chunk(rows) if rows else []
+
+                    run_processed += len(ids)
+                    run_succeeded += len(rows) - len(failed_ids)
+                    run_failed_ids.extend(failed_ids)
+                    checkpoint.failed_ids = sorted(set(pending_ids) | set(run_failed_ids))
+                    db.session.commit()
+                    report_progress()
+                checkpoint.status = 'paused' if pending_ids else 'completed'
+            else:
+                while True:
+                    if budget_exhausted():
+                        checkpoint.status = 'paused'
+                        break
+                    limit = chunk_size if max_items is None else min(chunk_size, max_items - run_processed)
+                    rows = fetch_chunk(checkpoint.last_id, limit, None)
+                    if not rows:
+                        checkpoint.status = 'completed'
+                        break
+                    failed_ids = process_chunk(rows)
+
+                    run_processed += len(rows)
+                    run_succeeded += len(rows) - len(failed_ids)
+                    run_failed_ids.extend(failed_ids)
+                    checkpoint.last_id = rows[-1].id
+                    checkpoint.processed += len(rows)
+                    checkpoint.succeeded += len(rows) - len(failed_ids)
+                    checkpoint.failed_ids = sorted(set(checkpoint.failed_ids or []) | set(failed_ids))
+                    db.session.commit()
+                    report_progress()
+                    self.logger.info("[Backfill:%s] %d/%d done (last id %d)", job_name, checkpoint.succeeded, checkpoint.processed, checkpoint.last_id)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            checkpoint = db.session.get(BackfillCheckpoint, job_name)
+            checkpoint.status = 'failed'
+            checkpoint.last_error = str(e)[:255]
+            db.session.commit()
+            self.logger.error(f"[Backfill:{job_name}] Stopped at id {checkpoint.last_id}: {str(e)}")
+            raise
+
+        elapsed = time.perf_counter() - started
+        return {
+            'job': job_name,
+            'status': checkpoint.status,
+            'last_id': checkpoint.last_id,
+            'processed': run_processed,
+            'succeeded': run_succeeded,
+            'failed': len(run_failed_ids),
+            'failed_ids': run_failed_ids,
+            'pending_failed_ids': checkpoint.failed_ids,
+            'elapsed_seconds': round(elapsed, 3),
+            'items_per_second': round(run_succeeded / elapsed, 2) if elapsed else 0.0
+        }
+
+    @track_operation('get_backfill_status')
+    def get_backfill_status(self, job_name):
+        checkpoint = db.session.get(BackfillCheckpoint, job_name)
+        if checkpoint is None:
+            return None
+        return {
+            'job': checkpoint.job_name,
+            'status': checkpoint.status,
+            'last_id': checkpoint.last_id,
+            'processed': checkpoint.processed,
+            'succeeded': checkpoint.succeeded,
+            'failed_ids': checkpoint.failed_ids,
+            'last_error': checkpoint.last_error,
+            'updated_at': checkpoint.updated_at.isoformat() if checkpoint.updated_at else None
+        }
+
+    @track_operation('batch_translate')
+    def batch_translate(self, chunk_size=None, max_workers=None, max_items=None, time_budget=None,
+                        retry_failed=False, reset=False, progress=None):
+        try:
+            chunk_size = chunk_size or int(os.getenv('TRANSLATE_CHUNK_SIZE', 100))
+
+            def fetch_chunk(last_id, limit, ids):
+                query = db.session.query(Product.id, Product.name, Product.description).filter(
+                    (Product.name_ar == None) | (Product.description_ar == None)
+                )
+                if ids is not None:
+                    query = query.filter(Product.id.in_(ids))
+                else:
+                    query = query.filter(Product.id > last_id)
+                return query.order_by(Product.id).limit(limit).all()
+
+            throttle = AdaptiveThrottle()
+
+            def process_chunk(rows):
+                texts = [text for row in rows for text in (row.name, row.description)]
+                translations, errors = self.translate_service.translate_many(
+                    texts, 'en', 'ar', max_workers=max_workers, throttle=throttle
+                )
+
+                updates = []
+                failed_ids = []
+                for row in rows:
+                    if row.name in errors or row.description in errors:
+                        self.logger.error(f"[BatchTranslate] Failed to translate product {row.id}: {errors.get(row.name) or errors.get(row.description)}")
+                        failed_ids.append(row.id)
+                        continue
+                    updates.append({
+                        'id': row.id,
+                        'name_ar': translations.get(row.name, row.name),
+                        'description_ar': translations.get(row.description, row.description)
+                    })
+                if updates:
+                    db.session.execute(update(Product), updates)
+                    bump_catalogue_generation()
+                return failed_ids
+
+            summary = self.run_backfill(
+                'translate', fetch_chunk, process_chunk, chunk_size,
+                max_items=max_items, time_budget=time_budget, retry_failed=retry_failed, reset=reset,
+                progress=progress
+            )
+            summary['retries'] = throttle.retries
+            self.logger.info(f"===== Batch Translation {summary['status']} ===== {summary['succeeded']} translated, {summary['failed']} failed")
+            return summary
         except Exception as e:
             self.logger.error(f"\n\n======== Error batch translating text ========\n{str(e)}\n\n")
             raise
 
-    def embed_product(self, product):
-        text = f"{product.name} {product.description or ''} {product.category} {product.price} {product.name_ar or ''} {product.description_ar or ''}"
-        vector = self.bedrock_service.get_embedding(text)
-        self.logger.info(f"\n\n===== Embedded Vector =====\n\n{vector}")
-        product.embedding = vector
-        db.session.commit()
+    @staticmethod
+    def build_embedding_text(product):
+        return f"{product.name} {product.description or ''} {product.category} {product.price} {product.name_ar or ''} {product.description_ar or ''}"
 
-    def batch_embedding(self):
+    @track_operation('batch_embedding')
+    def batch_embedding(self, chunk_size=None, max_workers=None, max_items=None, time_budget=None,
+                        retry_failed=False, reset=False, progress=None):
         try:
-            products_to_embed = Product.query.filter(Product.embedding == None).all()
-            self.logger.info(f"\n\n===== Products to embed =====\n\n{[(p.id, p.name) for p in products_to_embed]}")
-            for product in products_to_embed:
-                self.embed_product(product)
-            return "Batch Embedding Complete"
+            chunk_size = chunk_size or int(os.getenv('EMBED_CHUNK_SIZE', 100))
+            max_workers = max_workers or int(os.getenv('EMBED_MAX_WORKERS', 8))
+            throttle = AdaptiveThrottle()
+            app = current_app._get_current_object()
+
+            def embed(text):
+                # The embedding cache needs an app context for its persistent tier
+                with app.app_context():
+                    return throttle.call(self.bedrock_service.get_embedding, text)
+
+            def fetch_chunk(last_id, limit, ids):
+                query = db.session.query(
+                    Product.id,
+                    Product.name,
+                    Product.description,
+                    Product.category,
+                    Product.price,
+                    Product.name_ar,
+                    Product.description_ar,
+                    Product.content_hash
+                ).filter(Product.embedding_hash.is_distinct_from(Product.content_hash))
+                if ids is not None:
+                    query = query.filter(Product.id.in_(ids))
+                else:
+                    query = query.filter(Product.id > last_id)
+                return query.order_by(Product.id).limit(limit).all()
+
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                def process_chunk(rows):
+                    futures = [(row, executor.submit(embed, self.build_embedding_text(row))) for row in rows]
+                    updates = []
+                    failed_ids = []
+                    for row, future in futures:
+                        try:
+                            updates.append({'id': row.id, 'embedding': future.result(), 'embedding_hash': row.content_hash})
+                        except Exception as e:
+                            self.logger.error(f"[BatchEmbedding] Failed to embed product {row.id}: {str(e)}")
+                            failed_ids.append(row.id)
+                    if updates:
+                        db.session.execute(update(Product), updates)
+                        self.invalidate_neighbours([item['id'] for item in updates])
+                        bump_catalogue_generation()
+                    return failed_ids
+
+                summary = self.run_backfill(
+                    'embed', fetch_chunk, process_chunk, chunk_size,
+                    max_items=max_items, time_budget=time_budget, retry_failed=retry_failed, reset=reset,
+                    progress=progress
+                )
+
+            summary['retries'] = throttle.retries
+            self.logger.info(f"===== Batch Embedding {summary['status']} ===== {summary['succeeded']} embedded, {summary['failed']} failed")
+            return summary
         except Exception as e:
             self.logger.error(f"\n\n======== Error with batch embedding ========\n{str(e)}\n\n")
             raise
 
-    def semantic_search(self, query_text):
+    apply_ann_settings = staticmethod(apply_ann_settings)
+    build_search_filters = staticmethod(build_search_filters)
+
+    @staticmethod
+    def build_search_tsquery(query_text):
+        return func.websearch_to_tsquery(cast('simple', REGCONFIG), query_text).op('||')(
+            func.websearch_to_tsquery(cast('english', REGCONFIG), query_text)
+        ).op('||')(
+            func.websearch_to_tsquery(cast('arabic', REGCONFIG), query_text)
+        )
+
+    format_search_row = staticmethod(format_search_row)
+
+    @track_operation('semantic_search')
+    @reads_from_replica
+    def semantic_search(self, query_text, limit=30, offset=0, min_similarity=None, ef_search=None, probes=None,
+                        category=None, min_price=None, max_price=None, in_stock=True, deadline=None):
         try:
-            query_vector = self.bedrock_service.get_embedding(query_text)
-            self.logger.info(f"\n\n===== Search Vector =====\n\n{query_vector[:100]}")
-            
-            query = Product.query.filter((Product.embedding.isnot(None)) & (Product.in_stock == True))
-            self.logger.info(f"\n\n===== ORM Query =====\n\n{query}")
-            
-            results = query.order_by(Product.embedding.cosine_distance(query_vector)).limit(30).all()
-            self.logger.info(f"\n\n===== Cosine query result =====\n\n{results}")
-            
-            search_results = []
-            for product in results:
-                distance = db.session.query(Product.embedding.cosine_distance(query_vector)).filter(
-                    Product.id == product.id
-                ).scalar()
-                search_results.append({
-                    'id': product.id,
-                    'name': product.name,
-                    'description': product.description,
-                    'category': product.category,
-                    'price': product.price,
-                    'distance': float(distance),
-                    'similarity_score': 1 - float(distance)
-                })
-                
-            self.logger.info(f"\n\n===== Search Results =====\n\n{search_results}")
+            query_vector = self.bedrock_service.get_embedding(query_text, deadline=deadline)
+            search_results = self.search_engine.search(
+                query_vector,
+                limit=limit,
+                offset=offset,
+                min_similarity=min_similarity,
+                ef_search=ef_search,
+                probes=probes,
+                category=category,
+                min_price=min_price,
+                max_price=max_price,
+                in_stock=in_stock
+            )
+
+            self.logger.info("[Search] %s returned %d products", self.search_engine.name, len(search_results))
             return search_results
         
         except Exception as e:
             self.logger.error(f"\n\n======== Error with similarity search ========\n{str(e)}\n\n")
             raise
 
+    def embed_queries(self, query_texts, max_workers=None, deadline=None):
+        """Embeds distinct query texts concurrently; cached texts skip Bedrock.
+
+        Returns ({text: vector}, {text: error message}).
+        """
+        max_workers = max_workers or int(os.getenv('SEARCH_BATCH_MAX_WORKERS', 8))
+        throttle = AdaptiveThrottle()
+        app = current_app._get_current_object()
+
+        def embed(query_text):
+            with app.app_context():
+                return throttle.call(self.bedrock_service.get_embedding, query_text, deadline=deadline)
+
+        vectors = {}
+        errors = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [(query_text, executor.submit(embed, query_text)) for query_text in query_texts]
+            for query_text, future in futures:
+                try:
+                    vectors[query_text] = future.result()
+                except Exception as e:
+                    self.logger.error(f"[BatchSearch] Failed to embed query '{query_text[:50]}': {str(e)}")
+                    errors[query_text] = str(e)
+        return vectors, errors
+
+    @track_operation('batch_semantic_search')
+    @reads_from_replica
+    def batch_semantic_search(self, query_texts, limit=10, min_similarity=None, ef_search=None, probes=None,
+                              category=None, min_price=None, max_price=None, in_stock=True,
+                              max_workers=None, deadline=None):
+        """Runs many vector searches with one embedding pass and one SQL statement.
+
+        The query vectors are sent as a VALUES list and each one drives a
+        LATERAL top-k subquery, so the ANN index is used per query while the
+        whole batch costs a single round trip.
+        """
+        try:
+            distinct_texts = list(dict.fromkeys(query_texts))
+            vectors, errors = self.embed_queries(distinct_texts, max_workers=max_workers, deadline=deadline)
+            embedded_texts = [query_text for query_text in distinct_texts if query_text in vectors]
+
+            hits = {query_text: [] for query_text in embedded_texts}
+            if embedded_texts:
+                filters = self.build_search_filters(category, min_price, max_price, in_stock)
+                self.apply_ann_settings(
+                    ef_search=ef_search, probes=probes, rows_needed=limit,
+                    filtered=bool(filters) or min_similarity is not None
+                )
+
+                query_values = values(
+                    column('ord', Integer),
+                    column('embedding', EmbeddingType(EMBEDDING_DIMENSIONS)),
+                    name='query_values'
+                ).data([(index, vectors[query_text]) for index, query_text in enumerate(embedded_texts)])
+                queries = select(
+                    query_values.c.ord,
+                    cast(query_values.c.embedding, EmbeddingType(EMBEDDING_DIMENSIONS)).label('embedding')
+                ).cte('queries')
+
+                distance = Product.embedding.cosine_distance(queries.c.embedding)
+                nearest = select(
+                    Product.id,
+                    Product.name,
+                    Product.description,
+                    Product.category,
+                    Product.price,
+                    distance.label('distance')
+                ).where(
+                    Product.embedding.isnot(None),
+                    *filters
+                )
+                if min_similarity is not None:
+                    nearest = nearest.where(distance <= 1 - min_similarity)
+                nearest = nearest.order_by(distance).limit(limit).lateral('nearest')
+
+                rows = db.session.execute(
+                    select(queries.c.ord, nearest).select_from(queries).join(nearest, true())
+                    .order_by(queries.c.ord, nearest.c.distance)
+                ).all()
+                for row in rows:
+                    hits[embedded_texts[row.ord]].append(self.format_search_row(row))
+
+            results = []
+            for query_text in query_texts:
+                if query_text in errors:
+                    results.append({'query': query_text, 'error': errors[query_text], 'results': []})
+                else:
+                    results.append({'query': query_text, 'results': hits[query_text]})
+
+            self.logger.info("[BatchSearch] %d queries, %d embedded, %d failed", len(query_texts), len(embedded_texts), len(errors))
+            return results
+
+        except Exception as e:
+            self.logger.error(f"\n\n======== Error with batch similarity search ========\n{str(e)}\n\n")
+            raise
+
+    @track_operation('hybrid_search')
+    @reads_from_replica
+    def hybrid_search(self, query_text, limit=30, offset=0, ef_search=None, probes=None,
+                      category=None, min_price=None, max_price=None, in_stock=True, deadline=None):
+        """Fuse full-text and vector rankings with reciprocal-rank fusion in one query.
+
+        Each side ranks its own candidate pool (filters applied inside the
+        indexed scans), and a product's score is the sum of 1 / (k + rank)
+        over the lists it appears in.
+        """
+        try:
+            candidates = int(os.getenv('HYBRID_CANDIDATES', 100))
+            rrf_k = float(os.getenv('HYBRID_RRF_K', 60))
+            filters = self.build_search_filters(category, min_price, max_price, in_stock)
+
+            query_vector = self.bedrock_service.get_embedding(query_text, deadline=deadline)
+            # The vector side must fill its whole candidate pool, not just the page
+            self.apply_ann_settings(ef_search=ef_search, probes=probes, rows_needed=candidates, filtered=bool(filters))
+
+            distance = Product.embedding.cosine_distance(query_vector)
+            vector_candidates = select(Product.id, distance.label('distance')).where(
+                Product.embedding.isnot(None), *filters
+            ).order_by(distance).limit(candidates).subquery()
+            vector_ranked = select(
+                vector_candidates.c.id,
+                func.row_number().over(order_by=vector_candidates.c.distance).label('rank')
+            ).cte('vector_ranked')
+
+            tsquery = self.build_search_tsquery(query_text)
+            lexical_score = func.ts_rank_cd(Product.search_vector, tsquery)
+            lexical_candidates = select(Product.id, lexical_score.label('score')).where(
+                Product.search_vector.op('@@')(tsquery), *filters
+            ).order_by(lexical_score.desc()).limit(candidates).subquery()
+            lexical_ranked = select(
+                lexical_candidates.c.id,
+                func.row_number().over(order_by=lexical_candidates.c.score.desc()).label('rank')
+            ).cte('lexical_ranked')
+
+            fused_score = (
+                func.coalesce(1.0 / (literal(rrf_k) + vector_ranked.c.rank), 0.0)
+                + func.coalesce(1.0 / (literal(rrf_k) + lexical_ranked.c.rank), 0.0)
+            ).label('score')
+            fused = vector_ranked.join(lexical_ranked, vector_ranked.c.id == lexical_ranked.c.id, full=True)
+
+            statement = select(
+                Product.id,
+                Product.name,
+                Product.description,
+                Product.category,
+                Product.price,
+                distance.label('distance'),
+                vector_ranked.c.rank.label('vector_rank'),
+                lexical_ranked.c.rank.label('lexical_rank'),
+                fused_score
+            ).select_from(fused).join(
+                Product, Product.id == func.coalesce(vector_ranked.c.id, lexical_ranked.c.id)
+            ).order_by(fused_score.desc(), Product.id).limit(limit).offset(offset)
+
+            results = db.session.execute(statement).all()
+
+            search_results = []
+            for row in results:
+                result = self.format_search_row(row)
+                result['score'] = float(row.score)
+                result['vector_rank'] = row.vector_rank
+                result['lexical_rank'] = row.lexical_rank
+                search_results.append(result)
+
+            self.logger.info("[HybridSearch] %d products returned", len(search_results))
+            return search_results
+
+        except Exception as e:
+            self.logger.error(f"\n\n======== Error with hybrid search ========\n{str(e)}\n\n")
+            raise
+
+    @track_operation('lexical_search')
+    @reads_from_replica
+    def lexical_search(self, query_text, limit=30, offset=0, category=None, min_price=None, max_price=None, in_stock=True):
+        """Full-text only ranking; the fallback when no query embedding is available."""
+        try:
+            tsquery = self.build_search_tsquery(query_text)
+            lexical_score = func.ts_rank_cd(Product.search_vector, tsquery)
+            results = db.session.query(
+                Product.id,
+                Product.name,
+                Product.description,
+                Product.category,
+                Product.price,
+                literal(None).label('distance'),
+                lexical_score.label('score')
+            ).filter(
+                Product.search_vector.op('@@')(tsquery),
+                *self.build_search_filters(category, min_price, max_price, in_stock)
+            ).order_by(lexical_score.desc(), Product.id).limit(limit).offset(offset).all()
+
+            search_results = []
+            for row in results:
+                result = self.format_search_row(row)
+                result['score'] = float(row.score)
+                search_results.append(result)
+
+            self.logger.info("[LexicalSearch] %d products returned", len(search_results))
+            return search_results
+
+        except Exception as e:
+            self.logger.error(f"\n\n======== Error with lexical search ========\n{str(e)}\n\n")
+            raise
+
+    def invalidate_neighbours(self, product_ids):
+        # Stale lists are dropped in the same transaction as the new embedding:
+        # the products' own lists and every list that ranks one of them, since
+        # those distances changed too. similar_products ranks live until
+        # refresh_neighbours recomputes every embedded product without a list.
+        owners = select(ProductNeighbour.product_id).where(ProductNeighbour.neighbour_id.in_(product_ids))
+        db.session.execute(delete(ProductNeighbour).where(
+            ProductNeighbour.product_id.in_(product_ids) | ProductNeighbour.product_id.in_(owners)
+        ))
+
+    def compute_neighbours(self, product_ids, k):
+        # Only the recomputed lists are replaced; invalidating their neighbours'
+        # lists here would make every refresh queue up more work for the next
+        db.session.execute(delete(ProductNeighbour).where(ProductNeighbour.product_id.in_(product_ids)))
+        # The scan also meets the product itself and out-of-stock rows, so it
+        # needs room for k + 1 candidates and an iterative scan past the filter
+        self.apply_ann_settings(rows_needed=k + 1, filtered=True)
+        db.session.execute(
+            text("""
+                INSERT INTO product_neighbour (product_id, rank, neighbour_id, distance, computed_at)
+                SELECT p.id,
+                       row_number() OVER (PARTITION BY p.id ORDER BY n.distance, n.id),
+                       n.id,
+                       n.distance,
+                       now()
+                FROM product p
+                CROSS JOIN LATERAL (
+                    SELECT q.id, q.embedding <=> p.embedding AS distance
+                    FROM product q
+                    WHERE q.embedding IS NOT NULL AND q.in_stock = true AND q.id <> p.id
+                    ORDER BY q.embedding <=> p.embedding
+                    LIMIT :k
+                ) n
+                WHERE p.id = ANY(:product_ids) AND p.embedding IS NOT NULL
+            """),
+            {'product_ids': list(product_ids), 'k': k}
+        )
+
+    @track_operation('refresh_neighbours')
+    def refresh_neighbours(self, chunk_size=None, max_items=None, time_budget=None, retry_failed=False, full=False,
+                           progress=None):
+        """Precompute the top-k neighbour lists used by `similar_products`.
+
+        By default only embedded products without a list (new or re-embedded,
+        or one of their neighbours was re-embedded) are computed; `full=True` recomputes every list so that products
+        embedded later also show up in older products' neighbours.
+        """
+        try:
+            chunk_size = chunk_size or int(os.getenv('NEIGHBOUR_CHUNK_SIZE', 200))
+            k = int(os.getenv('NEIGHBOUR_COUNT', 20))
+
+            def fetch_chunk(last_id, limit, ids):
+                query = db.session.query(Product.id).filter(Product.embedding.isnot(None))
+                if not full:
+                    query = query.filter(~db.session.query(ProductNeighbour.product_id).filter(
+                        ProductNeighbour.product_id == Product.id
+                    ).exists())
+                if ids is not None:
+                    query = query.filter(Product.id.in_(ids))
+                else:
+                    query = query.filter(Product.id > last_id)
+                return query.order_by(Product.id).limit(limit).all()
+
+            def process_chunk(rows):
+                self.compute_neighbours([row.id for row in rows], k)
+                return []
+
+            summary = self.run_backfill(
+                'neighbours-full' if full else 'neighbours', fetch_chunk, process_chunk, chunk_size,
+                max_items=max_items, time_budget=time_budget, retry_failed=retry_failed, progress=progress
+            )
+            self.logger.info(f"===== Neighbour Refresh {summary['status']} ===== {summary['succeeded']} products")
+            return summary
+        except Exception as e:
+            self.logger.error(f"\n\n======== Error refreshing neighbours ========\n{str(e)}\n\n")
+            raise
+
+    @track_operation('similar_products')
+    @reads_from_replica
+    def similar_products(self, product_id, limit=10):
+        try:
+            columns = (
+                Product.id,
+                Product.name,
+                Product.description,
+                Product.category,
+                Product.price
+            )
+            results = db.session.query(*columns, ProductNeighbour.distance.label('distance')).join(
+                ProductNeighbour, ProductNeighbour.neighbour_id == Product.id
+            ).filter(
+                (ProductNeighbour.product_id == product_id) & (Product.in_stock == True)
+            ).order_by(ProductNeighbour.rank).limit(limit).all()
+
+            if not results:
+                if db.session.query(Product.id).filter(Product.id == product_id).scalar() is None:
+                    return None
+
+                # No precomputed list yet: rank against the stored vector in SQL,
+                # without pulling the embedding into Python or calling Bedrock.
+                source_embedding = db.session.query(Product.embedding).filter(
+                    Product.id == product_id
+                ).scalar_subquery()
+                distance = Product.embedding.cosine_distance(source_embedding).label('distance')
+                results = db.session.query(*columns, distance).filter(
+                    (Product.embedding.isnot(None)) & (Product.in_stock == True) & (Product.id != product_id)
+                ).order_by(distance).limit(limit).all()
+
+            return [
+                {
+                    'id': row.id,
+                    'name': row.name,
+                    'description': row.description,
+                    'category': row.category,
+                    'price': row.price,
+                    'distance': float(row.distance),
+                    'similarity_score': 1 - float(row.distance)
+                }
+                for row in results
+                if row.distance is not None
+            ]
+
+        except Exception as e:
+            self.logger.error(f"\n\n======== Error finding similar products ========\n{str(e)}\n\n")
+            raise
+
+    @track_operation('ingest_products')
+    def ingest_products(self, stream, data_format, chunk_size=None):
+        try:
+            summary = ProductIngestor(chunk_size=chunk_size).ingest(stream, data_format)
+            self.logger.info(f"===== Ingest Complete ===== {summary['inserted']} inserted, {summary['rejected']} rejected")
+            return summary
+        except Exception as e:
+            self.logger.error(f"\n\n======== Error ingesting products ========\n{str(e)}\n\n")
+            raise
+
+    @staticmethod
+    def encode_cursor(created_at, product_id):
+        raw = f"{created_at.isoformat()}|{product_id}".encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            created_at, product_id = base64.urlsafe_b64decode(padded).decode().split('|')
+            return datetime.fromisoformat(created_at), int(product_id)
+        except (ValueError, UnicodeDecodeError):
+            raise ValueError('Invalid cursor')
+
+    @staticmethod
+    def make_page_etag(fields, rows, extra=''):
+        digest = hashlib.md5(','.join(fields).encode())
+        digest.update(extra.encode())
+        for row in rows:
+            digest.update(f"|{row.id}:{row.updated_at.isoformat() if row.updated_at else ''}".encode())
+        return digest.hexdigest()
+
+    @staticmethod
+    def serialize_product_row(row, fields):
+        item = {}
+        for field in fields:
+            value = getattr(row, field)
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            elif field == 'embedding' and value is not None:
+                value = [float(x) for x in (value.to_list() if hasattr(value, 'to_list') else value)]
+            item[field] = value
+        return item
+
+    @track_operation('fetch_product_page')
+    @reads_from_replica
+    def fetch_product_page(self, fields=DEFAULT_READ_FIELDS, limit=50, cursor=None, category=None, in_stock=None):
+        """Reads one page of products newest first, keyed on (created_at, id).
+
+        Only the requested columns are selected. `updated_at` is always read so
+        the caller can build an ETag and skip serialisation on a match.
+        """
+        try:
+            columns = {field: getattr(Product, field) for field in fields}
+            for field in ('id', 'created_at', 'updated_at'):
+                columns.setdefault(field, getattr(Product, field))
+
+            query = select(*columns.values())
+            if category is not None:
+                query = query.where(Product.category == category)
+            if in_stock is not None:
+                query = query.where(Product.in_stock == in_stock)
+            if cursor:
+                created_at, product_id = self.decode_cursor(cursor)
+                query = query.where(tuple_(Product.created_at, Product.id) < tuple_(created_at, product_id))
+
+            # Read one extra row to know whether another page exists
+            rows = db.session.execute(
+                query.order_by(Product.created_at.desc(), Product.id.desc()).limit(limit + 1)
+            ).all()
+            next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                next_cursor = self.encode_cursor(rows[-1].created_at, rows[-1].id)
+
+            return {
+                'rows': rows,
+                'next_cursor': next_cursor,
+                'etag': self.make_page_etag(fields, rows, extra=next_cursor or '')
+            }
+        except ValueError:
+            raise
+        except Exception as e:
+            self.logger.error(f"\n\n======== Error listing products ========\n{str(e)}\n\n")
+            raise
+
+    @track_operation('fetch_product')
+    @reads_from_replica
+    def fetch_product(self, product_id, fields=DEFAULT_READ_FIELDS):
+        try:
+            columns = {field: getattr(Product, field) for field in fields}
+            for field in ('id', 'updated_at'):
+                columns.setdefault(field, getattr(Product, field))
+
+            row = db.session.execute(
+                select(*columns.values()).where(Product.id == product_id)
+            ).first()
+            if row is None:
+                return None
+            return {'row': row, 'etag': self.make_page_etag(fields, [row])}
+        except Exception as e:
+            self.logger.error(f"\n\n======== Error reading product {product_id} ========\n{str(e)}\n\n")
+            raise
+
+    @track_operation('handle_document_from_s3')
     def handle_document_from_s3(self, s3_path):
         try:
             if s3_path.startswith('s3://'):
@@ -132,12 +984,24 @@ class ProductService:
                 raise ValueError("Invalid S3 path. Must be in format 'bucket/key/to/file'.")
             
             bucket_name, object_key = parts
-            
+
+            metadata = self.s3_service.get_object_metadata(bucket_name, object_key)
+            model_id = self.document_service.bedrock_service.extraction_model_id
+            cache_key = self.document_service.make_cache_key(bucket_name, object_key, metadata['etag'], model_id)
+            extracted_text = self.document_service.lookup_cache(cache_key)
+            if extracted_text is not None:
+                self.logger.info(f"[DocumentProcessing] Cache hit for {bucket_name}/{object_key} (etag {metadata['etag']})")
+                return extracted_text
+
             self.logger.info(f"[DocumentProcessing] Downloading from S3: bucket={bucket_name}, key={object_key}")
-            file_bytes = self.s3_service.read_file_from_s3(bucket_name, object_key)
+            file_bytes = self.s3_service.read_object_version(bucket_name, object_key, metadata['etag'])
 
             self.logger.info(f"[DocumentProcessing] Extracting text with Bedrock model...")
-            extracted_text = self.bedrock_service.extract_text_from_document(file_bytes)
+            document_format = self.document_service.detect_format(file_bytes, object_key)
+            extracted_text = self.document_service.extract(
+                file_bytes, document_format, deadline=Deadline.from_env('EXTRACT_LATENCY_BUDGET_MS', 300000)
+            )
+            self.document_service.store_cache(cache_key, bucket_name, object_key, metadata['etag'], model_id, extracted_text)
 
             self.logger.info(f"[DocumentProcessing] Extraction complete. Text length: {len(extracted_text) if extracted_text else 0}")
             return extracted_text
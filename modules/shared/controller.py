@@ -0,0 +1,20 @@
+from flask import current_app
+import logging
+from modules.shared.services.metrics import registry
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def metrics():
+    try:
+        return current_app.response_class(
+            registry.render(),
+            status=200,
+            content_type='text/plain; version=0.0.4; charset=utf-8'
+        )
+
+    except Exception as e:
+        logger.error(f"\n\n======== Error rendering metrics ======== \n{str(e)}\n\n")
+        return current_app.response_class('', status=500)
@@ -0,0 +1,34 @@
+from pgvector.sqlalchemy import Vector
+from extensions import db
+from datetime import datetime
+
+
+class EmbeddingCacheEntry(db.Model):
+    __tablename__ = 'embedding_cache'
+
+    key = db.Column(db.String(64), primary_key=True)
+    model_id = db.Column(db.String(100), nullable=False)
+    embedding = db.Column(Vector(), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class TranslationMemoryEntry(db.Model):
+    __tablename__ = 'translation_memory'
+
+    key = db.Column(db.String(64), primary_key=True)
+    source_language = db.Column(db.String(10), nullable=False)
+    target_language = db.Column(db.String(10), nullable=False)
+    translated_text = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class DocumentExtractionEntry(db.Model):
+    __tablename__ = 'document_extraction'
+
+    key = db.Column(db.String(64), primary_key=True)
+    bucket = db.Column(db.String(255), nullable=False)
+    object_key = db.Column(db.String(1024), nullable=False)
+    etag = db.Column(db.String(100), nullable=False)
+    model_id = db.Column(db.String(100), nullable=False)
+    extracted_text = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,191 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+ROOT_LOGGER = 'inventory'
+
+_configured = False
+_listener = None
+_configure_lock = threading.Lock()
+
+
+def _setting_list(name, default):
+    return [item.strip() for item in os.getenv(name, default).split(',') if item.strip()]
+
+
+MAX_FIELD_CHARS = int(os.getenv('LOG_MAX_FIELD_CHARS', 300))
+MAX_ITEMS = int(os.getenv('LOG_MAX_ITEMS', 20))
+REDACT_KEYS = set(_setting_list('LOG_REDACT_KEYS', 'prompt,inputText,embedding,messages,bytes'))
+
+
+def _is_vector(value):
+    if hasattr(value, 'to_list') or getattr(value, 'ndim', 0) >= 1:
+        return True
+    return (
+        isinstance(value, (list, tuple)) and len(value) > 16
+        and all(isinstance(item, float) for item in value[:16])
+    )
+
+
+def _describe_redacted(value):
+    if isinstance(value, (str, bytes, bytearray)):
+        return f'<redacted {len(value)} chars>'
+    if hasattr(value, '__len__'):
+        return f'<redacted {type(value).__name__} len={len(value)}>'
+    return '<redacted>'
+
+
+def redact(value, depth=0):
+    """Shrinks a log argument so it is cheap to queue and bounded when printed.
+
+    Vectors become a dimension summary, bytes a length, long strings are
+    truncated, and values under sensitive keys (prompts, embeddings, request
+    bodies) are replaced by their size. Containers are walked two levels deep.
+    """
+    if _is_vector(value):
+        if hasattr(value, 'to_list'):
+            value = value.to_list()
+        size = value.shape[-1] if hasattr(value, 'shape') else len(value)
+        return f'<vector dims={size}>'
+    if isinstance(value, (bytes, bytearray)):
+        return f'<{len(value)} bytes>'
+    if isinstance(value, str):
+        if len(value) > MAX_FIELD_CHARS:
+            return f'{value[:MAX_FIELD_CHARS]}... [{len(value)} chars]'
+        return value
+    if depth >= 2 and isinstance(value, (dict, list, tuple)):
+        return f'<{type(value).__name__} len={len(value)}>'
+    if isinstance(value, dict):
+        return {
+            key: (_describe_redacted(item) if key in REDACT_KEYS else redact(item, depth + 1))
+            for key, item in list(value.items())[:MAX_ITEMS]
+        }
+    if isinstance(value, (list, tuple)):
+        items = [redact(item, depth + 1) for item in value[:MAX_ITEMS]]
+        if len(value) > MAX_ITEMS:
+            items.append(f'... {len(value) - MAX_ITEMS} more')
+        return items
+    return value
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of a category's records below WARNING; warnings and errors always pass."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or random.random() < self.rate
+
+
+class RedactingQueueHandler(QueueHandler):
+    """Queues records without formatting them on the calling thread.
+
+    The stock QueueHandler renders the message before enqueueing. Here only
+    the arguments are shrunk with `redact`; the `%` formatting and I/O happen
+    on the listener thread.
+    """
+
+    def prepare(self, record):
+        if record.args:
+            record.args = redact(record.args) if isinstance(record.args, dict) else tuple(redact(arg) for arg in record.args)
+        fields = getattr(record, 'fields', None)
+        if fields:
+            record.fields = redact(fields)
+        if record.exc_info:
+            # Tracebacks hold frames that are unsafe to read from another thread
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    def format(self, record):
+        message = super().format(record)
+        fields = getattr(record, 'fields', None)
+        if fields:
+            message += ' ' + ' '.join(f'{key}={value}' for key, value in fields.items())
+        return message
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        payload = {
+            'ts': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        payload.update(getattr(record, 'fields', None) or {})
+        if record.exc_text:
+            payload['exc'] = record.exc_text
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+def configure_logging():
+    """Routes every `inventory.*` logger through one background queue listener.
+
+    LOG_LEVEL sets the threshold, LOG_FORMAT chooses `text` or `json`, and
+    LOG_SAMPLE_RATES (e.g. `search=0.05,bedrock=0.2`) keeps only that
+    fraction of a category's debug/info records.
+    """
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return
+        root = logging.getLogger(ROOT_LOGGER)
+        root.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+        root.propagate = False
+
+        log_queue = queue.SimpleQueue()
+        queue_handler = RedactingQueueHandler(log_queue)
+        root.addHandler(queue_handler)
+
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(JsonFormatter() if os.getenv('LOG_FORMAT', 'text').lower() == 'json' else TextFormatter())
+
+        def start_listener():
+            global _listener
+            _listener = QueueListener(queue_handler.queue, stream_handler, respect_handler_level=True)
+            _listener.start()
+
+        start_listener()
+        # Drain whatever is still queued when the process exits
+        atexit.register(lambda: _listener.stop())
+
+        def restart_after_fork():
+            # A forked worker (e.g. gunicorn with --preload) inherits neither the
+            # listener thread nor a safe queue, so it gets a new queue and listener
+            queue_handler.queue = queue.SimpleQueue()
+            start_listener()
+
+        os.register_at_fork(after_in_child=restart_after_fork)
+
+        for item in _setting_list('LOG_SAMPLE_RATES', ''):
+            category, _, rate = item.partition('=')
+            logging.getLogger(f'{ROOT_LOGGER}.{category.strip()}').addFilter(SamplingFilter(float(rate)))
+        _configured = True
+
+
+def get_logger(category=None, level=None):
+    """Returns the `inventory` logger, or the `inventory.<category>` child.
+
+    Pass values as arguments rather than pre-formatted strings, e.g.
+    `logger.info("Embedded %s products", count)`, so disabled or sampled-out
+    records cost almost nothing. Structured values go in `extra={'fields': {...}}`.
+    """
+    configure_logging()
+    logger = logging.getLogger(f'{ROOT_LOGGER}.{category}' if category else ROOT_LOGGER)
+    if level is not None:
+        logger.setLevel(level)
+    return logger
@@ -0,0 +1,43 @@
+import os
+import random
+import time
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from modules.shared.controller import metrics
+from modules.shared.services.metrics import HTTP_REQUEST_SECONDS, after_cursor_execute, before_cursor_execute
+
+
+def register_metrics_routes(app):
+    app.add_url_rule('/metrics', view_func=metrics, methods=['GET'])
+
+    # Listening on the Engine class covers every engine, including ones created later
+    if not event.contains(Engine, 'before_cursor_execute', before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', after_cursor_execute)
+
+    # Fraction of requests that get a Server-Timing breakdown header; 0 disables it
+    sample_rate = float(os.getenv('METRICS_TIMING_SAMPLE_RATE', 0))
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        g.stage_timings = {} if sample_rate and random.random() < sample_rate else None
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.get('request_started')
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        HTTP_REQUEST_SECONDS.observe(elapsed, method=request.method, endpoint=endpoint, status=response.status_code)
+
+        timings = g.get('stage_timings')
+        if timings is not None:
+            stages = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items()]
+            stages.append(f"total;dur={elapsed * 1000:.1f}")
+            response.headers['Server-Timing'] = ', '.join(stages)
+        return response
@@ -0,0 +1,75 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import boto3
+from botocore.config import Config
+
+from extensions import get_logger
+
+_session = None
+_clients = {}
+_lock = threading.Lock()
+
+# Set while AdaptiveThrottle makes a call. It retries throttling itself, so
+# botocore retrying underneath would multiply the attempts behind every call.
+single_attempt = ContextVar('single_attempt', default=False)
+
+
+@contextmanager
+def without_retries():
+    token = single_attempt.set(True)
+    try:
+        yield
+    finally:
+        single_attempt.reset(token)
+
+
+def get_client_config(max_attempts=None):
+    return Config(
+        region_name=os.getenv('AWS_REGION', 'us-east-1'),
+        max_pool_connections=int(os.getenv('AWS_MAX_POOL_CONNECTIONS', 50)),
+        connect_timeout=float(os.getenv('AWS_CONNECT_TIMEOUT', 5)),
+        read_timeout=float(os.getenv('AWS_READ_TIMEOUT', 60)),
+        tcp_keepalive=os.getenv('AWS_TCP_KEEPALIVE', 'true').lower() == 'true',
+        retries={
+            'mode': os.getenv('AWS_RETRY_MODE', 'adaptive'),
+            'total_max_attempts': max_attempts or int(os.getenv('AWS_MAX_ATTEMPTS', 5)),
+        },
+    )
+
+
+def get_client(service_name):
+    """Return the process-wide client for `service_name`, creating it on first use.
+
+    boto3 clients are thread-safe once built, but building them is not and
+    costs tens of milliseconds, so every service and worker thread shares
+    one client (and its connection pool) per AWS service. Inside
+    `without_retries()` a second client per service is used, one that makes
+    a single attempt per call.
+    """
+    key = (service_name, single_attempt.get())
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    global _session
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            started = time.perf_counter()
+            if _session is None:
+                _session = boto3.session.Session()
+            client = _session.client(service_name, config=get_client_config(max_attempts=1 if key[1] else None))
+            _clients[key] = client
+            get_logger('aws').info("[AWS] Created %s client in %.1f ms", service_name, (time.perf_counter() - started) * 1000)
+    return client
+
+
+def register_client(service_name, client):
+    """Replace the shared clients for `service_name`, e.g. with an offline stand-in."""
+    with _lock:
+        _clients[(service_name, False)] = client
+        _clients[(service_name, True)] = client
@@ -1,30 +1,57 @@
 import json
-import boto3
+import os
 from botocore.exceptions import ClientError
-from dotenv import load_dotenv
 
 from extensions import get_logger
+from modules.shared.services.aws import get_client
+from modules.shared.services.embedding_cache import get_embedding_cache
+from modules.shared.services.metrics import BEDROCK_ERRORS, BEDROCK_REQUEST_SECONDS, timed
+from modules.shared.services.resilience import get_circuit_breaker, resilient_call
+
+IMAGE_FORMATS = ('png', 'jpeg', 'gif', 'webp')
 
 
 class BedrockService:
+    EMBEDDING_MODEL_ID = "amazon.titan-embed-text-v2:0"
+
     def __init__(self):
-        load_dotenv()
-        self.logger = get_logger()
-        self.client = boto3.client('bedrock-runtime', region_name='us-east-1')
+        self.logger = get_logger('bedrock')
+        self.embedding_cache = get_embedding_cache()
+        self.embedding_dimensions = int(os.getenv('EMBEDDING_DIMENSIONS', 1024))
+        # 0 disables hedging; embeddings are idempotent so duplicates are safe
+        self.hedge_delay = float(os.getenv('BEDROCK_HEDGE_DELAY_MS', 0)) / 1000
+        self.extraction_model_id = os.getenv('EXTRACT_MODEL_ID', 'anthropic.claude-3-5-sonnet-20240620-v1:0')
+
+    @property
+    def client(self):
+        return get_client('bedrock-runtime')
+
+    def invoke_model_json(self, model_id, body, deadline=None, hedge=False, **kwargs):
+        # Picked here rather than on the resilient_call thread, which does not see `without_retries`
+        client = self.client
+
+        def call():
+            response = client.invoke_model(modelId=model_id, body=body, **kwargs)
+            return json.loads(response['body'].read())
 
-    def invoke_model_with_request(self, prompt):
+        with timed(BEDROCK_REQUEST_SECONDS, stage='bedrock', errors=BEDROCK_ERRORS, model_id=model_id, operation='invoke_model'):
+            return resilient_call(
+                call,
+                get_circuit_breaker(f"bedrock:{model_id}"),
+                deadline=deadline,
+                hedge_delay=self.hedge_delay if hedge else None
+            )
+
+    def invoke_model_with_request(self, prompt, max_tokens=512, temperature=0.5, deadline=None):
         try:
-            
-            self.logger.info(f"============ Entering Invoke Model ========== \n")
-            self.logger.info(f"\n\n====== Invoking model with prompt ======= \n {prompt}\n\n")
-            
             model_id = 'anthropic.claude-3-5-sonnet-20240620-v1:0'
-            self.logger.info(f"Using model ID: {model_id}")
-            
+            # The prompt is truncated by the log handler, and only rendered at DEBUG
+            self.logger.debug("[Bedrock] Invoking %s (max_tokens=%s) with prompt: %s", model_id, max_tokens, prompt)
+
             native_request = {
                 "anthropic_version": 'bedrock-2023-05-31',
-                "max_tokens": 512,
-                "temperature": 0.5,
+                "max_tokens": max_tokens,
+                "temperature": temperature,
                 "messages": [
                     {
                         "role": "user",
@@ -32,79 +59,106 @@ class BedrockService:
                     }
                 ],
             }
-            self.logger.info(f"\n\nNative request for model invocation\n\n{native_request}\n\n")
-            
             request = json.dumps(native_request)
-            self.logger.info(f"\n\nRequest to invoke model\n\n{request}\n\n")
-            
+
             try:
-                response = self.client.invoke_model(modelId=model_id, body=request)
+                model_response = self.invoke_model_json(model_id, request, deadline=deadline)
             except Exception as e:
                 self.logger.error(f"\n\nError invoking model:\n\n{e}\n\n")
                 raise
-            self.logger.info(f"\n\n====== Response from model ======= \n {model_id}: {response}\n\n")
-            
-            model_response = json.loads(response["body"].read())
-            
+            self.logger.debug("[Bedrock] Response from %s: %s", model_id, model_response)
+
             response_text = model_response["content"][0]["text"]
             
             return response_text
         
         except (ClientError, Exception) as e:
-            print(f"ERROR: Can't invoke 'anthropic.claude-3-5-sonnet-20240620-v1:0'. Reason: {e}")
+            self.logger.error("[Bedrock] Can't invoke anthropic.claude-3-5-sonnet-20240620-v1:0: %s", e)
             raise
 
 
-    def get_embedding(self, text):
+    def get_embedding(self, text, use_cache=True, dimensions=None, deadline=None):
+        dimensions = dimensions or self.embedding_dimensions
+        # Vectors of different sizes must never share a cache entry
+        cache_model_id = f"{self.EMBEDDING_MODEL_ID}:{dimensions}"
+        if use_cache:
+            cached = self.embedding_cache.get(cache_model_id, text)
+            if cached is not None:
+                return cached
+
         body = {
-            "inputText": text
+            "inputText": text,
+            "dimensions": dimensions,
+            "normalize": True
         }
-        response = self.client.invoke_model(
-            modelId="amazon.titan-embed-text-v2:0",
-            body=json.dumps(body),
+        result = self.invoke_model_json(
+            self.EMBEDDING_MODEL_ID,
+            json.dumps(body),
+            deadline=deadline,
+            hedge=True,
             contentType="application/json",
             accept="application/json"
         )
-        result = json.loads(response['body'].read())
-        
-        return result['embedding']
+        embedding = result['embedding']
+
+        if use_cache:
+            self.embedding_cache.set(cache_model_id, text, embedding)
+
+        return embedding
     
-    def extract_text_from_document(self, file_bytes):
-        import base64
+    def converse(self, model_id, messages, deadline=None, **kwargs):
+        client = self.client
+        with timed(BEDROCK_REQUEST_SECONDS, stage='bedrock', errors=BEDROCK_ERRORS, model_id=model_id, operation='converse'):
+            return resilient_call(
+                lambda: client.converse(modelId=model_id, messages=messages, **kwargs),
+                get_circuit_breaker(f"bedrock:{model_id}"),
+                deadline=deadline
+            )
+
+    def extract_text_from_document(self, file_bytes, document_format, deadline=None):
+        """Extracts text from a document or image sent as a native content block.
+
+        The bytes go to the Converse API as-is, with no base64 text in the
+        prompt. When the answer stops at the output limit, the partial text is
+        sent back as an assistant turn so the model carries on where it stopped.
+        """
         try:
-            self.logger.info("[Bedrock] extract_text_from_document called. Sending document bytes to Claude 3.5 Sonnet model.")
+            model_id = self.extraction_model_id
+            max_tokens = int(os.getenv('EXTRACT_MAX_OUTPUT_TOKENS', 4096))
+            max_continuations = int(os.getenv('EXTRACT_MAX_CONTINUATIONS', 4))
+            self.logger.info("[Bedrock] Extracting text from %d byte %s document with %s", len(file_bytes), document_format, model_id)
 
-            model_id = 'anthropic.claude-3-5-sonnet-20240620-v1:0'
-            b64_doc = base64.b64encode(file_bytes).decode('utf-8')
-            prompt = (
-                "You will receive a document as a base64-encoded file. "
-                "Extract all readable text from the document. "
-                "Respond ONLY with the extracted text, no explanations.\n\n"
-                "Document (base64):\n" + b64_doc
-            )
-            native_request = {
-                "anthropic_version": 'bedrock-2023-05-31',
-                "max_tokens": 2048,
-                "temperature": 0.0,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": [{"type": "text", "text": prompt}],
-                    }
-                ],
-            }
-            request = json.dumps(native_request)
-            response = self.client.invoke_model(
-                modelId=model_id,
-                body=request,
-                contentType="application/json",
-                accept="application/json"
-            )
-            self.logger.info(f"[Bedrock] Claude 3.5 Sonnet extraction response received.")
-            model_response = json.loads(response["body"].read())
-            extracted_text = model_response["content"][0]["text"]
-            self.logger.info(f"[Bedrock] Extracted text: {extracted_text[:100]}...")  # Log first 100 chars
+            if document_format in IMAGE_FORMATS:
+                block = {"image": {"format": document_format, "source": {"bytes": file_bytes}}}
+            else:
+                block = {"document": {"format": document_format, "name": "document", "source": {"bytes": file_bytes}}}
+            messages = [{
+                "role": "user",
+                "content": [
+                    block,
+                    {"text": "Extract all readable text from the document. Respond ONLY with the extracted text, no explanations."}
+                ]
+            }]
+
+            extracted_text = ''
+            for _ in range(max_continuations + 1):
+                response = self.converse(
+                    model_id,
+                    messages,
+                    deadline=deadline,
+                    inferenceConfig={"maxTokens": max_tokens, "temperature": 0.0}
+                )
+                extracted_text += ''.join(part.get('text', '') for part in response['output']['message']['content'])
+                if response.get('stopReason') != 'max_tokens':
+                    break
+                # The final assistant turn must not end in whitespace
+                extracted_text = extracted_text.rstrip()
+                messages = messages[:1] + [{"role": "assistant", "content": [{"text": extracted_text}]}]
+            else:
+                self.logger.warning(f"[Bedrock] Extraction still truncated after {max_continuations} continuations")
+
+            self.logger.debug("[Bedrock] Extracted text: %s", extracted_text)
             return extracted_text
         except Exception as e:
             self.logger.error(f"[Bedrock] Error extracting text from document: {str(e)}")
-            raise
\ No newline at end of file
+            raise
@@ -0,0 +1,232 @@
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from flask import current_app
+from flask_sqlalchemy.session import Session
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError, OperationalError
+
+from modules.shared.logger import get_logger
+from modules.shared.services.metrics import registry
+
+REPLICA_BIND = 'replica'
+# SQLSTATE of "canceling statement due to conflict with recovery" on a hot standby
+RECOVERY_CONFLICT = '40001'
+
+# 'replica' while a read path that tolerates slightly stale rows is running
+read_route = ContextVar('read_route', default='primary')
+# Replica engine picked when that read path started, or None to stay on the
+# primary; every statement of the path goes to the same side
+replica_engine = ContextVar('replica_engine', default=None)
+# Set once a statement in the current read path has been sent to the replica
+replica_served = ContextVar('replica_served', default=False)
+
+REPLICA_FALLBACKS = registry.counter(
+    'inventory_db_replica_fallbacks_total', 'Replica-routed statements sent to the primary because the replica was unusable.', ('reason',)
+)
+
+# Lag is zero while the replica has replayed everything it received, so an
+# idle primary does not make a healthy replica look stale
+REPLICA_LAG_QUERY = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+def _setting(prefix, name, default):
+    return os.getenv(f'{prefix}_{name}', os.getenv(f'DB_{name}', default))
+
+
+def engine_options(uri, prefix='DB'):
+    """Builds create_engine() options for `uri` from DB_* settings.
+
+    A replica reads the same settings with a REPLICA_ prefix first, e.g.
+    REPLICA_POOL_SIZE, and falls back to the DB_ value.
+    """
+    url = make_url(uri)
+    options = {
+        'pool_pre_ping': _setting(prefix, 'POOL_PRE_PING', 'true').lower() == 'true',
+        'pool_recycle': int(_setting(prefix, 'POOL_RECYCLE', 1800)),
+        'query_cache_size': int(_setting(prefix, 'QUERY_CACHE_SIZE', 500)),
+    }
+    if url.get_backend_name() == 'sqlite':
+        return options
+
+    options.update(
+        pool_size=int(_setting(prefix, 'POOL_SIZE', 5)),
+        max_overflow=int(_setting(prefix, 'MAX_OVERFLOW', 10)),
+        pool_timeout=float(_setting(prefix, 'POOL_TIMEOUT', 30)),
+    )
+    if url.get_backend_name() == 'postgresql':
+        connect_args = {'connect_timeout': int(_setting(prefix, 'CONNECT_TIMEOUT', 10))}
+        statement_timeout = int(_setting(prefix, 'STATEMENT_TIMEOUT_MS', 0))
+        if statement_timeout:
+            connect_args['options'] = f'-c statement_timeout={statement_timeout}'
+        if url.get_driver_name() == 'psycopg':
+            # psycopg 3 prepares a statement server-side after it runs this many
+            # times on a connection; psycopg2 has no server-side prepared statements
+            prepare_threshold = _setting(prefix, 'PREPARE_THRESHOLD', '5')
+            connect_args['prepare_threshold'] = int(prepare_threshold) if prepare_threshold.lower() != 'none' else None
+        options['connect_args'] = connect_args
+    return options
+
+
+def configure_database(app):
+    """Sets the primary URI, engine options and the optional read-replica bind."""
+    uri = os.getenv('DATABASE_URI_PG')
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    if uri:
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(uri)
+
+    replica_uri = os.getenv('DATABASE_URI_PG_REPLICA')
+    if replica_uri:
+        app.config['SQLALCHEMY_BINDS'] = {REPLICA_BIND: {'url': replica_uri, **engine_options(replica_uri, 'REPLICA')}}
+
+
+class ReplicaHealth:
+    """Decides whether reads may go to the replica.
+
+    Replication lag is measured at most every REPLICA_CHECK_SECONDS by one
+    thread; the others use the last answer. A replica lagging more than
+    REPLICA_MAX_LAG_SECONDS, or one that failed a query, is skipped until the
+    next check.
+    """
+
+    def __init__(self, max_lag_seconds=None, check_seconds=None):
+        self.logger = get_logger('database')
+        self.max_lag_seconds = max_lag_seconds or float(os.getenv('REPLICA_MAX_LAG_SECONDS', 5))
+        self.check_seconds = check_seconds or float(os.getenv('REPLICA_CHECK_SECONDS', 5))
+        self.healthy = True
+        self.lag_seconds = 0.0
+        self.reason = None
+        self._checked_at = float('-inf')
+        self._check_lock = threading.Lock()
+
+    def available(self, engine):
+        if time.monotonic() - self._checked_at >= self.check_seconds and self._check_lock.acquire(blocking=False):
+            try:
+                self.check(engine)
+            finally:
+                self._check_lock.release()
+        if not self.healthy:
+            REPLICA_FALLBACKS.inc(reason=self.reason)
+        return self.healthy
+
+    def check(self, engine):
+        self._checked_at = time.monotonic()
+        try:
+            with engine.connect() as connection:
+                self.lag_seconds = float(connection.execute(REPLICA_LAG_QUERY).scalar() or 0)
+        except Exception as e:
+            self.mark_down('error', str(e))
+            return
+        if self.lag_seconds > self.max_lag_seconds:
+            self.mark_down('lag', f'{self.lag_seconds:.1f}s behind')
+        else:
+            if not self.healthy:
+                self.logger.info("[Database] Replica back in use (%.1fs behind)", self.lag_seconds)
+            self.healthy = True
+            self.reason = None
+
+    def mark_down(self, reason, detail):
+        if self.healthy:
+            self.logger.warning("[Database] Reading from the primary, replica unusable (%s): %s", reason, detail)
+        self.healthy = False
+        self.reason = reason
+        self._checked_at = time.monotonic()
+
+
+replica_health = ReplicaHealth()
+
+
+class RoutingSession(Session):
+    """Sends reads made under `use_replica` to the replica bind, everything else to the primary.
+
+    The replica's health is checked once when the read path starts, not per
+    statement, so session settings such as `set_config(..., true)` and the
+    query they tune always run on the same server. Flushes and DML always
+    use the primary, so a read path that happens to write cannot reach the
+    replica.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and read_route.get() == 'replica' and not self._flushing and not getattr(clause, 'is_dml', False):
+            engine = replica_engine.get()
+            if engine is not None:
+                replica_served.set(True)
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def choose_replica():
+    """The replica engine if one is configured and healthy right now, else None."""
+    engine = current_app.extensions['sqlalchemy'].engines.get(REPLICA_BIND)
+    if engine is not None and replica_health.available(engine):
+        return engine
+    return None
+
+
+@contextmanager
+def use_replica():
+    token = read_route.set('replica')
+    engine_token = replica_engine.set(choose_replica())
+    try:
+        yield
+    finally:
+        replica_engine.reset(engine_token)
+        read_route.reset(token)
+
+
+@contextmanager
+def use_primary():
+    """Pins a block to the primary inside a replica read path, e.g. for a watermark read."""
+    token = read_route.set('primary')
+    try:
+        yield
+    finally:
+        read_route.reset(token)
+
+
+def reads_from_replica(fn):
+    """Runs a read-only service method against the replica when one is configured.
+
+    If the replica drops the connection mid-call it is marked down and the
+    call is repeated once on the primary; a statement cancelled by a recovery
+    conflict is repeated on the primary without marking the replica down.
+    Statement timeouts and query errors are raised as they are.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if read_route.get() == 'replica':
+            return fn(*args, **kwargs)
+
+        token = read_route.set('replica')
+        engine_token = replica_engine.set(choose_replica())
+        served_token = replica_served.set(False)
+        try:
+            try:
+                return fn(*args, **kwargs)
+            except DBAPIError as e:
+                code = getattr(e.orig, 'pgcode', None)
+                retryable = e.connection_invalidated or (isinstance(e, OperationalError) and code in (None, RECOVERY_CONFLICT))
+                if not replica_served.get() or not retryable:
+                    raise
+                current_app.extensions['sqlalchemy'].session.rollback()
+                if code == RECOVERY_CONFLICT:
+                    REPLICA_FALLBACKS.inc(reason='recovery_conflict')
+                else:
+                    replica_health.mark_down('error', str(e.orig))
+                    REPLICA_FALLBACKS.inc(reason='error')
+                with use_primary():
+                    return fn(*args, **kwargs)
+        finally:
+            replica_served.reset(served_token)
+            replica_engine.reset(engine_token)
+            read_route.reset(token)
+    return wrapper
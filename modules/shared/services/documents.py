@@ -0,0 +1,122 @@
+import hashlib
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from sqlalchemy.dialects.postgresql import insert
+
+from extensions import db, get_logger
+from modules.shared.entity import DocumentExtractionEntry
+from modules.shared.services.bedrock import BedrockService
+
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:  # PDFs are then sent whole instead of in page ranges
+    PdfReader = PdfWriter = None
+
+EXTENSION_FORMATS = {
+    'pdf': 'pdf', 'csv': 'csv', 'doc': 'doc', 'docx': 'docx', 'xls': 'xls', 'xlsx': 'xlsx',
+    'html': 'html', 'htm': 'html', 'txt': 'txt', 'md': 'md',
+    'png': 'png', 'jpg': 'jpeg', 'jpeg': 'jpeg', 'gif': 'gif', 'webp': 'webp'
+}
+MAGIC_FORMATS = (
+    (b'%PDF', 'pdf'),
+    (b'\x89PNG', 'png'),
+    (b'\xff\xd8\xff', 'jpeg'),
+    (b'GIF8', 'gif'),
+)
+
+
+class DocumentService:
+    """Extracts text from S3 documents, splitting large PDFs into page ranges.
+
+    Page ranges are extracted in parallel and joined back in page order.
+    Results are stored in the `document_extraction` table keyed by bucket,
+    key, S3 ETag and model, so an unchanged object is never sent to Bedrock twice.
+    """
+
+    def __init__(self):
+        self.logger = get_logger('documents')
+        self.bedrock_service = BedrockService()
+        self.pages_per_chunk = int(os.getenv('EXTRACT_PDF_PAGES_PER_CHUNK', 20))
+        self.max_workers = int(os.getenv('EXTRACT_MAX_WORKERS', 4))
+
+    @staticmethod
+    def detect_format(file_bytes, object_key):
+        for magic, document_format in MAGIC_FORMATS:
+            if file_bytes.startswith(magic):
+                return document_format
+        if file_bytes[:4] == b'RIFF' and file_bytes[8:12] == b'WEBP':
+            return 'webp'
+        extension = object_key.rsplit('.', 1)[-1].lower() if '.' in object_key else ''
+        if extension not in EXTENSION_FORMATS:
+            raise ValueError(f"Unsupported document type for '{object_key}'")
+        return EXTENSION_FORMATS[extension]
+
+    def split_pdf(self, file_bytes):
+        if PdfReader is None:
+            return [file_bytes]
+        reader = PdfReader(io.BytesIO(file_bytes))
+        page_count = len(reader.pages)
+        if page_count <= self.pages_per_chunk:
+            return [file_bytes]
+
+        chunks = []
+        for start in range(0, page_count, self.pages_per_chunk):
+            writer = PdfWriter()
+            for page in reader.pages[start:start + self.pages_per_chunk]:
+                writer.add_page(page)
+            buffer = io.BytesIO()
+            writer.write(buffer)
+            chunks.append(buffer.getvalue())
+        self.logger.info(f"[DocumentProcessing] Split {page_count} page PDF into {len(chunks)} chunks")
+        return chunks
+
+    def extract(self, file_bytes, document_format, deadline=None):
+        chunks = self.split_pdf(file_bytes) if document_format == 'pdf' else [file_bytes]
+        if len(chunks) == 1:
+            return self.bedrock_service.extract_text_from_document(chunks[0], document_format, deadline=deadline)
+
+        app = current_app._get_current_object()
+
+        def extract_chunk(chunk):
+            with app.app_context():
+                return self.bedrock_service.extract_text_from_document(chunk, document_format, deadline=deadline)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            # map() yields in submission order, so pages come back in sequence
+            return '\n\n'.join(executor.map(extract_chunk, chunks))
+
+    @staticmethod
+    def make_cache_key(bucket_name, object_key, etag, model_id):
+        return hashlib.sha256(f"{bucket_name}\0{object_key}\0{etag}\0{model_id}".encode('utf-8')).hexdigest()
+
+    # Cache reads and writes use their own connection so they never touch db.session
+    def lookup_cache(self, key):
+        try:
+            with db.engine.connect() as connection:
+                return connection.execute(
+                    db.select(DocumentExtractionEntry.extracted_text).where(DocumentExtractionEntry.key == key)
+                ).scalar()
+        except Exception as e:
+            self.logger.warning(f"[DocumentProcessing] Cache lookup failed: {str(e)}")
+            return None
+
+    def store_cache(self, key, bucket_name, object_key, etag, model_id, extracted_text):
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(
+                    insert(DocumentExtractionEntry)
+                    .values(
+                        key=key,
+                        bucket=bucket_name,
+                        object_key=object_key,
+                        etag=etag,
+                        model_id=model_id,
+                        extracted_text=extracted_text
+                    )
+                    .on_conflict_do_nothing(index_elements=['key'])
+                )
+        except Exception as e:
+            self.logger.warning(f"[DocumentProcessing] Cache write failed: {str(e)}")
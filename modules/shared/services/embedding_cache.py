@@ -0,0 +1,151 @@
+import hashlib
+import os
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+from sqlalchemy.dialects.postgresql import insert
+
+from extensions import db, get_logger
+from modules.shared.entity import EmbeddingCacheEntry
+from modules.shared.services.metrics import EMBEDDING_CACHE_EVICTIONS, EMBEDDING_CACHE_LOOKUPS
+
+
+class EmbeddingCache:
+    """Two-tier cache for embeddings keyed by a hash of model id + input text.
+
+    The first tier is an in-process LRU with size and TTL eviction; vectors
+    are kept as float32 arrays (~4 KB per 1024-d entry). The second tier is
+    the `embedding_cache` table, shared by every worker and kept across restarts.
+    Hits, misses and evictions are also counted on /metrics.
+    """
+
+    def __init__(self, max_size=None, ttl_seconds=None, persistent=None):
+        self.logger = get_logger('embedding_cache')
+        self.max_size = max_size if max_size is not None else int(os.getenv('EMBEDDING_CACHE_SIZE', 2000))
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else int(os.getenv('EMBEDDING_CACHE_TTL', 86400))
+        if persistent is None:
+            persistent = os.getenv('EMBEDDING_CACHE_PERSIST', 'true').lower() == 'true'
+        self.persistent = persistent
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(model_id, text):
+        return hashlib.sha256(f"{model_id}\0{text}".encode('utf-8')).hexdigest()
+
+    def get(self, model_id, text):
+        key = self.make_key(model_id, text)
+
+        vector = self._get_memory(key)
+        if vector is not None:
+            with self._lock:
+                self.memory_hits += 1
+            EMBEDDING_CACHE_LOOKUPS.inc(result='memory_hit')
+            return vector
+
+        if self.persistent:
+            vector = self._get_persistent(key)
+            if vector is not None:
+                self._set_memory(key, vector)
+                with self._lock:
+                    self.persistent_hits += 1
+                EMBEDDING_CACHE_LOOKUPS.inc(result='persistent_hit')
+                return vector
+
+        with self._lock:
+            self.misses += 1
+        EMBEDDING_CACHE_LOOKUPS.inc(result='miss')
+        return None
+
+    def set(self, model_id, text, vector):
+        key = self.make_key(model_id, text)
+        self._set_memory(key, vector)
+        if self.persistent:
+            self._set_persistent(key, model_id, vector)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.persistent_hits + self.misses
+            hits = self.memory_hits + self.persistent_hits
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'memory_hits': self.memory_hits,
+                'persistent_hits': self.persistent_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': hits / lookups if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _get_memory(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, vector = entry
+            if self.ttl_seconds and time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.evictions += 1
+                EMBEDDING_CACHE_EVICTIONS.inc()
+                return None
+            self._entries.move_to_end(key)
+            return vector.tolist()
+
+    def _set_memory(self, key, vector):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), array('f', vector))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+                EMBEDDING_CACHE_EVICTIONS.inc()
+
+    # The persistent tier uses its own short connection so cache writes never
+    # commit or roll back whatever the caller has pending in db.session.
+    def _get_persistent(self, key):
+        try:
+            with db.engine.connect() as connection:
+                embedding = connection.execute(
+                    db.select(EmbeddingCacheEntry.embedding).where(EmbeddingCacheEntry.key == key)
+                ).scalar()
+            return [float(value) for value in embedding] if embedding is not None else None
+        except Exception as e:
+            self.logger.warning(f"[EmbeddingCache] Persistent lookup failed: {str(e)}")
+            return None
+
+    def _set_persistent(self, key, model_id, vector):
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(
+                    insert(EmbeddingCacheEntry)
+                    .values(key=key, model_id=model_id, embedding=vector)
+                    .on_conflict_do_nothing(index_elements=['key'])
+                )
+        except Exception as e:
+            self.logger.warning(f"[EmbeddingCache] Persistent write failed: {str(e)}")
+
+
+_embedding_cache = None
+_embedding_cache_lock = threading.Lock()
+
+
+def get_embedding_cache():
+    global _embedding_cache
+    if _embedding_cache is None:
+        with _embedding_cache_lock:
+            if _embedding_cache is None:
+                _embedding_cache = EmbeddingCache()
+    return _embedding_cache
@@ -0,0 +1,226 @@
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from flask import g, has_request_context
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Name of the ProductService operation running in this context; SQL timings are labelled with it
+current_operation = ContextVar('current_operation', default='other')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # Per-bucket counts (plus +Inf), sum, count; made cumulative when rendered
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            snapshot = [(key, list(counts), total, count) for key, (counts, total, count) in sorted(self._values.items())]
+        for key, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, ("le", le))} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, key)} {repr(total)}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, key)} {count}')
+        return lines
+
+
+class MetricsRegistry:
+    """Process-local counters and histograms rendered in the Prometheus text format.
+
+    Each worker process keeps its own values; scrape every worker, or run a
+    single worker per container, to see the whole service.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.setdefault(metric.name, metric)
+        return existing
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = registry.histogram(
+    'inventory_http_request_seconds', 'Time spent handling HTTP requests.', ('method', 'endpoint', 'status')
+)
+SERVICE_CALL_SECONDS = registry.histogram(
+    'inventory_service_call_seconds', 'Time spent in ProductService operations.', ('operation',)
+)
+SERVICE_ERRORS = registry.counter(
+    'inventory_service_errors_total', 'ProductService operations that raised.', ('operation',)
+)
+DB_QUERY_SECONDS = registry.histogram(
+    'inventory_db_query_seconds', 'Time spent executing SQL statements, by calling operation.', ('operation',)
+)
+BEDROCK_REQUEST_SECONDS = registry.histogram(
+    'inventory_bedrock_request_seconds', 'Latency of Bedrock calls, including retries and hedges.', ('model_id', 'operation')
+)
+BEDROCK_ERRORS = registry.counter(
+    'inventory_bedrock_errors_total', 'Bedrock calls that failed.', ('model_id', 'operation')
+)
+TRANSLATE_REQUEST_SECONDS = registry.histogram(
+    'inventory_translate_request_seconds', 'Latency of Amazon Translate calls.', ('source_language', 'target_language')
+)
+TRANSLATE_ERRORS = registry.counter(
+    'inventory_translate_errors_total', 'Amazon Translate calls that failed.', ('source_language', 'target_language')
+)
+S3_REQUEST_SECONDS = registry.histogram(
+    'inventory_s3_request_seconds', 'Latency of S3 calls.', ('operation',)
+)
+S3_READ_BYTES = registry.counter(
+    'inventory_s3_read_bytes_total', 'Bytes downloaded from S3.'
+)
+SERIALISE_SECONDS = registry.histogram(
+    'inventory_serialise_seconds', 'Time spent serialising responses.', ('endpoint',)
+)
+EMBEDDING_CACHE_LOOKUPS = registry.counter(
+    'inventory_embedding_cache_lookups_total', 'Embedding cache lookups, by the tier that answered them.', ('result',)
+)
+SEARCH_CACHE_LOOKUPS = registry.counter(
+    'inventory_search_cache_lookups_total', 'Search response cache lookups; a stale entry is also a miss.', ('result',)
+)
+SEARCH_CACHE_EVICTIONS = registry.counter(
+    'inventory_search_cache_evictions_total', 'Search responses dropped from the cache by entry count or size.'
+)
+EMBEDDING_CACHE_EVICTIONS = registry.counter(
+    'inventory_embedding_cache_evictions_total', 'Entries dropped from the in-process embedding cache by size or TTL.'
+)
+
+
+def record_stage(stage, seconds):
+    """Adds time to the sampled per-request breakdown, when this request is sampled."""
+    if has_request_context():
+        timings = g.get('stage_timings')
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def timed(histogram, stage=None, errors=None, **labels):
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        if errors is not None:
+            errors.inc(**labels)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        histogram.observe(elapsed, **labels)
+        if stage is not None:
+            record_stage(stage, elapsed)
+
+
+def track_operation(operation):
+    """Times a service method and labels the SQL it issues with `operation`."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            token = current_operation.set(operation)
+            try:
+                with timed(SERVICE_CALL_SECONDS, errors=SERVICE_ERRORS, operation=operation):
+                    return fn(*args, **kwargs)
+            finally:
+                current_operation.reset(token)
+        return wrapper
+    return decorator
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_query_started', None)
+    if started is not None:
+        elapsed = time.perf_counter() - started
+        DB_QUERY_SECONDS.observe(elapsed, operation=current_operation.get())
+        record_stage('db', elapsed)
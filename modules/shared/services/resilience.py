@@ -0,0 +1,198 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from extensions import get_logger
+from modules.shared.services.throttling import is_throttling_error
+
+
+class ServiceUnavailableError(Exception):
+    """A downstream call was skipped or abandoned; callers may fall back."""
+
+
+class DeadlineExceededError(ServiceUnavailableError, TimeoutError):
+    pass
+
+
+class CircuitOpenError(ServiceUnavailableError):
+    pass
+
+
+class Deadline:
+    """Absolute time budget handed down from an endpoint to the calls it makes."""
+
+    def __init__(self, seconds):
+        self.expires_at = time.monotonic() + seconds
+
+    @classmethod
+    def from_env(cls, name, default_ms):
+        milliseconds = float(os.getenv(name, default_ms))
+        return cls(milliseconds / 1000) if milliseconds > 0 else None
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self):
+        return self.remaining() <= 0
+
+
+def counts_as_failure(error):
+    """Only errors that say the endpoint is unhealthy should trip a breaker.
+
+    Throttling is left out: it means this account is over its quota, which
+    AdaptiveThrottle backs off from. Counting it would let a throttled bulk
+    run open the per-model breaker that interactive search shares.
+    """
+    if isinstance(error, (DeadlineExceededError, BotoCoreError)):
+        return True
+    if isinstance(error, ClientError):
+        if is_throttling_error(error):
+            return False
+        status = error.response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0)
+        return status >= 500
+    return False
+
+
+class CircuitBreaker:
+    """Fails fast once the failure rate over a sliding window crosses a threshold.
+
+    After `open_seconds` one trial call is let through (half-open); its
+    outcome either closes the breaker or opens it for another period.
+    """
+
+    def __init__(self, name, failure_rate=None, min_calls=None, window_seconds=None, open_seconds=None):
+        self.name = name
+        self.logger = get_logger('resilience')
+        self.failure_rate = failure_rate if failure_rate is not None else float(os.getenv('BREAKER_FAILURE_RATE', 0.5))
+        self.min_calls = min_calls if min_calls is not None else int(os.getenv('BREAKER_MIN_CALLS', 10))
+        self.window_seconds = window_seconds if window_seconds is not None else float(os.getenv('BREAKER_WINDOW_SECONDS', 30))
+        self.open_seconds = open_seconds if open_seconds is not None else float(os.getenv('BREAKER_OPEN_SECONDS', 15))
+        self.state = 'closed'
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._outcomes = deque()
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == 'open':
+                if time.monotonic() - self.opened_at < self.open_seconds:
+                    self.rejected += 1
+                    raise CircuitOpenError(f"Circuit '{self.name}' is open")
+                self.state = 'half-open'
+                self._trial_in_flight = False
+            if self.state == 'half-open':
+                if self._trial_in_flight:
+                    self.rejected += 1
+                    raise CircuitOpenError(f"Circuit '{self.name}' is half-open and already probing")
+                self._trial_in_flight = True
+
+    def record(self, success):
+        now = time.monotonic()
+        with self._lock:
+            if self.state == 'half-open':
+                self._trial_in_flight = False
+                self._outcomes.clear()
+                if success:
+                    self.state = 'closed'
+                    self.logger.info(f"[CircuitBreaker] '{self.name}' closed")
+                else:
+                    self._open(now)
+                return
+
+            self._outcomes.append((now, success))
+            while self._outcomes and now - self._outcomes[0][0] > self.window_seconds:
+                self._outcomes.popleft()
+            failures = sum(1 for _, ok in self._outcomes if not ok)
+            if self.state == 'closed' and len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+                self._open(now)
+
+    def _open(self, now):
+        self.state = 'open'
+        self.opened_at = now
+        self.logger.warning(f"[CircuitBreaker] '{self.name}' opened for {self.open_seconds}s")
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+_executor = None
+
+
+def get_circuit_breaker(name):
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+def _get_executor():
+    global _executor
+    with _breakers_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=int(os.getenv('RESILIENT_CALL_MAX_WORKERS', 32)),
+                thread_name_prefix='resilient-call'
+            )
+        return _executor
+
+
+def resilient_call(fn, breaker, deadline=None, hedge_delay=None):
+    """Call `fn()` under a circuit breaker, a deadline and optional hedging.
+
+    With a deadline the caller stops waiting when the budget runs out (the
+    abandoned call finishes in the background). With `hedge_delay` seconds
+    set, an identical second call is started if the first has not answered
+    by then and whichever returns first wins, so only use it for idempotent calls.
+    """
+    if deadline is not None and deadline.expired:
+        raise DeadlineExceededError(f"Deadline expired before calling '{breaker.name}'")
+
+    breaker.before_call()
+
+    if deadline is None and not hedge_delay:
+        try:
+            result = fn()
+        except Exception as e:
+            breaker.record(not counts_as_failure(e))
+            raise
+        breaker.record(True)
+        return result
+
+    executor = _get_executor()
+    futures = [executor.submit(fn)]
+    pending = set(futures)
+    error = None
+    hedged = False
+
+    while pending:
+        timeout = deadline.remaining() if deadline is not None else None
+        if hedge_delay and not hedged:
+            timeout = hedge_delay if timeout is None else min(timeout, hedge_delay)
+        done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+        for future in done:
+            try:
+                result = future.result()
+            except Exception as e:
+                error = e
+                continue
+            breaker.record(True)
+            return result
+
+        if deadline is not None and deadline.expired:
+            break
+        if hedge_delay and not hedged and not done:
+            # The first attempt is slow: race an identical second request
+            hedged = True
+            pending.add(executor.submit(fn))
+
+    if pending:
+        error = DeadlineExceededError(f"Deadline exceeded waiting for '{breaker.name}'")
+    breaker.record(not counts_as_failure(error))
+    raise error
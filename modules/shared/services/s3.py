@@ -1,50 +1,46 @@
-import boto3
-from dotenv import load_dotenv
 from botocore.exceptions import ClientError
 from extensions import get_logger
+from modules.shared.services.aws import get_client
+from modules.shared.services.metrics import S3_READ_BYTES, S3_REQUEST_SECONDS, timed
 
 
 
 class S3Service:
     def __init__(self):
-        load_dotenv()
-        self.logger = get_logger()
-        self.client = boto3.client('s3', region_name='us-east-1')
+        self.logger = get_logger('s3')
 
-    def read_file_from_s3(self, bucket_name, object_key):
-        
-        self.logger.info(f"[S3] Reading file: bucket='{bucket_name}', key='{object_key}'")
-        
-        try:
-            self.check_bucket_exists(bucket_name)
-            
-            response = self.get_object_from_s3(bucket_name, object_key)
-            
-            file_bytes = response['Body'].read()
-            self.logger.info(f"[S3] Read {len(file_bytes)} bytes from '{object_key}' in '{bucket_name}'")
-            
-            return file_bytes
-        
-        except ValueError as e:
-            self.logger.error(f"[S3] Access Error: {str(e)}")
-            raise
-        except Exception as e:
-            self.logger.error(f"[S3] Unexpected Error: {str(e)}")
-            raise
+    @property
+    def client(self):
+        return get_client('s3')
 
-    def check_bucket_exists(self, bucket_name):
+    def get_object_metadata(self, bucket_name, object_key):
         try:
-            self.client.head_bucket(Bucket=bucket_name)
+            with timed(S3_REQUEST_SECONDS, stage='s3', operation='head_object'):
+                response = self.client.head_object(Bucket=bucket_name, Key=object_key)
         except ClientError as e:
-            error_code = e.response['Error']['Code']
-            if error_code in ('404', '403'):
-                self.logger.error(f"[S3] Bucket '{bucket_name}' does not exist or access denied.")
-                raise ValueError(f"Bucket '{bucket_name}' does not exist or you don't have access to it")
+            if e.response['Error']['Code'] in ('404', '403', 'NoSuchKey'):
+                self.logger.error(f"[S3] Object '{object_key}' does not exist in bucket '{bucket_name}' or access denied")
+                raise ValueError(f"Object '{object_key}' does not exist in bucket '{bucket_name}' or you don't have access to it")
             raise
+        return {
+            'etag': response['ETag'].strip('"'),
+            'content_type': response.get('ContentType'),
+            'size': response.get('ContentLength')
+        }
+
+    def read_object_version(self, bucket_name, object_key, etag):
+        # IfMatch makes sure the bytes are the version the ETag was read for
+        self.logger.info("[S3] Reading file: bucket='%s', key='%s', etag='%s'", bucket_name, object_key, etag)
+        with timed(S3_REQUEST_SECONDS, stage='s3', operation='get_object'):
+            response = self.get_object_from_s3(bucket_name, object_key, IfMatch=etag)
+            file_bytes = response['Body'].read()
+        S3_READ_BYTES.inc(len(file_bytes))
+        self.logger.info("[S3] Read %d bytes from '%s' in '%s'", len(file_bytes), object_key, bucket_name)
+        return file_bytes
 
-    def get_object_from_s3(self, bucket_name, object_key):
+    def get_object_from_s3(self, bucket_name, object_key, **kwargs):
         try:
-            return self.client.get_object(Bucket=bucket_name, Key=object_key)
+            return self.client.get_object(Bucket=bucket_name, Key=object_key, **kwargs)
         except ClientError as e:
             if e.response['Error']['Code'] == 'NoSuchKey':
                 self.logger.error(f"[S3] Object '{object_key}' does not exist in bucket '{bucket_name}'")
@@ -0,0 +1,71 @@
+import random
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+from extensions import get_logger
+from modules.shared.services.aws import without_retries
+
+THROTTLING_ERROR_CODES = {
+    'ThrottlingException',
+    'TooManyRequestsException',
+    'ProvisionedThroughputExceededException',
+    'ServiceUnavailableException',
+    'ModelNotReadyException',
+}
+
+
+def is_throttling_error(error):
+    if not isinstance(error, ClientError):
+        return False
+    return error.response.get('Error', {}).get('Code') in THROTTLING_ERROR_CODES
+
+
+class AdaptiveThrottle:
+    """Retries throttled AWS calls and paces every caller sharing the instance.
+
+    Each throttling error doubles a shared pacing delay that all threads wait
+    out before their next call, and each success shrinks it again. A thread
+    pool that hits the account limit slows down together instead of every
+    worker retrying in lockstep. Calls made through it use AWS clients with
+    botocore retries off, so this is the only layer that retries them.
+    """
+
+    def __init__(self, base_delay=0.25, max_delay=20.0, max_retries=6):
+        self.logger = get_logger('throttling')
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retries = max_retries
+        self.retries = 0
+        self.throttled = 0
+        self._pacing_delay = 0.0
+        self._lock = threading.Lock()
+
+    def call(self, fn, *args, **kwargs):
+        attempt = 0
+        while True:
+            with self._lock:
+                pacing_delay = self._pacing_delay
+            if pacing_delay:
+                time.sleep(pacing_delay)
+
+            try:
+                with without_retries():
+                    result = fn(*args, **kwargs)
+            except Exception as e:
+                if not is_throttling_error(e) or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                with self._lock:
+                    self.retries += 1
+                    self.throttled += 1
+                    self._pacing_delay = min(self.max_delay, max(self.base_delay, self._pacing_delay * 2))
+                backoff = min(self.max_delay, self.base_delay * (2 ** attempt))
+                self.logger.warning(f"[Throttle] Throttled, retry {attempt}/{self.max_retries} in {backoff:.2f}s")
+                time.sleep(random.uniform(0, backoff))
+                continue
+
+            with self._lock:
+                self._pacing_delay = self._pacing_delay / 2 if self._pacing_delay > self.base_delay / 8 else 0.0
+            return result
@@ -1,22 +1,104 @@
-import boto3
-from dotenv import load_dotenv
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
 
-from extensions import get_logger
+from sqlalchemy.dialects.postgresql import insert
+
+from extensions import db, get_logger
+from modules.shared.entity import TranslationMemoryEntry
+from modules.shared.services.aws import get_client
+from modules.shared.services.metrics import TRANSLATE_ERRORS, TRANSLATE_REQUEST_SECONDS, timed
+from modules.shared.services.throttling import AdaptiveThrottle
 
 class TranslateService:
     def __init__(self):
-        load_dotenv()
-        self.logger = get_logger()
-        self.client = boto3.client('translate', region_name='us-east-1')
+        self.logger = get_logger('translate')
+
+    @property
+    def client(self):
+        return get_client('translate')
 
     def translate_to_arabic(self, text):
+        return self.translate_text(text, 'en', 'ar')
+
+    def translate_text(self, text, source_language, target_language):
         try:
-            response = self.client.translate_text(
-                Text=text,
-                SourceLanguageCode='en',
-                TargetLanguageCode='ar'
-            )
+            with timed(TRANSLATE_REQUEST_SECONDS, stage='translate', errors=TRANSLATE_ERRORS,
+                       source_language=source_language, target_language=target_language):
+                response = self.client.translate_text(
+                    Text=text,
+                    SourceLanguageCode=source_language,
+                    TargetLanguageCode=target_language
+                )
             return response['TranslatedText']
         except Exception as e:
             self.logger.error(f"\n\n======== Error invoke translation service ========\n{str(e)}\n\n")
             raise
+
+    @staticmethod
+    def make_memory_key(text, source_language, target_language):
+        return hashlib.sha256(f"{source_language}\0{target_language}\0{text}".encode('utf-8')).hexdigest()
+
+    def translate_many(self, texts, source_language='en', target_language='ar', max_workers=None, throttle=None):
+        """Translate a batch of texts through the translation memory.
+
+        Texts are de-duplicated, looked up in the `translation_memory` table
+        with one query, and only the misses are sent to Amazon Translate in
+        parallel. Returns `(translations, errors)`, both keyed by source text.
+        """
+        max_workers = max_workers or int(os.getenv('TRANSLATE_MAX_WORKERS', 8))
+        throttle = throttle or AdaptiveThrottle()
+
+        keys = {text: self.make_memory_key(text, source_language, target_language) for text in set(texts) if text}
+        translations = self.lookup_memory(keys)
+        misses = [text for text in keys if text not in translations]
+        errors = {}
+
+        if misses:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {
+                    text: executor.submit(throttle.call, self.translate_text, text, source_language, target_language)
+                    for text in misses
+                }
+                new_entries = {}
+                for text, future in futures.items():
+                    try:
+                        new_entries[text] = future.result()
+                    except Exception as e:
+                        errors[text] = str(e)
+
+            self.store_memory(keys, new_entries, source_language, target_language)
+            translations.update(new_entries)
+
+        self.logger.info("[Translate] %d unique texts, %d from memory, %d translated, %d failed", len(keys), len(keys) - len(misses), len(misses), len(errors))
+        return translations, errors
+
+    # Memory reads and writes use their own connection so they never commit
+    # the caller's pending work in db.session.
+    def lookup_memory(self, keys):
+        if not keys:
+            return {}
+        texts_by_key = {key: text for text, key in keys.items()}
+        with db.engine.connect() as connection:
+            rows = connection.execute(
+                db.select(TranslationMemoryEntry.key, TranslationMemoryEntry.translated_text)
+                .where(TranslationMemoryEntry.key.in_(list(texts_by_key)))
+            ).all()
+        return {texts_by_key[row.key]: row.translated_text for row in rows}
+
+    def store_memory(self, keys, translations, source_language, target_language):
+        if not translations:
+            return
+        with db.engine.begin() as connection:
+            connection.execute(
+                insert(TranslationMemoryEntry).on_conflict_do_nothing(index_elements=['key']),
+                [
+                    {
+                        'key': keys[text],
+                        'source_language': source_language,
+                        'target_language': target_language,
+                        'translated_text': translated
+                    }
+                    for text, translated in translations.items()
+                ]
+            )
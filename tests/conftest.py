@@ -0,0 +1,22 @@
+import pytest
+from flask import Flask
+
+from extensions import db
+
+
+@pytest.fixture
+def app():
+    """A bare app on in-memory SQLite; tests create only the tables they use."""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def create_tables(app):
+    def create(*models):
+        db.metadata.create_all(db.engine, tables=[model.__table__ for model in models])
+    return create
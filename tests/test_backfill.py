@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+
+import pytest
+
+from extensions import db
+from modules.product.entity import BackfillCheckpoint
+from modules.product.services import ProductService
+
+
+@pytest.fixture
+def service(app, create_tables):
+    create_tables(BackfillCheckpoint)
+    return ProductService()
+
+
+def fetcher(ids):
+    rows = [SimpleNamespace(id=product_id) for product_id in ids]
+
+    def fetch_chunk(last_id, limit, wanted):
+        if wanted is not None:
+            return [row for row in rows if row.id in wanted][:limit]
+        return [row for row in rows if row.id > last_id][:limit]
+    return fetch_chunk
+
+
+def test_backfill_pauses_at_max_items_and_resumes_from_checkpoint(service):
+    seen = []
+
+    def process_chunk(rows):
+        seen.extend(row.id for row in rows)
+        return []
+
+    fetch_chunk = fetcher(range(1, 8))
+    first = service.run_backfill('test', fetch_chunk, process_chunk, chunk_size=2, max_items=4)
+    assert (first['status'], first['last_id'], first['processed']) == ('paused', 4, 4)
+
+    second = service.run_backfill('test', fetch_chunk, process_chunk, chunk_size=2)
+    assert (second['status'], second['last_id'], second['processed']) == ('completed', 7, 3)
+    assert seen == [1, 2, 3, 4, 5, 6, 7]
+
+    checkpoint = db.session.get(BackfillCheckpoint, 'test')
+    assert (checkpoint.processed, checkpoint.succeeded) == (7, 7)
+
+
+def test_failed_ids_are_kept_and_retried(service):
+    attempts = {'count': 0}
+
+    def process_chunk(rows):
+        attempts['count'] += 1
+        return [row.id for row in rows if row.id == 2 and attempts['count'] == 1]
+
+    fetch_chunk = fetcher([1, 2, 3])
+    summary = service.run_backfill('test', fetch_chunk, process_chunk, chunk_size=10)
+    assert summary['failed_ids'] == [2]
+    assert summary['pending_failed_ids'] == [2]
+
+    retried = service.run_backfill('test', fetch_chunk, process_chunk, chunk_size=10, retry_failed=True)
+    assert (retried['status'], retried['succeeded'], retried['pending_failed_ids']) == ('completed', 1, [])
+
+
+def test_error_marks_checkpoint_failed_and_keeps_committed_progress(service):
+    def process_chunk(rows):
+        if rows[0].id > 2:
+            raise RuntimeError('model unavailable')
+        return []
+
+    with pytest.raises(RuntimeError):
+        service.run_backfill('test', fetcher([1, 2, 3, 4]), process_chunk, chunk_size=2)
+
+    checkpoint = db.session.get(BackfillCheckpoint, 'test')
+    assert (checkpoint.status, checkpoint.last_id, checkpoint.last_error) == ('failed', 2, 'model unavailable')
+
+
+def test_backfill_lock_is_a_no_op_off_postgres(service):
+    with service.backfill_lock('test'):
+        pass
@@ -0,0 +1,24 @@
+import click
+import pytest
+
+from extensions import db
+from modules.benchmark.commands import use_benchmark_database
+
+
+def test_refuses_without_a_dedicated_database(app, monkeypatch):
+    monkeypatch.delenv('BENCHMARK_DATABASE_URI', raising=False)
+    with pytest.raises(click.UsageError):
+        use_benchmark_database(app)
+
+    monkeypatch.setenv('BENCHMARK_DATABASE_URI', app.config['SQLALCHEMY_DATABASE_URI'])
+    with pytest.raises(click.UsageError):
+        use_benchmark_database(app)
+
+
+def test_switches_the_app_to_the_benchmark_database(app, monkeypatch, tmp_path):
+    uri = f'sqlite:///{tmp_path / "bench.db"}'
+    monkeypatch.setenv('BENCHMARK_DATABASE_URI', uri)
+    use_benchmark_database(app)
+
+    assert str(db.engine.url) == uri
+    assert str(db.session.get_bind().url) == uri
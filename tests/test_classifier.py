@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from modules.product.classifier import CentroidClassifier
+
+
+class TableClassifier(CentroidClassifier):
+    """Reads products from an in-memory table instead of the database."""
+
+    def __init__(self, **kwargs):
+        super().__init__(min_similarity=0.0, min_margin=0.0, min_examples=0, **kwargs)
+        self.overlap = timedelta(0)
+        self.table = {}
+
+    def put(self, product_id, category, embedding, updated_at=None):
+        self.table[product_id] = SimpleNamespace(
+            id=product_id, category=category, embedding=embedding, updated_at=updated_at or datetime.utcnow()
+        )
+
+    def fetch_rows(self, since, last_id, limit, exclude_ids=None):
+        rows = [
+            row for product_id, row in sorted(self.table.items())
+            if product_id > last_id and product_id not in (exclude_ids or ())
+            and (row.updated_at >= since if since is not None else row.category is not None and row.embedding is not None)
+        ]
+        return rows[:limit]
+
+
+def later():
+    return datetime.utcnow() + timedelta(seconds=1)
+
+
+@pytest.fixture
+def classifier():
+    classifier = TableClassifier()
+    classifier.put(1, 'Food', [1, 0, 0])
+    classifier.put(2, 'Home', [0, 1, 0])
+    classifier.put(3, None, [0.9, 0.1, 0])
+    classifier.put(4, 'Food', None)
+    return classifier
+
+
+def test_refresh_builds_centroids_from_labelled_embedded_products(classifier):
+    assert classifier.refresh(batch_size=1) == 2
+    assert classifier.categories == ['Food', 'Home']
+    assert list(classifier.counts) == [1, 1]
+    assert [category for category, _, _ in classifier.predict([[1, 0.1, 0], [0, 1, 0.1]])] == ['Food', 'Home']
+
+
+def test_refresh_folds_in_older_products_labelled_later(classifier):
+    classifier.refresh()
+    classifier.put(3, 'Home', [0.9, 0.1, 0], updated_at=later())
+
+    assert classifier.refresh() == 1
+    assert list(classifier.counts) == [1, 2]
+
+
+def test_refresh_counts_each_product_once(classifier):
+    classifier.refresh()
+    classifier.put(1, 'Food', [1, 0, 0], updated_at=later())
+
+    assert classifier.refresh() == 0
+    assert list(classifier.counts) == [1, 1]
+
+
+def test_relabelled_product_triggers_a_rebuild(classifier):
+    classifier.refresh()
+    classifier.put(1, 'Home', [1, 0, 0], updated_at=later())
+
+    assert classifier.refresh() == 2
+    assert classifier.categories == ['Home']
+    assert list(classifier.counts) == [2]
+
+
+def test_exclude_ids_and_full_refresh(classifier):
+    assert classifier.refresh(exclude_ids=[2]) == 1
+    assert classifier.categories == ['Food']
+    assert classifier.refresh(full=True) == 2
+
+
+def test_predict_is_not_confident_for_small_categories():
+    classifier = TableClassifier()
+    classifier.min_examples = 2
+    classifier.put(1, 'Food', [1, 0])
+    classifier.put(2, 'Home', [0, 1])
+    classifier.put(3, 'Home', [0.1, 1])
+    classifier.refresh()
+
+    (food, _, food_confident), (home, _, home_confident) = classifier.predict(np.array([[1, 0], [0, 1]]))
+    assert (food, food_confident) == ('Food', False)
+    assert (home, home_confident) == ('Home', True)
+
+
+def test_predict_keeps_serving_the_published_model_during_a_rebuild(classifier):
+    classifier.refresh()
+    model = classifier.model
+
+    # A rebuild clears the working state first; predict must not see it
+    classifier._clear()
+    assert classifier.model is model
+    assert classifier.predict([[1, 0, 0]])[0][0] == 'Food'
+
+    classifier.reset()
+    assert classifier.predict([[1, 0, 0]]) == [(None, 0.0, False)]
@@ -0,0 +1,56 @@
+import pytest
+from flask import Flask
+from sqlalchemy import column, insert, table, text
+
+from extensions import db
+from modules.shared.services import database
+from modules.shared.services.database import reads_from_replica, use_primary
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{tmp_path / "primary.db"}'
+    app.config['SQLALCHEMY_BINDS'] = {database.REPLICA_BIND: f'sqlite:///{tmp_path / "replica.db"}'}
+    db.init_app(app)
+    with app.app_context():
+        for name, engine in (('primary', db.engine), ('replica', db.engines[database.REPLICA_BIND])):
+            with engine.begin() as connection:
+                connection.execute(text('CREATE TABLE side (name TEXT)'))
+                connection.execute(text('INSERT INTO side VALUES (:name)'), {'name': name})
+        yield app
+        db.session.remove()
+
+
+def read_side():
+    return db.session.execute(text('SELECT name FROM side')).scalar()
+
+
+def test_replica_is_chosen_once_per_read_path(app, monkeypatch):
+    answers = iter([True, False, False])
+    monkeypatch.setattr(database.replica_health, 'available', lambda engine: next(answers))
+
+    @reads_from_replica
+    def read_twice():
+        first = read_side()
+        # The replica looks unhealthy from here on; this path must not switch sides
+        return first, read_side()
+
+    assert read_twice() == ('replica', 'replica')
+    assert read_twice() == ('primary', 'primary')
+
+
+def test_primary_pin_and_writes_inside_a_replica_path(app, monkeypatch):
+    monkeypatch.setattr(database.replica_health, 'available', lambda engine: True)
+
+    @reads_from_replica
+    def read_and_write():
+        with use_primary():
+            pinned = read_side()
+        db.session.execute(insert(table('side', column('name'))).values(name='written'))
+        db.session.commit()
+        return pinned
+
+    assert read_and_write() == 'primary'
+    with db.engine.connect() as connection:
+        assert connection.execute(text('SELECT count(*) FROM side')).scalar() == 2
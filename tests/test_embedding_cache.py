@@ -0,0 +1,27 @@
+from modules.shared.services.embedding_cache import EmbeddingCache
+from modules.shared.services.metrics import registry
+
+
+def metric(name, labels=''):
+    prefix = f'{name}{labels} '
+    lines = [line for line in registry.render().splitlines() if line.startswith(prefix)]
+    return float(lines[0][len(prefix):]) if lines else 0.0
+
+
+def test_hits_misses_and_evictions_reach_metrics():
+    cache = EmbeddingCache(max_size=1, ttl_seconds=0, persistent=False)
+    lookups = 'inventory_embedding_cache_lookups_total'
+    before = {
+        result: metric(lookups, f'{{result="{result}"}}') for result in ('memory_hit', 'miss')
+    }
+    evictions = metric('inventory_embedding_cache_evictions_total')
+
+    assert cache.get('model', 'a') is None
+    cache.set('model', 'a', [1.0, 2.0])
+    assert cache.get('model', 'a') == [1.0, 2.0]
+    cache.set('model', 'b', [3.0, 4.0])
+
+    assert metric(lookups, '{result="miss"}') == before['miss'] + 1
+    assert metric(lookups, '{result="memory_hit"}') == before['memory_hit'] + 1
+    assert metric('inventory_embedding_cache_evictions_total') == evictions + 1
+    assert cache.stats()['hit_rate'] == 0.5
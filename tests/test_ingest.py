@@ -0,0 +1,63 @@
+import io
+from datetime import datetime
+
+import pytest
+
+from modules.product.ingest import ProductIngestor
+
+
+@pytest.fixture
+def ingestor(monkeypatch):
+    ingestor = ProductIngestor(chunk_size=2)
+    ingestor.loaded = []
+
+    def load_batch(batch, summary):
+        ingestor.loaded.append([line_number for line_number, _ in batch])
+        summary['inserted'] += len(batch)
+
+    monkeypatch.setattr(ingestor, 'load_batch', load_batch)
+    return ingestor
+
+
+def product(name):
+    return b'{"name": "' + name + b'", "description": "d", "price": 1, "quantity": 1}'
+
+
+def test_ndjson_rejects_bad_lines_and_keeps_going(ingestor):
+    body = b'\n'.join([product(b'a'), b'not json', b'[1]', b'', product(b'b'), product(b'c')])
+    summary = ingestor.ingest(io.BytesIO(body), 'ndjson')
+
+    assert (summary['received'], summary['inserted'], summary['rejected']) == (5, 3, 2)
+    assert [error['line'] for error in summary['errors']] == [2, 3]
+    assert ingestor.loaded == [[1, 5], [6]]
+
+
+def test_invalid_utf8_is_a_line_error_not_a_crash(ingestor):
+    body = b'\n'.join([product(b'a'), product(b'caf\xe9'), product(b'\xc3\xa9clair')])
+    summary = ingestor.ingest(io.BytesIO(body), 'ndjson')
+
+    assert (summary['inserted'], summary['rejected']) == (2, 1)
+    assert summary['errors'] == [{'line': 2, 'errors': {'_encoding': ['Line is not valid UTF-8']}}]
+
+
+def test_csv_maps_empty_optional_fields_to_null_and_flags_bad_rows(ingestor, monkeypatch):
+    rows = []
+    monkeypatch.setattr(ingestor, 'load_batch', lambda batch, summary: rows.extend(row for _, row in batch))
+    body = (
+        b'name,description,price,quantity,category\n'
+        b'a,d,1,1,\n'
+        b'b,d,1,1,Food,extra\n'
+        b'c,\xff,1,1,Food\n'
+    )
+    summary = ingestor.ingest(io.BytesIO(body), 'csv')
+
+    assert rows == [{'name': 'a', 'description': 'd', 'price': '1', 'quantity': '1', 'category': None}]
+    assert [(error['line'], list(error['errors'])) for error in summary['errors']] == [(3, ['_csv']), (4, ['_encoding'])]
+
+
+def test_format_copy_value():
+    assert ProductIngestor.format_copy_value(None) == ''
+    assert ProductIngestor.format_copy_value(True) == 't'
+    assert ProductIngestor.format_copy_value(2.5) == '2.5'
+    assert ProductIngestor.format_copy_value('say "hi"') == '"say ""hi"""'
+    assert ProductIngestor.format_copy_value(datetime(2024, 1, 2, 3, 4)) == '2024-01-02T03:04:00'
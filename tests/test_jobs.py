@@ -0,0 +1,92 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from extensions import db
+from modules.job.entity import Job
+from modules.job.services import JobBusyError, JobService
+
+
+@pytest.fixture
+def service(app, create_tables):
+    create_tables(Job)
+    service = JobService()
+    service.poll_seconds = 0
+    service.register_handler('embed', lambda params, progress: {'ok': True}, exclusive=True)
+    service.register_handler('classify', lambda params, progress: {'ok': True})
+    return service
+
+
+def add_job(job_id, job_type, status='queued', heartbeat_at=None, age=0):
+    db.session.add(Job(
+        id=job_id, type=job_type, status=status, params={}, heartbeat_at=heartbeat_at,
+        created_at=datetime.utcnow() - timedelta(seconds=age)
+    ))
+    db.session.commit()
+
+
+def test_exclusive_job_waits_while_same_type_runs(service):
+    add_job('running', 'embed', status='running', heartbeat_at=datetime.utcnow(), age=30)
+    add_job('embed-2', 'embed', age=20)
+    add_job('classify-1', 'classify', age=10)
+
+    assert service._claim() == 'classify-1'
+    assert service._claim() is None
+
+    db.session.get(Job, 'running').status = 'succeeded'
+    db.session.commit()
+    assert service._claim() == 'embed-2'
+
+
+def test_non_exclusive_jobs_run_side_by_side(service):
+    add_job('classify-1', 'classify', status='running', heartbeat_at=datetime.utcnow(), age=10)
+    add_job('classify-2', 'classify')
+
+    assert service._claim() == 'classify-2'
+
+
+def test_stale_exclusive_job_does_not_block_the_queue(service):
+    stale = datetime.utcnow() - timedelta(seconds=service.stale_seconds + 60)
+    add_job('dead', 'embed', status='running', heartbeat_at=stale, age=30)
+    add_job('embed-2', 'embed', age=20)
+
+    # The dead job is reclaimed first and the queued one waits behind it
+    assert service._claim() == 'dead'
+    assert service._claim() is None
+
+
+def test_busy_handler_puts_the_job_back_in_the_queue(service):
+    def busy(params, progress):
+        raise JobBusyError("Backfill 'embed' is already running")
+
+    service.register_handler('embed', busy, exclusive=True)
+    add_job('embed-1', 'embed')
+
+    job_id = service._claim()
+    service._run(job_id)
+
+    db.session.expire_all()
+    job = db.session.get(Job, 'embed-1')
+    assert job.status == 'queued'
+    assert job.error is None
+
+
+def test_heartbeat_is_refreshed_while_a_long_handler_runs(service):
+    service.heartbeat_seconds = 0.02
+    beats = []
+
+    def slow(params, progress):
+        started = db.session.get(Job, 'embed-1').heartbeat_at
+        time.sleep(0.2)
+        db.session.expire_all()
+        beats.append((started, db.session.get(Job, 'embed-1').heartbeat_at))
+        return {}
+
+    service.register_handler('embed', slow, exclusive=True)
+    add_job('embed-1', 'embed')
+    service._run(service._claim())
+
+    started, later = beats[0]
+    assert later > started
+    assert db.session.get(Job, 'embed-1').status == 'succeeded'
@@ -0,0 +1,17 @@
+import os
+
+from modules.shared import logger
+
+
+def test_forked_child_gets_its_own_listener():
+    logger.get_logger('test')
+    parent_listener = logger._listener
+
+    pid = os.fork()
+    if pid == 0:
+        fresh = logger._listener is not parent_listener and logger._listener._thread.is_alive()
+        os._exit(0 if fresh else 1)
+
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert logger._listener is parent_listener
@@ -0,0 +1,31 @@
+from datetime import datetime
+
+import pytest
+
+from extensions import db
+from modules.product.entity import ProductNeighbour
+from modules.product.services import ProductService
+
+
+@pytest.fixture
+def service(app, create_tables):
+    create_tables(ProductNeighbour)
+    lists = {1: [2, 3], 2: [1, 3], 3: [1, 2], 4: [5, 1], 5: [4, 6]}
+    db.session.add_all(
+        ProductNeighbour(product_id=owner, rank=rank, neighbour_id=neighbour, distance=0.1 * rank, computed_at=datetime.utcnow())
+        for owner, neighbours in lists.items() for rank, neighbour in enumerate(neighbours, 1)
+    )
+    db.session.commit()
+    return ProductService()
+
+
+def owners():
+    return sorted({row.product_id for row in db.session.query(ProductNeighbour.product_id)})
+
+
+def test_invalidate_drops_own_lists_and_lists_that_rank_the_product(service):
+    service.invalidate_neighbours([3])
+    assert owners() == [4, 5]
+
+    service.invalidate_neighbours([6])
+    assert owners() == [4]
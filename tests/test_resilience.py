@@ -0,0 +1,89 @@
+import time
+
+import pytest
+from botocore.exceptions import ClientError, EndpointConnectionError
+
+from modules.shared.services.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    Deadline,
+    DeadlineExceededError,
+    counts_as_failure,
+    resilient_call,
+)
+
+
+def client_error(code, status):
+    return ClientError({'Error': {'Code': code, 'Message': code}, 'ResponseMetadata': {'HTTPStatusCode': status}}, 'InvokeModel')
+
+
+def test_counts_as_failure_ignores_throttling_and_client_errors():
+    assert not counts_as_failure(client_error('ThrottlingException', 400))
+    assert not counts_as_failure(client_error('ServiceUnavailableException', 503))
+    assert not counts_as_failure(client_error('ValidationException', 400))
+    assert not counts_as_failure(ValueError('bad input'))
+
+
+def test_counts_as_failure_trips_on_server_and_transport_errors():
+    assert counts_as_failure(client_error('InternalServerException', 500))
+    assert counts_as_failure(EndpointConnectionError(endpoint_url='https://bedrock'))
+    assert counts_as_failure(DeadlineExceededError('late'))
+
+
+def test_breaker_opens_at_failure_rate_and_recovers_after_trial():
+    breaker = CircuitBreaker('test', failure_rate=0.5, min_calls=4, window_seconds=60, open_seconds=0.05)
+    for success in (True, False, True, False):
+        breaker.before_call()
+        breaker.record(success)
+    assert breaker.state == 'open'
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    time.sleep(0.06)
+    breaker.before_call()
+    assert breaker.state == 'half-open'
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record(True)
+    assert breaker.state == 'closed'
+
+
+def test_throttled_calls_do_not_open_the_breaker():
+    breaker = CircuitBreaker('throttled', failure_rate=0.5, min_calls=2, window_seconds=60, open_seconds=60)
+
+    def throttled():
+        raise client_error('ThrottlingException', 400)
+
+    for _ in range(5):
+        with pytest.raises(ClientError):
+            resilient_call(throttled, breaker)
+    assert breaker.state == 'closed'
+
+
+def test_resilient_call_stops_waiting_at_the_deadline():
+    breaker = CircuitBreaker('slow', min_calls=100)
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceededError):
+        resilient_call(lambda: time.sleep(0.5), breaker, deadline=Deadline(0.05))
+    assert time.monotonic() - started < 0.4
+
+
+def test_resilient_call_rejects_an_expired_deadline_without_calling():
+    calls = []
+    with pytest.raises(DeadlineExceededError):
+        resilient_call(lambda: calls.append(1), CircuitBreaker('expired'), deadline=Deadline(0))
+    assert calls == []
+
+
+def test_hedged_call_returns_the_faster_attempt():
+    attempts = []
+
+    def call():
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            time.sleep(0.5)
+            return 'slow'
+        return 'fast'
+
+    assert resilient_call(call, CircuitBreaker('hedged', min_calls=100), hedge_delay=0.02) == 'fast'
+    assert len(attempts) == 2
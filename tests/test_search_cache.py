@@ -0,0 +1,27 @@
+from modules.product.search_cache import SearchResultCache
+from modules.shared.services.metrics import registry
+
+
+def metric(line_prefix):
+    lines = [line for line in registry.render().splitlines() if line.startswith(line_prefix + ' ')]
+    return float(lines[0].split(' ')[-1]) if lines else 0.0
+
+
+def test_lookups_and_evictions_reach_metrics():
+    cache = SearchResultCache(max_entries=1, max_bytes=1024, max_entry_bytes=1024)
+    names = {
+        result: f'inventory_search_cache_lookups_total{{result="{result}"}}' for result in ('hit', 'miss', 'stale')
+    }
+    before = {result: metric(name) for result, name in names.items()}
+    evictions = metric('inventory_search_cache_evictions_total')
+
+    assert cache.get('a', 1) is None
+    cache.set('a', 1, b'{}')
+    assert cache.get('a', 1) == b'{}'
+    assert cache.get('a', 2) is None
+    cache.set('a', 2, b'{}')
+    cache.set('b', 2, b'{}')
+
+    assert {result: metric(name) - before[result] for result, name in names.items()} == {'hit': 1, 'miss': 1, 'stale': 1}
+    assert metric('inventory_search_cache_evictions_total') == evictions + 1
+    assert cache.stats()['misses'] == 2
@@ -0,0 +1,130 @@
+import numpy as np
+import pytest
+from pgvector import HalfVector
+
+from modules.product.search_engine import MmapVectorIndex
+
+DIMENSIONS = 4
+
+
+def row(product_id, embedding, category='Food', price=10.0, in_stock=True):
+    return {'id': product_id, 'embedding': embedding, 'category': category, 'price': price, 'in_stock': in_stock}
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = MmapVectorIndex(str(tmp_path / 'index'), dimensions=DIMENSIONS)
+    index.rebuild([[
+        row(1, [1, 0, 0, 0]),
+        row(2, [0, 1, 0, 0], category='Home', price=50.0),
+        row(3, [0.9, 0.1, 0, 0], in_stock=False),
+    ]], generation=1, watermark='2024-01-01T00:00:00')
+    return index
+
+
+def ids(hits):
+    return [product_id for product_id, _ in hits]
+
+
+def test_search_ranks_by_cosine_distance_and_applies_filters(index):
+    assert ids(index.search([1, 0, 0, 0], 10)) == [1, 2]
+    assert ids(index.search([1, 0, 0, 0], 10, in_stock=None)) == [1, 3, 2]
+    assert ids(index.search([1, 0, 0, 0], 10, category='Home')) == [2]
+    assert ids(index.search([1, 0, 0, 0], 10, min_price=20)) == [2]
+    assert index.search([1, 0, 0, 0], 10, category='Toys') == []
+    assert index.search([1, 0, 0, 0], 1)[0] == (1, pytest.approx(0.0, abs=1e-6))
+
+
+def test_apply_tombstones_changed_and_removed_rows(index):
+    appended, tombstoned = index.apply([row(1, [0, 0, 1, 0]), row(2, None)], generation=2)
+    assert (appended, tombstoned) == (1, 2)
+    assert ids(index.search([0, 0, 1, 0], 10)) == [1]
+    header = index.read_header()
+    assert header['generation'] == 2 and header['count'] == 4
+
+
+def test_apply_updates_filter_columns_in_place_for_an_unchanged_vector(index):
+    assert index.apply([row(1, [1, 0, 0, 0], in_stock=False)]) == (0, 0)
+    assert ids(index.search([1, 0, 0, 0], 10)) == [2]
+
+
+def test_apply_grows_into_a_new_version_when_capacity_runs_out(tmp_path):
+    index = MmapVectorIndex(str(tmp_path / 'index'), dimensions=DIMENSIONS)
+    index.rebuild([[row(1, [1, 0, 0, 0])]], capacity=1)
+    first_version = index.read_header()['version']
+    index.apply([row(product_id, [0, 1, 0, 0]) for product_id in range(2, 1200)])
+    header = index.read_header()
+    assert header['version'] != first_version
+    assert header['count'] == 1199 and header['capacity'] >= 1199
+    assert not (tmp_path / 'index' / first_version).exists()
+    assert len(index.search([0, 1, 0, 0], 2000)) == 1199
+
+
+def test_reader_sees_a_writer_swap_from_another_instance(index):
+    other = MmapVectorIndex(index.directory, dimensions=DIMENSIONS)
+    assert ids(other.search([0, 1, 0, 0], 1)) == [2]
+    index.rebuild([[row(7, [0, 1, 0, 0])]])
+    assert ids(other.search([0, 1, 0, 0], 1)) == [7]
+
+
+def test_halfvec_embeddings_are_accepted(tmp_path):
+    index = MmapVectorIndex(str(tmp_path / 'index'), dimensions=DIMENSIONS)
+    index.rebuild([[row(1, HalfVector([1, 0, 0, 0])), row(2, HalfVector([0, 1, 0, 0]))]])
+    assert index.apply([row(2, HalfVector([0, 0, 1, 0]))]) == (1, 1)
+    assert ids(index.search(HalfVector([0, 0, 1, 0]), 1)) == [2]
+
+
+def test_normalise_returns_unit_rows_and_keeps_zero_vectors():
+    matrix = MmapVectorIndex.normalise(np.array([[3, 4, 0, 0], [0, 0, 0, 0]]))
+    assert np.allclose(np.linalg.norm(matrix[0]), 1)
+    assert not matrix[1].any()
+
+
+class RecordingSession:
+    def __init__(self):
+        self.settings = {}
+
+    def execute(self, statement, params):
+        name = str(statement).split("set_config('")[1].split("'")[0]
+        self.settings[name] = params['value']
+
+
+@pytest.fixture
+def session(monkeypatch):
+    from modules.product import search_engine
+
+    session = RecordingSession()
+    monkeypatch.setattr(search_engine, 'db', type('FakeDb', (), {'session': session}))
+    return session
+
+
+def test_ef_search_is_raised_to_cover_the_page(session):
+    from modules.product.search_engine import apply_ann_settings
+
+    apply_ann_settings(rows_needed=30)
+    assert session.settings == {}
+    apply_ann_settings(rows_needed=120)
+    assert session.settings == {'hnsw.ef_search': '120'}
+
+
+def test_explicit_ef_search_below_the_page_is_rejected(session):
+    from modules.product.search_engine import apply_ann_settings
+
+    with pytest.raises(ValueError):
+        apply_ann_settings(ef_search=20, rows_needed=60)
+    apply_ann_settings(ef_search=200, rows_needed=60)
+    assert session.settings['hnsw.ef_search'] == '200'
+
+
+def test_filtered_and_deep_queries_use_iterative_scans(session, monkeypatch):
+    from modules.product.search_engine import apply_ann_settings
+
+    apply_ann_settings(rows_needed=10, filtered=True)
+    assert session.settings == {'hnsw.iterative_scan': 'strict_order'}
+    apply_ann_settings(rows_needed=5000)
+    assert session.settings['hnsw.ef_search'] == '1000'
+
+    session.settings.clear()
+    monkeypatch.setenv('HNSW_ITERATIVE_SCAN', 'off')
+    apply_ann_settings(rows_needed=10, filtered=True)
+    assert session.settings == {}
@@ -0,0 +1,64 @@
+import pytest
+from botocore.exceptions import ClientError
+
+from modules.shared.services import aws
+from modules.shared.services.throttling import AdaptiveThrottle, is_throttling_error
+
+
+def client_error(code):
+    return ClientError({'Error': {'Code': code}, 'ResponseMetadata': {'HTTPStatusCode': 400}}, 'InvokeModel')
+
+
+@pytest.fixture
+def throttle(monkeypatch):
+    monkeypatch.setattr('modules.shared.services.throttling.time.sleep', lambda seconds: None)
+    monkeypatch.setattr('modules.shared.services.throttling.random.uniform', lambda low, high: 0)
+    return AdaptiveThrottle(max_retries=2)
+
+
+def test_throttling_is_retried_up_to_max_retries(throttle):
+    calls = []
+
+    def call():
+        calls.append(1)
+        raise client_error('ThrottlingException')
+
+    with pytest.raises(ClientError):
+        throttle.call(call)
+    assert len(calls) == 3
+    assert throttle.retries == 2
+
+
+def test_other_errors_are_not_retried(throttle):
+    calls = []
+
+    def call():
+        calls.append(1)
+        raise client_error('ValidationException')
+
+    with pytest.raises(ClientError):
+        throttle.call(call)
+    assert len(calls) == 1
+    assert not is_throttling_error(ValueError())
+
+
+def test_throttled_calls_use_single_attempt_clients(throttle, monkeypatch):
+    monkeypatch.setattr(aws, '_clients', {})
+    monkeypatch.setenv('AWS_MAX_ATTEMPTS', '5')
+
+    bulk = throttle.call(aws.get_client, 'translate')
+    interactive = aws.get_client('translate')
+
+    assert bulk is not interactive
+    assert bulk.meta.config.retries['total_max_attempts'] == 1
+    assert interactive.meta.config.retries['total_max_attempts'] == 5
+    assert throttle.call(aws.get_client, 'translate') is bulk
+
+
+def test_registered_stand_in_serves_both_variants(throttle, monkeypatch):
+    monkeypatch.setattr(aws, '_clients', {})
+    stand_in = object()
+    aws.register_client('bedrock-runtime', stand_in)
+
+    assert aws.get_client('bedrock-runtime') is stand_in
+    assert throttle.call(aws.get_client, 'bedrock-runtime') is stand_in